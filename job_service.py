@@ -1,19 +1,56 @@
 # job_service.py
 # Database-backed job service using Supabase
 import os
+import re
 import json
+import zlib
+import base64
 import logging
-from typing import Optional, Dict, List
-from datetime import datetime
+import asyncio
+import mimetypes
+import shutil
+import tempfile
+import threading
+import time
+import random
+import functools
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Tuple, Union
 from enum import Enum
 from pathlib import Path
-from supabase import create_client, Client
+import httpx
+from supabase import create_client, acreate_client, Client, ClientOptions
+from postgrest.types import ReturnMethod
 from dotenv import load_dotenv
 
+# orjson is several times faster than stdlib json (parsing legacy string-encoded rows,
+# serializing results for compression); fall back quietly if it isn't installed
+try:
+    from orjson import loads as _json_loads, dumps as _json_dumps
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Characters not allowed in Supabase Storage object names (anything other than
+# word characters, '-' and '.'); compiled once instead of per upload
+_UNSAFE_FILENAME_CHARS_RE = re.compile(r'[^\w\-.]')
+
+# Where job files land when Supabase Storage is unavailable (local-disk fallback)
+LOCAL_JOBS_ROOT = Path(tempfile.gettempdir()) / "inbox_jobs"
+
+def file_suffix(filename: str) -> str:
+    """Same as Path(filename).suffix, without building a Path object."""
+    name = filename.rpartition("/")[2]
+    stem, dot, extension = name.rpartition(".")
+    return dot + extension if stem and extension else ""
+
 class JobStatus(str, Enum):
     """Job status enumeration"""
     CREATED = "created"
@@ -22,52 +59,279 @@ class JobStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
 
-# Initialize Supabase client
+# Supabase configuration
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")  # Use service role key for server-side operations
 supabase_storage_url = os.getenv("SUPABASE_STORAGE_URL")  # Optional: for signed URLs
 
+# HTTP connection pool shared by PostgREST and Storage calls.
+# Reusing keep-alive connections avoids a TCP+TLS handshake on every request.
+#
+# Note on Postgres pooling: this service never opens Postgres connections itself -
+# every query goes over HTTPS to PostgREST, which keeps its own pooled backend
+# connections. So there is no DSN to point at the Supavisor transaction pooler
+# (port 6543); SUPABASE_MAX_CONNECTIONS is what bounds our fan-out per process.
+# If a direct psycopg/asyncpg helper is ever added, use the pooler URL for it, but
+# run the supabase_*_migration.sql files over the direct (5432) connection or the
+# SQL editor - CREATE INDEX CONCURRENTLY and session-level settings don't work
+# through a transaction pooler.
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "50"))
+SUPABASE_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SUPABASE_MAX_KEEPALIVE_CONNECTIONS", "20"))
+# Idle connections are closed after this long, so we don't reuse one the server or a
+# load balancer has already dropped
+SUPABASE_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY_SECONDS", "30"))
+
+# Thread pool for the async DB wrappers (aget_job, aupdate_job_status, ...). Sized to the HTTP pool so every thread can
+# have a request in flight without queueing on a connection, and kept separate from the
+# default executor so DB calls don't wait behind text extraction or file I/O.
+DB_EXECUTOR = ThreadPoolExecutor(max_workers=SUPABASE_MAX_CONNECTIONS, thread_name_prefix="db")
+
+async def _run_db(fn, *args, **kwargs):
+    """Run a blocking job_service call on DB_EXECUTOR and await its result."""
+    queued = DB_EXECUTOR._work_queue.qsize()
+    if queued:
+        # Every DB thread is busy; callers are now waiting on the pool, not the database
+        logger.warning(f"DB_EXECUTOR saturated: {queued} call(s) queued behind {DB_EXECUTOR._max_workers} threads")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(DB_EXECUTOR, functools.partial(fn, *args, **kwargs))
+
 if not supabase_url or not supabase_key:
     logger.warning("Supabase credentials not found. Jobs will not be persisted.")
-    supabase: Optional[Client] = None
 else:
+    # Helpful non-secret diagnostics: log project ref so we can confirm
+    # API and worker are pointing at the same Supabase project.
+    try:
+        # SUPABASE_URL format: https://<project-ref>.supabase.co
+        project_ref = None
+        if "://" in supabase_url and ".supabase.co" in supabase_url:
+            project_ref = supabase_url.split("://", 1)[1].split(".supabase.co", 1)[0]
+        logger.info(f"Supabase project ref: {project_ref or 'unknown'}")
+    except Exception:
+        pass
+
+    # Set storage URL if provided (ensures trailing slash for signed URLs)
+    if supabase_storage_url:
+        # Ensure trailing slash
+        if not supabase_storage_url.endswith("/"):
+            supabase_storage_url = supabase_storage_url + "/"
+        logger.info(f"Supabase storage URL configured: {supabase_storage_url}")
+    elif ".supabase.co" in supabase_url:
+        # Auto-detect from supabase_url if not provided
+        # Format: https://<project-id>.supabase.co
+        base_url = supabase_url.rstrip("/")
+        supabase_storage_url = f"{base_url}/storage/v1/"
+        logger.info(f"Auto-detected storage URL: {supabase_storage_url}")
+
+# Short-lived in-process cache for job reads. Workers re-read the same job several times
+# within seconds (file lookup, progress, result write) and front-ends poll /job/{id};
+# a little staleness is fine for those reads, and every local write below drops the
+# cached rows. Entries are keyed by job_id, then by the selected columns ("*" = full row).
+JOB_CACHE_TTL_SECONDS = float(os.getenv("JOB_CACHE_TTL_SECONDS", "5"))
+# Status reads come from clients polling a job another process is updating, so they
+# are only collapsed over a much shorter window
+JOB_STATUS_CACHE_TTL_SECONDS = float(os.getenv("JOB_STATUS_CACHE_TTL_SECONDS", "0.5"))
+JOB_CACHE_MAX_SIZE = 4096
+_job_cache: Dict[str, Dict[str, Tuple[float, Dict]]] = {}
+_job_cache_lock = threading.Lock()
+
+def _job_cache_get(job_id: str, columns: str = "*") -> Optional[Dict]:
+    """Return a cached job row (or column projection) if present and not expired."""
+    with _job_cache_lock:
+        entry = _job_cache.get(job_id, {}).get(columns)
+        if entry is None:
+            return None
+        expires_at, job = entry
+        if expires_at < time.monotonic():
+            del _job_cache[job_id][columns]
+            return None
+        return job
+
+def _job_cache_put(job_id: str, job: Dict, columns: str = "*", ttl: float = JOB_CACHE_TTL_SECONDS):
+    """Cache a job row (or column projection), evicting the oldest job when full."""
+    if ttl <= 0:
+        return
+    with _job_cache_lock:
+        if job_id not in _job_cache and len(_job_cache) >= JOB_CACHE_MAX_SIZE:
+            # Dicts keep insertion order, so the first key is the oldest entry
+            del _job_cache[next(iter(_job_cache))]
+        _job_cache.setdefault(job_id, {})[columns] = (time.monotonic() + ttl, job)
+
+# Last (status, progress, processed_files) written per job by update_job_status, with
+# the time it was written. Lets identical back-to-back status writes be skipped.
+STATUS_WRITE_DEBOUNCE_SECONDS = 0.5
+_last_status_write: Dict[str, Tuple[Tuple, float]] = {}
+
+def invalidate_job_cache(job_id: str):
+    """
+    Drop every cached read of a job after it has been modified. Also forgets the
+    job's last status write, since the row no longer necessarily matches it.
+    """
+    with _job_cache_lock:
+        _job_cache.pop(job_id, None)
+        _last_status_write.pop(job_id, None)
+
+# Errors where the request never reached (or never came back from) Supabase.
+# Worth retrying in-process rather than failing the call and waiting for the next poll.
+TRANSIENT_ERRORS = (httpx.TransportError,)
+# For non-idempotent writes (inserts) only retry when the request can't have been applied
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+# HTTP statuses Storage returns when it is overloaded or briefly down
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+def _is_retryable_status_error(error: Exception) -> bool:
+    """
+    True if error carries a RETRYABLE_STATUS_CODES status: an httpx.HTTPStatusError, or a
+    storage3 StorageException, whose first argument is the error body with a statusCode.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+    details = error.args[0] if error.args else None
+    if not isinstance(details, dict):
+        return False
+    try:
+        return int(details.get("statusCode")) in RETRYABLE_STATUS_CODES
+    except (TypeError, ValueError):
+        return False
+
+def retry_transient(tries: int = 3, initial: float = 0.2, max_delay: float = 2.0,
+                    retry_on: Tuple[type, ...] = TRANSIENT_ERRORS,
+                    retry_if=None):
+    """
+    Decorator: retry a Supabase call on transient network errors with
+    exponential backoff plus jitter. Other exceptions propagate immediately.
+    
+    Args:
+        tries: Total number of attempts
+        initial: Delay before the first retry (seconds)
+        max_delay: Upper bound on any single delay (seconds)
+        retry_on: Exception types that trigger a retry
+        retry_if: Optional predicate; other exceptions for which it returns True are retried too
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(1, tries + 1):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    if not (isinstance(e, retry_on) or (retry_if and retry_if(e))):
+                        raise
+                    if attempt == tries:
+                        raise
+                    delay = min(max_delay, initial * (2 ** (attempt - 1)))
+                    delay = random.uniform(0, delay) + delay / 2
+                    logger.warning(f"{func.__name__} failed with {type(e).__name__} "
+                                   f"(attempt {attempt}/{tries}), retrying in {delay:.2f}s")
+                    time.sleep(delay)
+        return wrapper
+    return decorator
+
+@retry_transient()
+def _execute(query):
+    """Execute a PostgREST query builder, retrying on transient network errors."""
+    return query.execute()
+
+@retry_transient(retry_on=CONNECT_ERRORS)
+def _execute_insert(query):
+    """Execute a PostgREST insert, retrying only if the request never got through."""
+    return query.execute()
+
+# The client is cached per process: a forked child (gunicorn/uvicorn workers with
+# preload) must not reuse the parent's pooled TLS connections, so it builds its own.
+_supabase_client: Optional[Client] = None
+_supabase_http_client: Optional[httpx.Client] = None
+_supabase_pid: Optional[int] = None
+_supabase_client_lock = threading.Lock()
+os.register_at_fork(after_in_child=lambda: globals().update(_supabase_client_lock=threading.Lock()))
+
+def get_supabase() -> Optional[Client]:
+    """
+    Return this process's Supabase client, creating it on first use.
+    
+    The client is backed by a pooled httpx.Client so PostgREST and Storage
+    calls reuse keep-alive connections instead of reconnecting per call.
+    
+    Returns:
+        Supabase client, or None if Supabase is not configured
+    """
+    global _supabase_client, _supabase_http_client, _supabase_pid
+    pid = os.getpid()
+    if _supabase_pid == pid:
+        return _supabase_client
+    with _supabase_client_lock:
+        if _supabase_pid != pid:
+            _supabase_client, _supabase_http_client = _create_supabase_client()
+            _supabase_pid = pid
+    return _supabase_client
+
+def close_supabase():
+    """
+    Close this process's Supabase connection pool (call once on shutdown).
+    A later get_supabase() call builds a fresh client.
+    """
+    global _supabase_client, _supabase_http_client, _supabase_pid
+    with _supabase_client_lock:
+        http_client = _supabase_http_client if _supabase_pid == os.getpid() else None
+        _supabase_client = _supabase_http_client = _supabase_pid = None
+    if http_client is not None:
+        http_client.close()
+        logger.info("Supabase connection pool closed")
+
+def _create_supabase_client() -> Tuple[Optional[Client], Optional[httpx.Client]]:
+    """Build a Supabase client over a fresh httpx connection pool; returns (client, pool)."""
+    if not supabase_url or not supabase_key:
+        return None, None
+    
     try:
-        # Supabase client initialization (positional arguments)
-        supabase = create_client(supabase_url, supabase_key)
+        http_client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+        options = ClientOptions(
+            postgrest_client_timeout=10,
+            storage_client_timeout=30,
+            httpx_client=http_client,
+        )
+        client = create_client(supabase_url, supabase_key, options=options)
         logger.info("Supabase client initialized successfully")
+        return client, http_client
+    except Exception:
+        logger.error(f"Supabase URL: {supabase_url[:30]}...")
+        logger.exception("Failed to initialize Supabase client")
+        return None, None
 
-        # Helpful non-secret diagnostics: log project ref so we can confirm
-        # API and worker are pointing at the same Supabase project.
-        try:
-            # SUPABASE_URL format: https://<project-ref>.supabase.co
-            project_ref = None
-            if supabase_url and "://" in supabase_url and ".supabase.co" in supabase_url:
-                project_ref = supabase_url.split("://", 1)[1].split(".supabase.co", 1)[0]
-            logger.info(f"Supabase project ref: {project_ref or 'unknown'}")
-        except Exception:
-            pass
-        
-        # Set storage URL if provided (ensures trailing slash for signed URLs)
-        if supabase_storage_url:
-            # Ensure trailing slash
-            if not supabase_storage_url.endswith("/"):
-                supabase_storage_url = supabase_storage_url + "/"
-            logger.info(f"Supabase storage URL configured: {supabase_storage_url}")
-        else:
-            # Auto-detect from supabase_url if not provided
-            if supabase_url:
-                # Extract project ID and construct storage URL
-                # Format: https://<project-id>.supabase.co
-                if ".supabase.co" in supabase_url:
-                    base_url = supabase_url.rstrip("/")
-                    supabase_storage_url = f"{base_url}/storage/v1/"
-                    logger.info(f"Auto-detected storage URL: {supabase_storage_url}")
-    except Exception as e:
-        logger.error(f"Failed to initialize Supabase client: {e}")
-        logger.error(f"Supabase URL: {supabase_url[:30]}..." if supabase_url else "No URL")
-        import traceback
-        logger.error(traceback.format_exc())
-        supabase = None
+def _job_row(
+    document_id: Optional[str] = None,
+    batch_id: Optional[str] = None,
+    endpoint_type: str = "classify",
+    total_files: int = 0,
+    user_id: Optional[str] = None,
+    status: JobStatus = JobStatus.CREATED,
+    file_data: Optional[List[Dict]] = None,
+) -> Dict:
+    """
+    Build the inbox_jobs row for a new job.
+    created_at/updated_at are filled in by the database (see supabase_timestamps_migration.sql).
+    """
+    return {
+        "document_id": document_id,
+        "batch_id": batch_id,
+        "endpoint_type": endpoint_type,
+        # IMPORTANT: created jobs are not visible to workers until READY
+        "status": status.value,
+        "progress": 0,
+        "total_files": total_files,
+        "processed_files": 0,
+        "result": None,
+        "error": None,
+        "user_id": user_id,
+        # Always present (even if None) so multi-row inserts have matching keys
+        "file_data": _file_metadata(file_data) if file_data else None,
+    }
 
 def create_job(
     document_id: Optional[str] = None,
@@ -76,6 +340,9 @@ def create_job(
     total_files: int = 0,
     user_id: Optional[str] = None,
     status: JobStatus = JobStatus.CREATED,
+    file_data: Optional[List[Dict]] = None,
+    job_id: Optional[str] = None,
+    file_urls: Optional[List[Dict]] = None,
 ) -> str:
     """
     Create a new job in Supabase and return its ID.
@@ -86,31 +353,36 @@ def create_job(
         endpoint_type: "classify" or "analyze"
         total_files: Number of files in this job
         user_id: Optional user ID from frontend (passed in header)
+        file_data: Optional file metadata known up front ({filename, file_path, suffix, size});
+                   stored in the same INSERT instead of a later store_file_data call
+        job_id: Optional ID chosen by the caller (UUID string); lets files be uploaded under
+                the job's ID before the row exists. Generated by the database if omitted.
+        file_urls: Optional uploaded file paths (as for finalize_upload), stored in the same
+                   INSERT - with status=READY the job is created complete in one round-trip
     
     Returns:
         job_id (UUID string)
     """
+    supabase = get_supabase()
     if not supabase:
         raise RuntimeError("Supabase not configured. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY")
     
     try:
-        job_data = {
-            "document_id": document_id,
-            "batch_id": batch_id,
-            "endpoint_type": endpoint_type,
-            # IMPORTANT: created jobs are not visible to workers until READY
-            "status": status.value,
-            "progress": 0,
-            "total_files": total_files,
-            "processed_files": 0,
-            "result": None,
-            "error": None,
-            "user_id": user_id,
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat()
-        }
+        job_data = _job_row(
+            document_id=document_id,
+            batch_id=batch_id,
+            endpoint_type=endpoint_type,
+            total_files=total_files,
+            user_id=user_id,
+            status=status,
+            file_data=file_data,
+        )
+        if job_id:
+            job_data["id"] = job_id
+        if file_urls:
+            job_data.update(_file_url_columns(file_urls))
         
-        response = supabase.table("inbox_jobs").insert(job_data).execute()
+        response = _execute_insert(supabase.table("inbox_jobs").insert(job_data))
         
         if response.data and len(response.data) > 0:
             job_id = response.data[0]["id"]
@@ -123,40 +395,308 @@ def create_job(
         logger.error(f"Error creating job in Supabase: {e}")
         raise
 
+# Upper bound on rows per multi-row INSERT in create_jobs_batch
+JOB_INSERT_BATCH_SIZE = 1000
+
+def create_jobs_batch(job_specs: List[Dict]) -> List[str]:
+    """
+    Create several jobs (e.g. sibling jobs sharing a batch_id) with a single
+    multi-row insert instead of one create_job call per job.
+    
+    Args:
+        job_specs: List of dicts with the same keyword arguments as create_job
+                   (document_id, batch_id, endpoint_type, total_files, user_id, status)
+    
+    Returns:
+        List of job_ids (UUID strings), in the same order as job_specs
+    """
+    if not job_specs:
+        return []
+    
+    supabase = get_supabase()
+    if not supabase:
+        raise RuntimeError("Supabase not configured. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY")
+    
+    try:
+        rows = [_job_row(**spec) for spec in job_specs]
+        
+        # One INSERT per JOB_INSERT_BATCH_SIZE rows keeps each request body bounded
+        job_ids = []
+        for start in range(0, len(rows), JOB_INSERT_BATCH_SIZE):
+            chunk = rows[start:start + JOB_INSERT_BATCH_SIZE]
+            response = _execute_insert(supabase.table("inbox_jobs").insert(chunk))
+            
+            if not response.data or len(response.data) != len(chunk):
+                raise RuntimeError(f"Failed to create jobs: expected {len(chunk)} rows, got {len(response.data or [])}")
+            
+            job_ids.extend(row["id"] for row in response.data)
+        
+        logger.info(f"Created {len(job_ids)} jobs in Supabase")
+        return job_ids
+        
+    except Exception as e:
+        logger.error(f"Error creating jobs in Supabase: {e}")
+        raise
+
+# Results larger than this (serialized) are stored zlib-compressed. Per-file results repeat
+# the same keys over and over, so they shrink several-fold; set to 0 to disable.
+RESULT_COMPRESS_MIN_BYTES = int(os.getenv("RESULT_COMPRESS_MIN_BYTES", "4096"))
+# Compressed results are stored in the (JSONB) result column as {_COMPRESSED_RESULT_KEY: base64}
+_COMPRESSED_RESULT_KEY = "_zlib_b64"
+
+def _compress_result(result):
+    """Return the value to store in the result column, compressing it if it is large."""
+    if RESULT_COMPRESS_MIN_BYTES <= 0:
+        return result
+    serialized = _json_dumps(result)
+    if len(serialized) <= RESULT_COMPRESS_MIN_BYTES:
+        return result
+    # Level 1: almost all of the size win on repetitive JSON, at a fraction of the CPU
+    packed = base64.b64encode(zlib.compress(serialized, 1)).decode()
+    return {_COMPRESSED_RESULT_KEY: packed}
+
+def _decompress_result(job: Dict) -> Dict:
+    """Expand a compressed result column in place (no-op for plain results)."""
+    result = job.get("result")
+    if isinstance(result, dict) and _COMPRESSED_RESULT_KEY in result:
+        job["result"] = _json_loads(zlib.decompress(base64.b64decode(result[_COMPRESSED_RESULT_KEY])))
+    return job
+
+# Flipped off the first time PostgREST reports the update_job function missing, so an
+# undeployed migration costs one failed call per process rather than one per write
+_update_job_rpc_available = True
+
+def _write_job_status_rpc(supabase: Client, job_id: str, status: JobStatus, result: Optional[Dict],
+                          error: Optional[str], progress: Optional[int],
+                          processed_files: Optional[int]) -> bool:
+    """
+    Write a status update through the update_job RPC (see supabase_update_job_migration.sql).
+    
+    Unset (None) fields keep their current value, and the function ignores writes to a
+    job that has already completed, so a late progress tick can't reopen it.
+    
+    Returns:
+        True if the RPC ran, False if the caller should fall back to a plain UPDATE
+    """
+    global _update_job_rpc_available
+    if not _update_job_rpc_available:
+        return False
+    try:
+        _execute(supabase.rpc("update_job", {
+            "p_job_id": job_id,
+            "p_status": status.value,
+            "p_progress": progress,
+            "p_processed": processed_files,
+            "p_result": result,
+            "p_error": error,
+        }))
+        return True
+    except TRANSIENT_ERRORS:
+        raise
+    except Exception as e:
+        # PGRST202: function not found in the schema cache (migration not applied yet)
+        if getattr(e, "code", None) == "PGRST202":
+            _update_job_rpc_available = False
+            logger.warning("update_job RPC not deployed; falling back to PostgREST UPDATE for job status writes")
+        else:
+            logger.warning(f"update_job RPC failed for job {job_id}, falling back to UPDATE: {e}")
+        return False
+
 def update_job_status(job_id: str, status: JobStatus, result: Optional[Dict] = None,
                      error: Optional[str] = None, progress: Optional[int] = None,
                      processed_files: Optional[int] = None):
     """Update job status and result in Supabase"""
+    supabase = get_supabase()
     if not supabase:
         logger.warning("Supabase not configured. Cannot update job status.")
         return
     
+    # Skip a write identical to the one we just made (e.g. several files finishing
+    # within the same progress step). Writes carrying a result or error always go out.
+    write_key = (status.value, progress, processed_files)
+    if result is None and error is None:
+        with _job_cache_lock:
+            last = _last_status_write.get(job_id)
+        if last and last[0] == write_key and time.monotonic() - last[1] < STATUS_WRITE_DEBOUNCE_SECONDS:
+            logger.debug("Skipping duplicate status write for job %s: %s", job_id, write_key)
+            return
+    
     try:
-        update_data = {
-            "status": status.value,
-            "updated_at": datetime.utcnow().isoformat()
-        }
-        
-        if result is not None:
-            # Always serialize result to JSON string for consistency
-            # This ensures dict, list, str, etc. are all stored consistently
-            update_data["result"] = json.dumps(result)
+        # result is a JSONB column: pass the object as-is and let the client
+        # serialize it once (no string round-trip to parse on every read)
+        stored_result = _compress_result(result) if result is not None else None
         
-        if error is not None:
-            update_data["error"] = error
-        
-        if progress is not None:
-            update_data["progress"] = progress
-        
-        if processed_files is not None:
-            update_data["processed_files"] = processed_files
-        
-        supabase.table("inbox_jobs").update(update_data).eq("id", job_id).execute()
+        if not _write_job_status_rpc(supabase, job_id, status, stored_result, error, progress, processed_files):
+            update_data = {
+                "status": status.value
+            }
+            
+            if stored_result is not None:
+                update_data["result"] = stored_result
+            
+            if error is not None:
+                update_data["error"] = error
+            
+            if progress is not None:
+                update_data["progress"] = progress
+            
+            if processed_files is not None:
+                update_data["processed_files"] = processed_files
+            
+            # Nothing reads the updated row back, so ask PostgREST not to echo it
+            _execute(supabase.table("inbox_jobs").update(update_data, returning=ReturnMethod.minimal).eq("id", job_id))
+        invalidate_job_cache(job_id)
+        with _job_cache_lock:
+            _last_status_write[job_id] = (write_key, time.monotonic())
         logger.info(f"Updated job {job_id}: {status}, progress: {progress}%")
         
     except Exception as e:
         logger.error(f"Error updating job {job_id} in Supabase: {e}")
 
+async def aupdate_job_status(job_id: str, status: JobStatus, result: Optional[Dict] = None,
+                             error: Optional[str] = None, progress: Optional[int] = None,
+                             processed_files: Optional[int] = None):
+    """
+    Async variant of update_job_status for callers running inside an event loop.
+    The write runs on a worker thread over the shared connection pool, so
+    concurrent updates overlap their round-trips instead of blocking the loop.
+    
+    Any progress still buffered for this job (see queue_job_progress) is written
+    first, so a buffered tick can never land after - and overwrite - this update.
+    Only writes to the same job are ordered; other jobs' writes proceed concurrently.
+    """
+    async with _job_write_lock(job_id):
+        await _flush_job_progress(job_id)
+        await _run_db(
+            update_job_status,
+            job_id,
+            status,
+            result=result,
+            error=error,
+            progress=progress,
+            processed_files=processed_files,
+        )
+    if status in (JobStatus.COMPLETED, JobStatus.FAILED):
+        # Final write for this job; don't keep its lock around forever
+        _job_write_locks.pop(job_id, None)
+
+def increment_job_progress(job_id: str, delta: int = 1) -> Optional[Dict]:
+    """
+    Atomically add `delta` to a job's processed_files and recompute its progress
+    server-side via the increment_job_progress RPC (no read-modify-write race).
+    
+    Args:
+        job_id: Job ID
+        delta: Number of newly processed files
+    
+    Returns:
+        {"processed_files": ..., "progress": ...} after the update, or None if the
+        update could not be applied (e.g. RPC not deployed) and the caller should
+        fall back to update_job_status
+    """
+    supabase = get_supabase()
+    if not supabase:
+        logger.warning("Supabase not configured. Cannot update job progress.")
+        return None
+    
+    try:
+        response = supabase.rpc("increment_job_progress", {"job_id": job_id, "delta": delta}).execute()
+        invalidate_job_cache(job_id)
+        if not response.data:
+            return None
+        row = response.data[0] if isinstance(response.data, list) else response.data
+        logger.info(f"Updated job {job_id} progress: {row.get('progress')}% ({row.get('processed_files')} files)")
+        return row
+    except Exception as e:
+        # RPC not deployed yet (see supabase_increment_job_progress_migration.sql)
+        logger.warning(f"Could not increment progress for job {job_id} via RPC: {e}")
+        return None
+
+async def aincrement_job_progress(job_id: str, delta: int = 1) -> Optional[Dict]:
+    """Async variant of increment_job_progress (runs on a worker thread)."""
+    return await _run_db(increment_job_progress, job_id, delta)
+
+# Coalescing buffer for per-file progress ticks. Instead of one UPDATE per finished file,
+# ticks are merged per job and written by run_job_progress_flusher every
+# JOB_PROGRESS_FLUSH_INTERVAL seconds - a handful of round-trips per second at most.
+JOB_PROGRESS_FLUSH_INTERVAL = float(os.getenv("JOB_PROGRESS_FLUSH_INTERVAL_SECONDS", "0.25"))
+_pending_progress: Dict[str, Dict] = {}
+# Orders each job's writes (buffered progress before status updates). Per job, so one
+# job's round-trip never waits behind another's. Taking entries out of _pending_progress
+# is a synchronous dict.pop on the event loop and needs no lock of its own.
+_job_write_locks: Dict[str, asyncio.Lock] = {}
+_flusher_running = False
+
+def _job_write_lock(job_id: str) -> asyncio.Lock:
+    """Return the lock that serializes writes for one job."""
+    return _job_write_locks.setdefault(job_id, asyncio.Lock())
+
+async def queue_job_progress(job_id: str, processed_files: int, progress: int, delta: int = 1):
+    """
+    Record that `delta` more files of a job have been processed.
+    
+    Buffered while run_job_progress_flusher is running; otherwise written immediately.
+    Must be called from the event loop.
+    
+    Args:
+        job_id: Job ID
+        processed_files: Caller's local processed count (used if the RPC is unavailable)
+        progress: Caller's local progress percentage (used if the RPC is unavailable)
+        delta: Number of newly processed files
+    """
+    entry = _pending_progress.setdefault(job_id, {"delta": 0, "processed_files": 0, "progress": 0})
+    entry["delta"] += delta
+    entry["processed_files"] = max(entry["processed_files"], processed_files)
+    entry["progress"] = max(entry["progress"], progress)
+    
+    if not _flusher_running:
+        async with _job_write_lock(job_id):
+            await _flush_job_progress(job_id)
+
+async def _flush_job_progress(job_id: str):
+    """Write out (and clear) the buffered progress for one job, if any."""
+    entry = _pending_progress.pop(job_id, None)
+    if not entry:
+        return
+    # Counter is incremented in the database; only fall back to writing the local
+    # count if the RPC isn't available
+    if await aincrement_job_progress(job_id, entry["delta"]) is None:
+        await _run_db(
+            update_job_status,
+            job_id,
+            JobStatus.PROCESSING,
+            progress=entry["progress"],
+            processed_files=entry["processed_files"],
+        )
+
+async def _flush_job_progress_locked(job_id: str):
+    """_flush_job_progress under the job's write lock."""
+    async with _job_write_lock(job_id):
+        await _flush_job_progress(job_id)
+
+async def flush_job_progress():
+    """Write out all buffered progress, one write per job, concurrently."""
+    await asyncio.gather(*(_flush_job_progress_locked(job_id) for job_id in list(_pending_progress)))
+
+async def run_job_progress_flusher(interval: float = JOB_PROGRESS_FLUSH_INTERVAL):
+    """
+    Background task that periodically flushes buffered progress ticks.
+    Start it once per process (e.g. with asyncio.create_task) before queueing progress.
+    """
+    global _flusher_running
+    _flusher_running = True
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await flush_job_progress()
+            except Exception:
+                logger.exception("Error flushing buffered job progress")
+    finally:
+        _flusher_running = False
+        # Don't drop ticks that were queued right before shutdown
+        await flush_job_progress()
+
 def get_job(job_id: str, user_id: Optional[str] = None) -> Optional[Dict]:
     """
     Get job by ID from Supabase.
@@ -169,6 +709,13 @@ def get_job(job_id: str, user_id: Optional[str] = None) -> Optional[Dict]:
     Returns:
         Job dictionary if found and user matches (if user_id provided), None otherwise
     """
+    cached = _job_cache_get(job_id)
+    if cached is not None:
+        if user_id and cached.get("user_id") != user_id:
+            return None
+        return dict(cached)
+    
+    supabase = get_supabase()
     if not supabase:
         logger.warning("Supabase not configured. Cannot get job.")
         return None
@@ -184,27 +731,18 @@ def get_job(job_id: str, user_id: Optional[str] = None) -> Optional[Dict]:
         response = query.execute()
         
         if response.data and len(response.data) > 0:
-            job = response.data[0]
-            # Parse JSON result if present
-            if job.get("result") and isinstance(job["result"], str):
-                try:
-                    job["result"] = json.loads(job["result"])
-                except:
-                    pass
+            job = _decompress_result(response.data[0])
             
-            # Debug: Log what we got with more detail
-            file_storage_urls = job.get("file_storage_urls")
-            file_urls = job.get("file_urls")
-            logger.debug(f"get_job: Retrieved job {job_id}")
-            logger.debug(f"  - file_storage_urls present: {'file_storage_urls' in job}")
-            logger.debug(f"  - file_storage_urls type: {type(file_storage_urls)}")
-            logger.debug(f"  - file_storage_urls value: {str(file_storage_urls)[:200] if file_storage_urls else 'None'}")
-            logger.debug(f"  - file_urls present: {'file_urls' in job}")
-            logger.debug(f"  - file_urls type: {type(file_urls)}")
-            logger.debug(f"  - file_urls value: {file_urls}")
-            logger.debug(f"Retrieved job {job_id}, keys: {list(job.keys())}, file_storage_urls present: {'file_storage_urls' in job}")
-            return job
-        logger.debug(f"get_job: Job {job_id} not found in database")
+            # Debug: Log what we got (only formatted when DEBUG is on)
+            if logger.isEnabledFor(logging.DEBUG):
+                file_storage_urls = job.get("file_storage_urls")
+                logger.debug("get_job: Retrieved job %s, keys: %s", job_id, list(job.keys()))
+                logger.debug("  - file_storage_urls type: %s, value: %.200s",
+                             type(file_storage_urls), file_storage_urls)
+                logger.debug("  - file_urls: %s", job.get("file_urls"))
+            _job_cache_put(job_id, job)
+            return dict(job)
+        logger.debug("get_job: Job %s not found in database", job_id)
         return None
         
     except Exception as e:
@@ -213,41 +751,144 @@ def get_job(job_id: str, user_id: Optional[str] = None) -> Optional[Dict]:
         logger.error(traceback.format_exc())
         return None
 
-def get_jobs_by_user_id(user_id: str, status: Optional[str] = None, limit: int = 100) -> List[Dict]:
+# Columns for status checks. Leaves out file_storage_urls / file_urls / file_data / result,
+# which can be large JSON payloads the caller doesn't need.
+JOB_LIGHT_COLUMNS = "id,status,progress,processed_files,total_files,user_id,endpoint_type"
+# What GET /job/{job_id} reports: the light columns plus timestamps, result and error
+JOB_STATUS_COLUMNS = JOB_LIGHT_COLUMNS + ",created_at,updated_at,result,error"
+# Enough of JOB_STATUS_COLUMNS to tell whether a poller's copy is stale (see the /job ETag)
+JOB_POLL_COLUMNS = JOB_LIGHT_COLUMNS + ",created_at,updated_at"
+# What a status-only job list needs: no result/file payloads, so rows stay a few hundred bytes
+JOB_LIST_SUMMARY_COLUMNS = JOB_LIGHT_COLUMNS + ",created_at,updated_at,error"
+
+def get_job_light(job_id: str, user_id: Optional[str] = None, columns: str = JOB_LIGHT_COLUMNS) -> Optional[Dict]:
+    """
+    Get a subset of a job's columns by ID from Supabase.
+    Use this instead of get_job when the caller only needs status/progress fields.
+    
+    Args:
+        job_id: Job ID to retrieve
+        user_id: Optional user ID to verify ownership
+        columns: Comma-separated column list to select
+    
+    Returns:
+        Dictionary with the selected columns if found and user matches, None otherwise
+    """
+    # A cached full row already has every column we could ask for
+    cached = _job_cache_get(job_id)
+    if cached is not None:
+        if user_id and cached.get("user_id") != user_id:
+            return None
+        return {key: cached.get(key) for key in columns.split(",")}
+    
+    # Otherwise collapse repeated polls for the same projection
+    cached = _job_cache_get(job_id, columns)
+    if cached is not None and (not user_id or cached.get("user_id") == user_id):
+        return dict(cached)
+    
+    supabase = get_supabase()
+    if not supabase:
+        logger.warning("Supabase not configured. Cannot get job.")
+        return None
+    
+    try:
+        query = supabase.table("inbox_jobs").select(columns).eq("id", job_id)
+        if user_id:
+            query = query.eq("user_id", user_id)
+        
+        response = query.execute()
+        if not response.data:
+            return None
+        
+        job = _decompress_result(response.data[0])
+        _job_cache_put(job_id, job, columns, ttl=JOB_STATUS_CACHE_TTL_SECONDS)
+        return dict(job)
+        
+    except Exception:
+        logger.exception("Error getting job %s from Supabase", job_id)
+        return None
+
+def job_exists_for_user(job_id: str, user_id: str) -> bool:
     """
-    Get all jobs for a specific user_id.
+    Check that a job exists and belongs to user_id, without fetching any columns.
+    
+    Args:
+        job_id: Job ID to check
+        user_id: User ID that must own the job
+    
+    Returns:
+        True if the job exists and belongs to user_id, False otherwise
+    """
+    # A cached full row answers this without a round-trip
+    cached = _job_cache_get(job_id)
+    if cached is not None:
+        return cached.get("user_id") == user_id
+    
+    supabase = get_supabase()
+    if not supabase:
+        logger.warning("Supabase not configured. Cannot check job ownership.")
+        return False
+    
+    try:
+        # HEAD request with an exact count: the answer comes back in a header, no row payload
+        response = (
+            supabase.table("inbox_jobs")
+            .select("id", count="exact", head=True)
+            .eq("id", job_id)
+            .eq("user_id", user_id)
+            .execute()
+        )
+        return response.count == 1
+    except Exception:
+        logger.exception("Error checking ownership of job %s", job_id)
+        return False
+
+# get_job always returns the full row; this name makes that explicit at call sites
+get_job_full = get_job
+
+def get_jobs_by_user_id(user_id: str, status: Optional[str] = None, limit: int = 100,
+                        fields: Optional[str] = None, cursor: Optional[str] = None) -> List[Dict]:
+    """
+    Get all jobs for a specific user_id, newest first.
     
     Args:
         user_id: User ID to filter by
         status: Optional status filter (pending, processing, completed, failed)
         limit: Maximum number of jobs to return
+        fields: Optional PostgREST column list (e.g. JOB_LIST_SUMMARY_COLUMNS); defaults to "*"
+        cursor: Optional jobs_page_cursor() of the last job on the previous page; only jobs
+                after it in (created_at, id) order are returned (keyset pagination - served
+                from the user/created_at indexes, so later pages cost the same as the first,
+                unlike OFFSET). id breaks ties between jobs created in the same instant.
     
     Returns:
         List of job dictionaries
     """
+    supabase = get_supabase()
     if not supabase:
         logger.warning("Supabase not configured. Cannot get jobs.")
         return []
     
     try:
-        query = supabase.table("inbox_jobs").select("*").eq("user_id", user_id)
+        query = supabase.table("inbox_jobs").select(fields or "*").eq("user_id", user_id)
         
         if status:
             query = query.eq("status", status)
+        if cursor:
+            created_at, _, job_id = cursor.rpartition("|")
+            if created_at:
+                query = query.or_(f'created_at.lt."{created_at}",'
+                                  f'and(created_at.eq."{created_at}",id.lt."{job_id}")')
+            else:
+                # Cursor issued before ids were part of it
+                query = query.lt("created_at", job_id)
         
-        query = query.order("created_at", desc=True).limit(limit)
+        query = query.order("created_at", desc=True).order("id", desc=True).limit(limit)
         
         response = query.execute()
         
-        jobs = response.data if response.data else []
-        
-        # Parse JSON results
-        for job in jobs:
-            if job.get("result") and isinstance(job["result"], str):
-                try:
-                    job["result"] = json.loads(job["result"])
-                except:
-                    pass
+        # result is JSONB, so rows arrive already parsed (large results just need inflating)
+        jobs = [_decompress_result(job) for job in response.data or []]
         
         logger.info(f"Retrieved {len(jobs)} jobs for user_id {user_id}")
         return jobs
@@ -256,92 +897,201 @@ def get_jobs_by_user_id(user_id: str, status: Optional[str] = None, limit: int =
         logger.error(f"Error getting jobs for user_id {user_id} from Supabase: {e}")
         return []
 
+def jobs_page_cursor(job: Dict) -> str:
+    """Keyset cursor for get_jobs_by_user_id that resumes after `job`."""
+    return f"{job['created_at']}|{job['id']}"
+
+def _pop_pending_jobs(supabase: Client, limit: int) -> List[Dict]:
+    """Claim up to `limit` READY jobs in a single round-trip via the pop_pending_jobs RPC."""
+    response = supabase.rpc("pop_pending_jobs", {"lim": limit}).execute()
+    
+    jobs = response.data if response.data else []
+    if jobs:
+        for job in jobs:
+            invalidate_job_cache(job["id"])
+        logger.debug(f"Claimed {len(jobs)} pending job(s) from database")
+        for job in jobs:
+            logger.debug(f"  - Job {job.get('id')}: {job.get('endpoint_type')}, {job.get('total_files')} files, created: {job.get('created_at')}")
+    elif logger.isEnabledFor(logging.DEBUG):
+        # Debug: Check if there are any jobs at all
+        try:
+            all_jobs_response = supabase.table("inbox_jobs")\
+                .select("id,status,created_at")\
+                .order("created_at", desc=True)\
+                .limit(5)\
+                .execute()
+            all_jobs = all_jobs_response.data if all_jobs_response.data else []
+            if all_jobs:
+                logger.debug(f"DEBUG: No pending jobs, but found {len(all_jobs)} recent jobs with statuses:")
+                for job in all_jobs:
+                    logger.debug(f"  - Job {job.get('id')}: status={job.get('status')}, created={job.get('created_at')}")
+        except Exception as debug_error:
+            logger.debug(f"DEBUG: Could not check recent jobs: {debug_error}")
+    
+    return jobs
+
+def _claim_ready_jobs_fallback(supabase: Client, limit: int) -> List[Dict]:
+    """Legacy dispatch: select READY jobs, then claim each one individually."""
+    # claim_job returns the full row, so only the id is needed here
+    response = supabase.table("inbox_jobs")\
+        .select("id")\
+        .eq("status", JobStatus.READY.value)\
+        .order("created_at", desc=False)\
+        .limit(limit)\
+        .execute()
+    
+    claimed_jobs = []
+    for job in response.data or []:
+        claimed = claim_job(job["id"])
+        if claimed:
+            claimed_jobs.append(claimed)
+    return claimed_jobs
+
 def get_pending_jobs(limit: int = 10) -> List[Dict]:
     """
-    Get READY jobs from Supabase for worker to process.
+    Claim READY jobs from Supabase for worker to process.
     (Legacy name kept to minimize changes; READY is the only worker-visible state.)
     
+    Jobs are claimed atomically (READY -> PROCESSING) by the pop_pending_jobs RPC,
+    which uses FOR UPDATE SKIP LOCKED so concurrent workers get disjoint batches.
+    Returned jobs are already PROCESSING - callers must not claim them again.
+    
     Args:
-        limit: Maximum number of jobs to return
+        limit: Maximum number of jobs to claim
     
     Returns:
-        List of job dictionaries
+        List of claimed job dictionaries
     """
+    supabase = get_supabase()
     if not supabase:
         logger.warning("Supabase not configured. Cannot get pending jobs.")
         return []
     
     try:
-        response = supabase.table("inbox_jobs")\
-            .select("*")\
-            .eq("status", JobStatus.READY.value)\
-            .order("created_at", desc=False)\
-            .limit(limit)\
-            .execute()
-        
-        jobs = response.data if response.data else []
-        if jobs:
-            logger.debug(f"Found {len(jobs)} pending job(s) in database")
-            for job in jobs:
-                logger.debug(f"  - Job {job.get('id')}: {job.get('endpoint_type')}, {job.get('total_files')} files, created: {job.get('created_at')}")
-        else:
-            # Debug: Check if there are any jobs at all
-            try:
-                all_jobs_response = supabase.table("inbox_jobs")\
-                    .select("id,status,created_at")\
-                    .order("created_at", desc=True)\
-                    .limit(5)\
-                    .execute()
-                all_jobs = all_jobs_response.data if all_jobs_response.data else []
-                if all_jobs:
-                    logger.debug(f"DEBUG: No pending jobs, but found {len(all_jobs)} recent jobs with statuses:")
-                    for job in all_jobs:
-                        logger.debug(f"  - Job {job.get('id')}: status={job.get('status')}, created={job.get('created_at')}")
-            except Exception as debug_error:
-                logger.debug(f"DEBUG: Could not check recent jobs: {debug_error}")
-        
-        return jobs
+        return _pop_pending_jobs(supabase, limit)
         
     except Exception as e:
         error_msg = str(e)
-        logger.error(f"ERROR getting pending jobs: {error_msg}")
-        logger.error(f"Error getting pending jobs from Supabase: {e}")
         
-        # Check if it's a connection error - retry once
-        if "Network connection lost" in error_msg or "502" in error_msg or "gateway error" in error_msg.lower():
-            logger.debug("Retrying after connection error...")
-            import time
-            time.sleep(2)  # Wait 2 seconds before retry
+        # RPC not deployed yet (see supabase_pop_pending_jobs_migration.sql)
+        if "PGRST202" in error_msg or "pop_pending_jobs" in error_msg:
+            logger.warning("pop_pending_jobs RPC not found; falling back to select + claim_job")
             try:
-                response = supabase.table("inbox_jobs")\
-                    .select("*")\
-                    .eq("status", JobStatus.READY.value)\
-                    .order("created_at", desc=False)\
-                    .limit(limit)\
-                    .execute()
-                jobs = response.data if response.data else []
-                if jobs:
-                    logger.debug(f"Retry successful: Found {len(jobs)} pending job(s)")
-                return jobs
-            except Exception as retry_error:
-                logger.debug(f"Retry also failed: {retry_error}")
+                return _claim_ready_jobs_fallback(supabase, limit)
+            except Exception:
+                logger.exception("Error getting pending jobs from Supabase")
+                return []
+        
+        # No retry here: the claim is not idempotent, and if it committed before the
+        # response was lost a resend would claim a second batch. The next poll picks up
+        # whatever is still READY.
+        logger.error(f"Error getting pending jobs from Supabase: {e}")
         
         import traceback
         logger.debug(traceback.format_exc())
         return []
 
+async def subscribe_ready_jobs(callback):
+    """
+    Subscribe to Supabase Realtime changes that make a job worker-visible.
+    Lets the worker wake up as soon as a job becomes READY instead of waiting
+    out its poll interval. Realtime is only available on the async client.
+    
+    Args:
+        callback: Called with the change payload for each READY insert/update
+    
+    Returns:
+        The subscribed channel, or None if Realtime is unavailable
+    """
+    if not supabase_url or not supabase_key:
+        logger.warning("Supabase not configured. Cannot subscribe to job changes.")
+        return None
+    
+    try:
+        async_client = await acreate_client(supabase_url, supabase_key)
+        channel = async_client.channel("inbox_jobs_ready")
+        for event in ("INSERT", "UPDATE"):
+            channel.on_postgres_changes(
+                event,
+                schema="public",
+                table="inbox_jobs",
+                filter=f"status=eq.{JobStatus.READY.value}",
+                callback=callback,
+            )
+        await channel.subscribe()
+        logger.info("Subscribed to READY job notifications via Supabase Realtime")
+        return channel
+    except Exception:
+        logger.exception("Failed to subscribe to Supabase Realtime; falling back to polling only")
+        return None
+
+# One Realtime connection per process, shared by every job watcher (see subscribe_job_changes)
+_realtime_client = None
+_realtime_client_lock = asyncio.Lock()
+
+async def _get_realtime_client():
+    """Return this process's async Supabase client for Realtime, creating it on first use."""
+    global _realtime_client
+    async with _realtime_client_lock:
+        if _realtime_client is None:
+            _realtime_client = await acreate_client(supabase_url, supabase_key)
+    return _realtime_client
+
+async def subscribe_job_changes(job_id: str, callback):
+    """
+    Subscribe to Supabase Realtime updates of a single job row.
+    Used to push status changes to clients instead of having them poll.
+    
+    Args:
+        job_id: Job ID to watch
+        callback: Called with the change payload for each update of the row
+    
+    Returns:
+        The subscribed channel (release it with unsubscribe_job_changes),
+        or None if Realtime is unavailable
+    """
+    if not supabase_url or not supabase_key:
+        logger.warning("Supabase not configured. Cannot subscribe to job changes.")
+        return None
+    
+    try:
+        async_client = await _get_realtime_client()
+        # Channel topics must be unique per subscriber: several clients may watch one job
+        channel = async_client.channel(f"inbox_job_{job_id}_{os.urandom(4).hex()}")
+        channel.on_postgres_changes(
+            "UPDATE",
+            schema="public",
+            table="inbox_jobs",
+            filter=f"id=eq.{job_id}",
+            callback=callback,
+        )
+        await channel.subscribe()
+        return channel
+    except Exception:
+        logger.exception("Failed to subscribe to Realtime changes for job %s", job_id)
+        return None
+
+async def unsubscribe_job_changes(channel):
+    """Release a channel returned by subscribe_job_changes (None is ignored)."""
+    if channel is None:
+        return
+    try:
+        await _realtime_client.remove_channel(channel)
+    except Exception:
+        logger.warning("Failed to remove Realtime channel", exc_info=True)
+
 def claim_job(job_id: str) -> Optional[Dict]:
     """
     Atomically claim a READY job by transitioning it to PROCESSING.
     This enables safe multi-worker scaling.
     """
+    supabase = get_supabase()
     if not supabase:
         logger.warning("Supabase not configured. Cannot claim job.")
         return None
     try:
         update_data = {
-            "status": JobStatus.PROCESSING.value,
-            "updated_at": datetime.utcnow().isoformat(),
+            "status": JobStatus.PROCESSING.value
         }
         response = (
             supabase.table("inbox_jobs")
@@ -351,6 +1101,7 @@ def claim_job(job_id: str) -> Optional[Dict]:
             .execute()
         )
         if response.data and len(response.data) > 0:
+            invalidate_job_cache(job_id)
             logger.info(f"Claimed job {job_id} (READY -> PROCESSING)")
             return response.data[0]
         # Another worker got it (or job not READY)
@@ -362,6 +1113,22 @@ def claim_job(job_id: str) -> Optional[Dict]:
         logger.debug(traceback.format_exc())
         return None
 
+def _file_metadata(file_data: List[Dict]) -> List[Dict]:
+    """
+    Store only file metadata (paths, not content)
+    Structure: [{filename, file_path, suffix, size}, ...]
+    Drops 'content'/'bytes' fields if present to avoid storing large data
+    """
+    return [
+        {
+            "filename": file_info.get("filename"),
+            "file_path": file_info.get("file_path"),  # Path to file on disk
+            "suffix": file_info.get("suffix"),
+            "size": file_info.get("size", 0)  # File size in bytes
+        }
+        for file_info in file_data
+    ]
+
 def store_file_data(job_id: str, file_data: List[Dict]):
     """
     Store file metadata for a job in Supabase.
@@ -371,35 +1138,46 @@ def store_file_data(job_id: str, file_data: List[Dict]):
         job_id: Job ID
         file_data: List of file dictionaries with {filename, file_path, suffix, size}
     """
+    supabase = get_supabase()
     if not supabase:
         logger.warning("Supabase not configured. Cannot store file data.")
         return
     
     try:
-        # Store only file metadata (paths, not content)
-        # Structure: [{filename, file_path, suffix, size}, ...]
-        # Remove 'content' field if present to avoid storing large data
-        metadata = []
-        for file_info in file_data:
-            metadata.append({
-                "filename": file_info.get("filename"),
-                "file_path": file_info.get("file_path"),  # Path to file on disk
-                "suffix": file_info.get("suffix"),
-                "size": file_info.get("size", 0)  # File size in bytes
-            })
+        metadata = _file_metadata(file_data)
         
         update_data = {
-            "file_data": json.dumps(metadata),  # Store as JSON string
-            "updated_at": datetime.utcnow().isoformat()
+            "file_data": metadata,  # JSONB - stored as-is
         }
         
-        supabase.table("inbox_jobs").update(update_data).eq("id", job_id).execute()
+        supabase.table("inbox_jobs").update(update_data, returning=ReturnMethod.minimal).eq("id", job_id).execute()
+        invalidate_job_cache(job_id)
         logger.info(f"Stored file metadata for job {job_id} ({len(metadata)} files)")
         
     except Exception as e:
         logger.error(f"Error storing file data for job {job_id}: {e}")
         raise
 
+def _parse_maybe_double_encoded(value):
+    """
+    Decode a JSON value that may have been stored as a string - possibly a JSON
+    string containing JSON (double-encoded) - by rows written before the JSONB
+    migrations. Non-string values are returned unchanged.
+    
+    Returns:
+        The decoded value, or None if it isn't valid JSON
+    """
+    if not isinstance(value, str):
+        return value
+    try:
+        value = _json_loads(value)
+        if isinstance(value, str):
+            value = _json_loads(value)
+        return value
+    except ValueError:
+        # orjson.JSONDecodeError subclasses ValueError too
+        return None
+
 def get_file_data(job_id: str) -> Optional[List[Dict]]:
     """
     Retrieve file data for a job from Supabase.
@@ -410,6 +1188,7 @@ def get_file_data(job_id: str) -> Optional[List[Dict]]:
     Returns:
         List of file dictionaries with {filename, file_path, suffix, size}
     """
+    supabase = get_supabase()
     if not supabase:
         logger.warning("Supabase not configured. Cannot get file data.")
         return None
@@ -421,43 +1200,19 @@ def get_file_data(job_id: str) -> Optional[List[Dict]]:
             return None
         
         # Preferred: full metadata
-        file_storage_urls = job.get("file_storage_urls")
-        if file_storage_urls is not None and file_storage_urls != "":
-            # CRITICAL: Handle both list and string formats
-            # Postgres may store JSONB as TEXT (string) instead of parsed JSON
-            if isinstance(file_storage_urls, str):
-                try:
-                    # Parse JSON string - handles both single and double-encoded cases
-                    file_storage_urls = json.loads(file_storage_urls)
-                    logger.debug(f"Parsed file_storage_urls from JSON string for job {job_id}")
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse file_storage_urls JSON for job {job_id}: {e}")
-                    logger.error(f"Raw value (first 500 chars): {file_storage_urls[:500]}")
-                    # Try handling double-encoded case (escaped quotes)
-                    try:
-                        # Remove outer quotes if present and unescape
-                        cleaned = file_storage_urls.strip()
-                        if cleaned.startswith('"') and cleaned.endswith('"'):
-                            cleaned = cleaned[1:-1]
-                        cleaned = cleaned.replace('\\"', '"').replace('\\n', '\n').replace('\\\\', '\\')
-                        file_storage_urls = json.loads(cleaned)
-                        logger.debug(f"Successfully parsed after cleaning double-encoded JSON for job {job_id}")
-                    except Exception as e2:
-                        logger.error(f"Failed to parse even after cleaning: {e2}")
-                        file_storage_urls = None
-            
-            # After parsing (or if already a list), check if it's valid
-            if isinstance(file_storage_urls, list) and len(file_storage_urls) > 0:
-                logger.debug(f"SUCCESS: Found file_storage_urls for job {job_id} ({len(file_storage_urls)} files)")
-                logger.info(f"Retrieved file storage URLs for job {job_id} ({len(file_storage_urls)} files)")
-                return file_storage_urls
-            elif file_storage_urls is not None:
-                logger.warning(f"file_storage_urls for job {job_id} is not a list or is empty: {type(file_storage_urls)}")
+        # file_storage_urls is a JSONB column, so PostgREST hands it back as a list already
+        # (rows from before the migration may still hold a string)
+        file_storage_urls = _parse_maybe_double_encoded(job.get("file_storage_urls"))
+        if isinstance(file_storage_urls, list) and len(file_storage_urls) > 0:
+            logger.info(f"Retrieved file storage URLs for job {job_id} ({len(file_storage_urls)} files)")
+            return file_storage_urls
+        elif file_storage_urls is not None:
+            logger.warning(f"file_storage_urls for job {job_id} is not a list or is empty: {type(file_storage_urls)}")
         
         # Fallback: simple list of paths
         file_urls = job.get("file_urls")
         if file_urls and isinstance(file_urls, list) and len(file_urls) > 0:
-            logger.debug(f"SUCCESS: Found file_urls for job {job_id} ({len(file_urls)} files), converting to full format")
+            logger.debug("Found file_urls for job %s (%d files), converting to full format", job_id, len(file_urls))
             # Convert simple file paths to full format
             file_data = []
             for file_path in file_urls:
@@ -466,7 +1221,7 @@ def get_file_data(job_id: str) -> Optional[List[Dict]]:
                     file_data.append({
                         "filename": filename,
                         "file_path": file_path,
-                        "suffix": Path(filename).suffix if filename else "",
+                        "suffix": file_suffix(filename) if filename else "",
                         "size": None
                     })
             if file_data:
@@ -474,47 +1229,46 @@ def get_file_data(job_id: str) -> Optional[List[Dict]]:
                 return file_data
         
         # Fallback to old format: file_data (local filesystem)
-        file_data_old = job.get("file_data")
+        file_data_old = _parse_maybe_double_encoded(job.get("file_data"))
         if file_data_old:
-            if isinstance(file_data_old, str):
-                try:
-                    file_data_old = json.loads(file_data_old)
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse file_data JSON for job {job_id}: {e}")
-                    return None
             if isinstance(file_data_old, list) and len(file_data_old) > 0:
                 logger.info(f"Retrieved file paths for job {job_id} using old format ({len(file_data_old)} files)")
                 return file_data_old
         
+        # Files may still be uploading from another process; don't let the cached
+        # row hide them from the caller's next retry
+        invalidate_job_cache(job_id)
+        
         # Log error with details
-        logger.warning(f"ERROR: No file data found for job {job_id}")
-        logger.debug(f"  - file_storage_urls: {file_storage_urls} (type: {type(file_storage_urls)})")
-        logger.debug(f"  - file_urls: {file_urls} (type: {type(file_urls)})")
-        logger.debug(f"  - file_data: {file_data_old} (type: {type(file_data_old)})")
-        logger.debug(f"  - All job keys: {list(job.keys())}")
         logger.warning(f"No file data found for job {job_id}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("  - file_storage_urls: %s (type: %s)", file_storage_urls, type(file_storage_urls))
+            logger.debug("  - file_urls: %s (type: %s)", file_urls, type(file_urls))
+            logger.debug("  - file_data: %s (type: %s)", file_data_old, type(file_data_old))
+            logger.debug("  - All job keys: %s", list(job.keys()))
         return None
         
-    except Exception as e:
-        logger.error(f"Error getting file data for job {job_id}: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+    except Exception:
+        logger.exception("Error getting file data for job %s", job_id)
         return None
 
-def upload_file_to_storage(job_id: str, filename: str, file_bytes: bytes, bucket_name: str = "inbox-files") -> Optional[str]:
+def upload_file_to_storage(job_id: str, filename: str, file_bytes: Union[bytes, str, Path],
+                           bucket_name: str = "inbox-files") -> Optional[str]:
     """
     Upload a file to Supabase Storage and return the file path.
     
     Args:
         job_id: Job ID (used in file path)
         filename: Original filename
-        file_bytes: File content as bytes
+        file_bytes: File content as bytes, or the path of a local file - which is
+            streamed from disk in chunks instead of being loaded into memory
         bucket_name: Storage bucket name (default: "inbox-files")
     
     Returns:
         File path (e.g., "job_id/filename") for storage in database, or None if upload failed.
         Use create_signed_url() to generate temporary signed URLs when needed.
     """
+    supabase = get_supabase()
     if not supabase:
         logger.warning("Supabase not configured. Cannot upload file to storage.")
         return None
@@ -522,22 +1276,18 @@ def upload_file_to_storage(job_id: str, filename: str, file_bytes: bytes, bucket
     try:
         # Sanitize filename to remove invalid characters for Supabase Storage
         # Supabase Storage doesn't allow: ~, spaces, and some special characters
-        import re
-        from pathlib import Path
-        
-        # Get file extension
-        file_path = Path(filename)
-        file_extension = file_path.suffix
-        file_stem = file_path.stem
-        
-        # Sanitize filename: remove/replace invalid characters
-        # Replace spaces, tildes, and other problematic chars with underscores
-        sanitized_stem = re.sub(r'[~<>:"|?*\s]', '_', file_stem)
-        # Remove any remaining problematic characters
-        sanitized_stem = re.sub(r'[^\w\-_.]', '_', sanitized_stem)
-        # Limit length to avoid issues
-        if len(sanitized_stem) > 200:
-            sanitized_stem = sanitized_stem[:200]
+        
+        # Split off the file extension (plain string split - no Path object per upload)
+        file_stem, dot, file_extension = filename.rpartition('.')
+        if not dot or not file_stem:
+            # No extension, or a dotfile like ".env"
+            file_stem, file_extension = filename, ""
+        else:
+            file_extension = dot + file_extension
+        
+        # Sanitize filename: replace spaces, tildes and any other problematic
+        # characters with underscores, and limit length to avoid issues
+        sanitized_stem = _UNSAFE_FILENAME_CHARS_RE.sub('_', file_stem)[:200]
         
         sanitized_filename = sanitized_stem + file_extension
         
@@ -551,11 +1301,22 @@ def upload_file_to_storage(job_id: str, filename: str, file_bytes: bytes, bucket
         # Upload file to Supabase Storage
         logger.debug(f"upload_file_to_storage: Uploading {filename} to {storage_path}...")
         try:
-            response = supabase.storage.from_(bucket_name).upload(
-                path=storage_path,
-                file=file_bytes,
-                file_options={"content-type": "application/octet-stream", "upsert": "true"}
-            )
+            content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            from_disk = isinstance(file_bytes, (str, Path))
+            with open(file_bytes, "rb") if from_disk else nullcontext(file_bytes) as body:
+                # Storage 429/5xx responses are retried too (with longer waits) before the
+                # caller gives up and falls back to local disk
+                @retry_transient(initial=1.0, max_delay=4.0, retry_if=_is_retryable_status_error)
+                def send():
+                    if from_disk:
+                        body.seek(0)  # a retry re-sends the whole file
+                    # upsert makes the upload idempotent, so it is safe to retry
+                    return supabase.storage.from_(bucket_name).upload(
+                        path=storage_path,
+                        file=body,
+                        file_options={"content-type": content_type, "upsert": "true"}
+                    )
+                response = send()
             logger.debug(f"upload_file_to_storage: Upload response: {response}")
         except Exception as upload_error:
             logger.error(f"ERROR: Upload failed: {upload_error}")
@@ -584,6 +1345,31 @@ def upload_file_to_storage(job_id: str, filename: str, file_bytes: bytes, bucket
         logger.error(traceback.format_exc())
         return None
 
+async def upload_files_to_storage(job_id: str, files: List[Tuple[str, Union[bytes, str, Path]]],
+                                  bucket_name: str = "inbox-files",
+                                  max_concurrency: int = 8) -> List[Optional[str]]:
+    """
+    Upload several files to Supabase Storage concurrently.
+    Each upload runs on a worker thread over the shared connection pool, so
+    per-file round-trips overlap instead of adding up.
+    
+    Args:
+        job_id: Job ID (used in file paths)
+        files: List of (filename, file_bytes) tuples; file_bytes may be a local file path
+        bucket_name: Storage bucket name (default: "inbox-files")
+        max_concurrency: Maximum number of uploads in flight at once
+    
+    Returns:
+        File paths in the same order as `files` (None where the upload failed)
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def upload_one(filename: str, file_bytes: Union[bytes, str, Path]) -> Optional[str]:
+        async with semaphore:
+            return await asyncio.to_thread(upload_file_to_storage, job_id, filename, file_bytes, bucket_name)
+    
+    return await asyncio.gather(*(upload_one(filename, file_bytes) for filename, file_bytes in files))
+
 def create_signed_url(file_path: str, expires_in: int = 3600, bucket_name: str = "inbox-files") -> Optional[str]:
     """
     Create a signed URL for a file in Supabase Storage.
@@ -596,6 +1382,7 @@ def create_signed_url(file_path: str, expires_in: int = 3600, bucket_name: str =
     Returns:
         Signed URL string, or None if creation failed
     """
+    supabase = get_supabase()
     if not supabase:
         logger.warning("Supabase not configured. Cannot create signed URL.")
         return None
@@ -626,6 +1413,29 @@ def create_signed_url(file_path: str, expires_in: int = 3600, bucket_name: str =
         logger.error(traceback.format_exc())
         return None
 
+def _url_to_storage_path(url: Optional[str], bucket_name: str = "inbox-files") -> Optional[str]:
+    """
+    Turn a stored file reference into a bucket-relative storage path.
+    
+    Accepts either a plain path ("job_id/filename") or a legacy public URL
+    (https://.../object/public/<bucket>/job_id/filename).
+    
+    Returns:
+        Storage path, or None if a URL doesn't point into the bucket
+    """
+    if not url:
+        return None
+    if not url.startswith("http"):
+        # Already a path, not a URL
+        return url
+    parts = url.split(f"/object/public/{bucket_name}/")
+    if len(parts) > 1:
+        return parts[1]
+    # Fallback: try to extract from any URL format
+    if f"/{bucket_name}/" in url:
+        return url.split(f"/{bucket_name}/")[-1]
+    return None
+
 def download_file_from_storage(file_path: str, bucket_name: str = "inbox-files") -> Optional[bytes]:
     """
     Download a file from Supabase Storage using file path.
@@ -637,6 +1447,7 @@ def download_file_from_storage(file_path: str, bucket_name: str = "inbox-files")
     Returns:
         File content as bytes, or None if download failed
     """
+    supabase = get_supabase()
     if not supabase:
         logger.warning("Supabase not configured. Cannot download file from storage.")
         return None
@@ -665,87 +1476,74 @@ def download_file_from_storage(file_path: str, bucket_name: str = "inbox-files")
         logger.error(traceback.format_exc())
         return None
 
-def store_file_storage_urls(job_id: str, file_urls: List[Dict]):
+def _file_url_columns(file_urls: List[Dict]) -> Dict:
+    """The file_storage_urls/file_urls column values for a list of uploaded files."""
+    # Extract file paths for simple array (prefer file_path over storage_url for backward compat)
+    simple_paths = []
+    for f in file_urls:
+        # Full URLs are reduced to their path part; skip anything we can't extract
+        file_path = _url_to_storage_path(f.get("file_path") or f.get("storage_url"))  # Support both for migration
+        if file_path:
+            simple_paths.append(file_path)
+    
+    # Store both formats: full metadata + simple paths
+    return {
+        "file_storage_urls": file_urls,  # Full metadata (JSONB) - for compatibility
+        "file_urls": simple_paths,        # Simple file paths array (TEXT[]) - for easy access
+    }
+
+def finalize_upload(job_id: str, file_urls: List[Dict], status: Optional[JobStatus] = JobStatus.READY):
     """
-    Store file paths for a job in Supabase.
+    Store file paths for a job and (optionally) move it to `status` in a single update.
     Stores both formats:
     - file_storage_urls: Full metadata (JSONB) with file_path - for compatibility
     - file_urls: Simple array of file paths (TEXT[]) - for easy worker access
     
+    Writing the paths and the status together means the job can't become
+    worker-visible without its inputs, and saves a second round-trip.
+    
     Args:
         job_id: Job ID
         file_urls: List of file dictionaries with {filename, file_path, suffix, size}
                    Note: file_path format is "job_id/filename" (not public URL)
+        status: Status to set in the same write (progress/processed_files reset to 0),
+                or None to leave status untouched
     """
-    logger.debug(f"store_file_storage_urls: Starting for job {job_id} with {len(file_urls)} files")
+    logger.debug("finalize_upload: Starting for job %s with %d files", job_id, len(file_urls))
     
+    supabase = get_supabase()
     if not supabase:
-        logger.error(f"ERROR: Supabase not configured. Cannot store file paths for job {job_id}")
-        logger.warning("Supabase not configured. Cannot store file paths.")
+        logger.warning(f"Supabase not configured. Cannot store file paths for job {job_id}")
         return
     
     try:
-        # Extract file paths for simple array (prefer file_path over storage_url for backward compat)
-        simple_paths = []
-        for f in file_urls:
-            file_path = f.get("file_path") or f.get("storage_url")  # Support both for migration
-            if file_path:
-                # If it's a full URL, extract the path part
-                if file_path.startswith("http"):
-                    # Extract path from URL: https://.../object/public/bucket/path
-                    parts = file_path.split("/object/public/inbox-files/")
-                    if len(parts) > 1:
-                        file_path = parts[1]
-                    else:
-                        # Skip if we can't extract path
-                        continue
-                simple_paths.append(file_path)
-        
-        logger.debug(f"store_file_storage_urls: Extracted {len(simple_paths)} file paths for simple format")
-        
-        # Store both formats: full metadata + simple paths
-        logger.debug(f"store_file_storage_urls: Storing {len(file_urls)} files directly as list (not JSON string)")
+        update_data = _file_url_columns(file_urls)
+        if status is not None:
+            update_data["status"] = status.value
+            update_data["progress"] = 0
+            update_data["processed_files"] = 0
         
-        update_data = {
-            "file_storage_urls": file_urls,  # Full metadata (JSONB) - for compatibility
-            "file_urls": simple_paths,        # Simple file paths array (TEXT[]) - for easy access
-            "updated_at": datetime.utcnow().isoformat()
-        }
+        # file_storage_urls is JSONB: pass the list as-is so it is serialized exactly once.
+        # return=minimal stops PostgREST echoing the (potentially large) row back.
+        _execute(supabase.table("inbox_jobs").update(update_data, returning=ReturnMethod.minimal).eq("id", job_id))
+        invalidate_job_cache(job_id)
         
-        logger.debug(f"store_file_storage_urls: Updating database for job {job_id}...")
-        result = supabase.table("inbox_jobs").update(update_data).eq("id", job_id).execute()
-        logger.debug(f"store_file_storage_urls: Database update completed for job {job_id}")
-        
-        # Verify it was stored correctly by reading it back
-        logger.debug(f"store_file_storage_urls: Verifying storage for job {job_id}...")
-        verify_job = get_job(job_id)
-        if verify_job:
-            stored_value = verify_job.get("file_storage_urls")
-            logger.debug(f"store_file_storage_urls: Retrieved value type: {type(stored_value)}, is None: {stored_value is None}")
-            if stored_value is not None:
-                logger.debug(f"store_file_storage_urls: Stored value length: {len(str(stored_value))}")
-                logger.debug(f"store_file_storage_urls: First 200 chars: {str(stored_value)[:200]}")
-            if isinstance(stored_value, str) and stored_value.startswith('"'):
-                # Still stored as string, try alternative method
-                logger.warning(f"WARNING: Value still stored as string for job {job_id}")
-                logger.warning(f"Value still stored as string for job {job_id}, trying alternative method")
-                # Use raw SQL via RPC (if available) or direct SQL
-                # For now, the parsing code should handle the string format
-                pass
+        if status is not None:
+            logger.info(f"Stored file storage URLs for job {job_id} ({len(file_urls)} files), status: {status}")
         else:
-            logger.error(f"ERROR: Could not verify job {job_id} after storage")
-        
-        logger.debug(f"SUCCESS: Stored file storage URLs for job {job_id} ({len(file_urls)} files)")
-        logger.info(f"Stored file storage URLs for job {job_id} ({len(file_urls)} files)")
+            logger.info(f"Stored file storage URLs for job {job_id} ({len(file_urls)} files)")
         
-    except Exception as e:
-        logger.error(f"ERROR: Exception storing file storage URLs for job {job_id}: {e}")
-        import traceback
-        logger.debug(traceback.format_exc())
-        logger.error(f"Error storing file storage URLs for job {job_id}: {e}")
-        logger.error(traceback.format_exc())
+    except Exception:
+        logger.exception("Error storing file storage URLs for job %s", job_id)
         raise
 
+def store_file_storage_urls(job_id: str, file_urls: List[Dict]):
+    """
+    Store file paths for a job in Supabase without changing its status.
+    Kept for backward compatibility; see finalize_upload.
+    """
+    finalize_upload(job_id, file_urls, status=None)
+
 def reset_failed_job(job_id: str) -> bool:
     """
     Reset a failed job back to pending status so it can be retried.
@@ -756,21 +1554,12 @@ def reset_failed_job(job_id: str) -> bool:
     Returns:
         True if successful, False otherwise
     """
+    supabase = get_supabase()
     if not supabase:
         logger.warning("Supabase not configured. Cannot reset job.")
         return False
     
     try:
-        # Check if job exists and is failed
-        job = get_job(job_id)
-        if not job:
-            logger.warning(f"Job {job_id} not found")
-            return False
-        
-        if job.get("status") != JobStatus.FAILED:
-            logger.warning(f"Job {job_id} is not in failed status (current: {job.get('status')})")
-            return False
-        
         # Reset to READY so a worker can pick it up again
         # (Only do this if inputs already exist; API uses CREATED -> READY gating.)
         update_data = {
@@ -778,96 +1567,202 @@ def reset_failed_job(job_id: str) -> bool:
             "error": None,  # Clear error
             "progress": 0,  # Reset progress
             "processed_files": 0,  # Reset processed files
-            "updated_at": datetime.utcnow().isoformat()
         }
         
-        supabase.table("inbox_jobs").update(update_data).eq("id", job_id).execute()
+        # Conditional update: only matches if the job exists AND is failed, so the
+        # existence check and the write are a single round-trip with no race between them
+        response = (
+            supabase.table("inbox_jobs")
+            .update(update_data)
+            .eq("id", job_id)
+            .eq("status", JobStatus.FAILED.value)
+            .execute()
+        )
+        if not response.data:
+            logger.warning(f"Job {job_id} not found or not in failed status")
+            return False
+        invalidate_job_cache(job_id)
+        
         logger.info(f"Reset job {job_id} from failed to pending")
         return True
         
-    except Exception as e:
-        logger.error(f"Error resetting job {job_id}: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+    except Exception:
+        logger.exception("Error resetting job %s", job_id)
         return False
 
-def delete_job(job_id: str) -> bool:
+# Background pool for on-disk cleanup (see delete_job)
+CLEANUP_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cleanup")
+
+def _remove_job_dir(job_id: str, job_dir: Path):
+    """Remove a deleted job's temp directory (runs on CLEANUP_EXECUTOR)."""
+    try:
+        shutil.rmtree(job_dir)
+        logger.info(f"Cleaned up files for deleted job {job_id}")
+    except Exception as cleanup_error:
+        logger.warning(f"Failed to clean up files for deleted job {job_id}: {cleanup_error}")
+
+def delete_job(job_id: str, user_id: Optional[str] = None) -> bool:
     """
     Delete a job from Supabase.
     
     Args:
         job_id: Job ID to delete
+        user_id: Optional user ID; if given, the job is only deleted if it belongs to
+                 this user (checked in the same DELETE, not a separate lookup)
     
     Returns:
-        True if deleted, False if not found
+        True if deleted, False if not found (or owned by another user)
     """
+    supabase = get_supabase()
     if not supabase:
         logger.warning("Supabase not configured. Cannot delete job.")
         return False
     
     try:
-        # Check if job exists first
-        job = get_job(job_id)
-        if not job:
+        # Delete the job; PostgREST returns the deleted row, which tells us whether the job
+        # existed and gives us its file list without a separate SELECT first
+        query = supabase.table("inbox_jobs").delete().eq("id", job_id)
+        if user_id:
+            query = query.eq("user_id", user_id)
+        response = query.execute()
+        invalidate_job_cache(job_id)
+        if not response.data:
             return False
+        job = response.data[0]
+        logger.info(f"Deleted job {job_id} from Supabase")
         
         # Delete files from Supabase Storage if they exist
         try:
             file_urls = job.get("file_storage_urls")
             if file_urls:
-                if isinstance(file_urls, str):
-                    file_urls = json.loads(file_urls)
-                
                 bucket_name = "inbox-files"
-                for file_info in file_urls:
-                    # Priority 1: Use file_path (new format)
-                    storage_path = file_info.get("file_path")
-                    
-                    # Priority 2: Extract from storage_url (legacy format)
-                    if not storage_path:
-                        storage_url = file_info.get("storage_url")
-                        if storage_url:
-                            # Extract storage path from URL
-                            if storage_url.startswith("http"):
-                                parts = storage_url.split(f"/object/public/{bucket_name}/")
-                                if len(parts) > 1:
-                                    storage_path = parts[1]
-                                else:
-                                    # Fallback: try to extract from any URL format
-                                    if f"/{bucket_name}/" in storage_url:
-                                        storage_path = storage_url.split(f"/{bucket_name}/")[-1]
-                            else:
-                                # Already a path, not a URL
-                                storage_path = storage_url
-                    
-                    if storage_path:
-                        try:
-                            supabase.storage.from_(bucket_name).remove([storage_path])
-                            logger.info(f"Deleted file from storage: {storage_path}")
-                        except Exception as e:
-                            logger.warning(f"Failed to delete file from storage {storage_path}: {e}")
+                # Prefer file_path (new format), fall back to storage_url (legacy format)
+                storage_paths = [
+                    p for p in (
+                        _url_to_storage_path(f.get("file_path") or f.get("storage_url"), bucket_name)
+                        for f in file_urls
+                    ) if p
+                ]
+                if storage_paths:
+                    # Storage accepts a list of paths, so remove everything in one request
+                    supabase.storage.from_(bucket_name).remove(storage_paths)
+                    logger.info(f"Deleted {len(storage_paths)} file(s) from storage for job {job_id}")
         except Exception as storage_cleanup_error:
             logger.warning(f"Failed to clean up storage files for job {job_id}: {storage_cleanup_error}")
         
-        # Delete the job
-        supabase.table("inbox_jobs").delete().eq("id", job_id).execute()
-        logger.info(f"Deleted job {job_id} from Supabase")
-        
-        # Also clean up files on disk if they still exist (backward compatibility)
-        try:
-            import shutil
-            from pathlib import Path
-            import tempfile
-            job_dir = Path(tempfile.gettempdir()) / "inbox_jobs" / job_id
-            if job_dir.exists():
-                shutil.rmtree(job_dir)
-                logger.info(f"Cleaned up files for deleted job {job_id}")
-        except Exception as cleanup_error:
-            logger.warning(f"Failed to clean up files for deleted job {job_id}: {cleanup_error}")
+        # Also clean up files on disk if they still exist (backward compatibility).
+        # Removing a large job directory can take a while, so it runs in the background
+        # and the caller gets its answer as soon as the row and storage files are gone.
+        job_dir = LOCAL_JOBS_ROOT / job_id
+        if job_dir.exists():
+            CLEANUP_EXECUTOR.submit(_remove_job_dir, job_id, job_dir)
         
         return True
         
-    except Exception as e:
-        logger.error(f"Error deleting job {job_id} from Supabase: {e}")
+    except Exception:
+        logger.exception("Error deleting job %s from Supabase", job_id)
         return False
 
+def match_routing_cache(embedding: List[float], max_distance: float, user_id: str) -> Optional[Dict]:
+    """
+    Find a cached routing decision for a near-identical document of the same user.
+    Needs supabase_routing_cache_migration.sql.
+    
+    Args:
+        embedding: The document's text-embedding-3-small vector
+        max_distance: Largest cosine distance (1 - similarity) that counts as a match
+        user_id: Owner of the document; only their own entries are considered
+    
+    Returns:
+        The cached classify_document result, or None if nothing is close enough
+    """
+    supabase = get_supabase()
+    if not supabase:
+        return None
+    
+    try:
+        response = _execute(supabase.rpc(
+            "match_routing_cache",
+            {"query_embedding": embedding, "max_distance": max_distance, "owner_id": user_id}
+        ))
+        if not response.data:
+            return None
+        return response.data[0]["payload"]
+    except Exception:
+        logger.exception("Error querying routing cache")
+        return None
+
+def store_routing_cache(embedding: List[float], payload: Dict, user_id: str):
+    """Store a user's routing decision under its document embedding (see match_routing_cache)."""
+    supabase = get_supabase()
+    if not supabase:
+        return
+    
+    try:
+        supabase.table("routing_cache").insert(
+            {"user_id": user_id, "embedding": embedding, "payload": payload}, returning=ReturnMethod.minimal
+        ).execute()
+    except Exception:
+        logger.exception("Error storing routing cache entry")
+
+# ============================================================================
+# ASYNC VARIANTS - supabase-py is synchronous, so event-loop callers (FastAPI
+# routes, the worker loop) run these on DB_EXECUTOR instead of blocking the
+# loop for a full round-trip. Concurrent calls share the pooled HTTP client.
+# ============================================================================
+
+async def acreate_job(*args, **kwargs) -> str:
+    """Async variant of create_job."""
+    return await _run_db(create_job, *args, **kwargs)
+
+async def aget_job(*args, **kwargs) -> Optional[Dict]:
+    """Async variant of get_job."""
+    return await _run_db(get_job, *args, **kwargs)
+
+async def aget_job_light(*args, **kwargs) -> Optional[Dict]:
+    """Async variant of get_job_light."""
+    return await _run_db(get_job_light, *args, **kwargs)
+
+async def ajob_exists_for_user(*args, **kwargs) -> bool:
+    """Async variant of job_exists_for_user."""
+    return await _run_db(job_exists_for_user, *args, **kwargs)
+
+async def aget_jobs_by_user_id(*args, **kwargs) -> List[Dict]:
+    """Async variant of get_jobs_by_user_id."""
+    return await _run_db(get_jobs_by_user_id, *args, **kwargs)
+
+async def aget_pending_jobs(*args, **kwargs) -> List[Dict]:
+    """Async variant of get_pending_jobs."""
+    return await _run_db(get_pending_jobs, *args, **kwargs)
+
+async def astore_file_data(*args, **kwargs):
+    """Async variant of store_file_data."""
+    return await _run_db(store_file_data, *args, **kwargs)
+
+async def aget_file_data(*args, **kwargs) -> Optional[List[Dict]]:
+    """Async variant of get_file_data."""
+    return await _run_db(get_file_data, *args, **kwargs)
+
+async def afinalize_upload(*args, **kwargs):
+    """Async variant of finalize_upload."""
+    return await _run_db(finalize_upload, *args, **kwargs)
+
+async def adelete_job(*args, **kwargs) -> bool:
+    """Async variant of delete_job."""
+    return await _run_db(delete_job, *args, **kwargs)
+
+async def acreate_signed_url(*args, **kwargs) -> Optional[str]:
+    """Async variant of create_signed_url."""
+    return await _run_db(create_signed_url, *args, **kwargs)
+
+async def adownload_file_from_storage(*args, **kwargs) -> Optional[bytes]:
+    """Async variant of download_file_from_storage."""
+    return await _run_db(download_file_from_storage, *args, **kwargs)
+
+async def amatch_routing_cache(*args, **kwargs) -> Optional[Dict]:
+    """Async variant of match_routing_cache."""
+    return await _run_db(match_routing_cache, *args, **kwargs)
+
+async def astore_routing_cache(*args, **kwargs):
+    """Async variant of store_routing_cache."""
+    return await _run_db(store_routing_cache, *args, **kwargs)
@@ -5,22 +5,27 @@ import asyncio
 import time
 import signal
 import sys
-import traceback
 import psutil
 import uuid
+import zlib
+import shutil
+import functools
+from contextlib import suppress
 from pathlib import Path
 from typing import List, Dict, Optional
-from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from enum import Enum
+import orjson
 from dotenv import load_dotenv
 from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request as StarletteRequest
 from starlette.responses import Response
-from slowapi import Limiter, _rate_limit_exceeded_handler
+from starlette.datastructures import Headers, MutableHeaders
+from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 import textract_service
@@ -29,7 +34,8 @@ import openai_service
 # Load environment variables from .env file
 load_dotenv()
 
-app = FastAPI(title="Document Analysis API")
+# orjson serializes the large result/jobs payloads several times faster than stdlib json
+app = FastAPI(title="Document Analysis API", default_response_class=ORJSONResponse)
 
 # Initialize rate limiter
 limiter = Limiter(key_func=get_remote_address)
@@ -58,6 +64,7 @@ logger.info("=" * 80)
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE_MB", "100")) * 1024 * 1024  # Default 100MB per file
 MAX_TOTAL_SIZE = int(os.getenv("MAX_TOTAL_SIZE_MB", "2000")) * 1024 * 1024  # Default 2GB total for 30 files
 MAX_FILES_PER_REQUEST = int(os.getenv("MAX_FILES_PER_REQUEST", "30"))  # Default 30 files per request
+MAX_JOBS_PAGE_SIZE = int(os.getenv("MAX_JOBS_PAGE_SIZE", "100"))  # Most jobs returned by one /jobs page
 
 # Request timeout (in seconds) - configurable via environment variables
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT_SECONDS", "1800"))  # 30 minutes default
@@ -69,7 +76,7 @@ REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT_SECONDS", "1800"))  # 30 minute
 PER_FILE_TIMEOUT = int(os.getenv("PER_FILE_TIMEOUT_SECONDS", "120"))  # 2 minutes default per file
 
 # Allowed file extensions
-ALLOWED_EXTENSIONS = [".pdf", ".docx", ".csv", ".xlsx", ".png", ".jpg", ".jpeg", ".txt", ".rtf", ".pptx", ".odt"]
+ALLOWED_EXTENSIONS = frozenset({".pdf", ".docx", ".csv", ".xlsx", ".png", ".jpg", ".jpeg", ".txt", ".rtf", ".pptx", ".odt"})
 
 # Memory monitoring function (defined early so it can be used during startup)
 def log_memory_usage(context: str = ""):
@@ -86,13 +93,39 @@ def log_memory_usage(context: str = ""):
 # Log memory at startup
 log_memory_usage("(startup)")
 
-# Thread pool executor for CPU-bound text extraction operations
-# This allows synchronous I/O operations to run without blocking the async event loop
-TEXT_EXTRACTION_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="text_extract")
+# Process pool for CPU-bound text extraction (PDF/DOCX/spreadsheet parsing).
+# Threads would serialize on the GIL; separate processes parse files in parallel across cores.
+# Workers are spawned (not forked) so they don't inherit this process's threads and sockets,
+# and only a file path crosses the process boundary - never the file's bytes.
+# The pool is created lazily per process: gunicorn --preload imports this module before
+# forking, and a pool built then would share its call/result pipes across all workers.
+TEXT_EXTRACTION_PROCESSES = int(os.getenv("TEXT_EXTRACTION_PROCESSES", str(min(4, os.cpu_count() or 1))))
+_text_extraction_executor: Optional[ProcessPoolExecutor] = None
+_text_extraction_pid: Optional[int] = None
 
-# Thread pool executor for blocking I/O operations (Supabase uploads)
-# This prevents file uploads from blocking the async event loop
+def get_text_extraction_executor() -> ProcessPoolExecutor:
+    """Return this process's text extraction pool, creating it on first use."""
+    global _text_extraction_executor, _text_extraction_pid
+    pid = os.getpid()
+    if _text_extraction_pid != pid:
+        _text_extraction_executor = ProcessPoolExecutor(
+            max_workers=TEXT_EXTRACTION_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        _text_extraction_pid = pid
+    return _text_extraction_executor
+
+# Caps extractions queued on the text extraction pool: a burst of uploads waits here
+# (a cheap asyncio wait) instead of piling up in the pool's queue
+EXTRACT_LIMIT = TEXT_EXTRACTION_PROCESSES * 2
+EXTRACT_SEM = asyncio.Semaphore(EXTRACT_LIMIT)
+
+# Thread pool executor for blocking post-upload work (local fallback writes, job metadata)
+# This keeps those blocking calls off the async event loop
 STORAGE_UPLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="storage_upload")
+# Same queue cap for STORAGE_UPLOAD_EXECUTOR submissions
+STORAGE_SUBMIT_LIMIT = STORAGE_UPLOAD_EXECUTOR._max_workers * 2
+STORAGE_SUBMIT_SEM = asyncio.Semaphore(STORAGE_SUBMIT_LIMIT)
 
 # ============================================================================
 # JOB-BASED ARCHITECTURE - Decouples HTTP requests from long-running processing
@@ -102,8 +135,9 @@ STORAGE_UPLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="
 # and a separate worker process.
 
 from job_service import (
-    create_job, get_job, get_jobs_by_user_id, store_file_data, 
-    delete_job, JobStatus, upload_file_to_storage, store_file_storage_urls
+    JobStatus, upload_files_to_storage, JOB_POLL_COLUMNS, JOB_LIST_SUMMARY_COLUMNS, jobs_page_cursor,
+    acreate_job, aget_job_light, aget_jobs_by_user_id, adelete_job, close_supabase,
+    file_suffix, LOCAL_JOBS_ROOT, subscribe_job_changes, unsubscribe_job_changes
 )
 
 # Note: Job processing is handled by worker.py (separate process)
@@ -127,12 +161,45 @@ class RequestTimeoutHandler:
             return max(0, self.timeout_seconds - (time.time() - self.start_time))
         return self.timeout_seconds
 
+# How often a running request checks whether its client is still connected
+DISCONNECT_POLL_INTERVAL = 0.2
+
+def cancel_on_disconnect(handler):
+    """
+    Cancel a route handler when the client disconnects before it finishes.
+    
+    FastAPI keeps awaiting a handler after its client has gone away, so an abandoned
+    upload would still pay for text extraction and every OpenAI call. The handler runs as
+    a task instead; if the client disconnects, the task is cancelled and the cancellation
+    propagates into whatever it is awaiting. The handler must take a `request` argument.
+    """
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        request: Request = kwargs["request"]
+        handler_task = asyncio.create_task(handler(*args, **kwargs))
+        try:
+            while True:
+                done, _ = await asyncio.wait({handler_task}, timeout=DISCONNECT_POLL_INTERVAL)
+                if done:
+                    return handler_task.result()
+                if await request.is_disconnected():
+                    logger.info(f"Client disconnected, cancelling {request.method} {request.url.path}")
+                    break
+        finally:
+            if not handler_task.done():
+                handler_task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await handler_task
+        # Nobody is listening; the status only shows up in access logs
+        return Response(status_code=499)
+    return wrapper
+
 # Global exception handler for request entity too large
 @app.exception_handler(413)
 async def request_entity_too_large_handler(request: Request, exc: HTTPException):
     logger.warning(f"Request entity too large: {request.url}")
     log_memory_usage("(413 error)")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=413,
         content={
             "error": "Request Entity Too Large",
@@ -143,6 +210,8 @@ async def request_entity_too_large_handler(request: Request, exc: HTTPException)
     )
 
 # Rate limit exception handler
+RATE_LIMIT_RETRY_AFTER_SECONDS = 60
+
 @app.exception_handler(RateLimitExceeded)
 async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
     """
@@ -151,35 +220,30 @@ async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
     """
     client_ip = get_remote_address(request)
     logger.warning(f"Rate limit exceeded for IP {client_ip}: {request.url}")
-    response = _rate_limit_exceeded_handler(request, exc)
-    # Enhance the response with retry information
-    if hasattr(response, 'body') and response.body:
-        import json
-        try:
-            content = json.loads(response.body.decode())
-            content["retry_after"] = 60
-            content["message"] = "Please wait a minute before making more requests."
-            response.body = json.dumps(content).encode()
-        except:
-            pass  # If parsing fails, use default response
-    return response
+    # Built directly rather than by re-parsing slowapi's default response body
+    return ORJSONResponse(
+        status_code=429,
+        content={
+            "error": f"Rate limit exceeded: {exc.detail}",
+            "retry_after": RATE_LIMIT_RETRY_AFTER_SECONDS,
+            "message": "Please wait a minute before making more requests."
+        },
+        headers={"Retry-After": str(RATE_LIMIT_RETRY_AFTER_SECONDS)}
+    )
 
 # Global exception handler for all unhandled exceptions
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Catch all unhandled exceptions and log them with full traceback."""
     error_id = time.time()
-    logger.error("=" * 80)
-    logger.error(f"UNHANDLED EXCEPTION [{error_id}]")
-    logger.error(f"URL: {request.method} {request.url}")
-    logger.error(f"Exception type: {type(exc).__name__}")
-    logger.error(f"Exception message: {str(exc)}")
-    logger.error("Full traceback:")
-    logger.error(traceback.format_exc())
+    logger.error(
+        "UNHANDLED EXCEPTION [%s] %s %s - %s: %s",
+        error_id, request.method, request.url, type(exc).__name__, exc,
+        exc_info=exc,
+    )
     log_memory_usage("(unhandled exception)")
-    logger.error("=" * 80)
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "error": "Internal server error",
@@ -189,24 +253,26 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 # Request validation middleware to handle invalid HTTP requests gracefully
+_ALLOWED_METHODS = frozenset({"GET", "POST", "OPTIONS", "HEAD"})
+
 class RequestValidationMiddleware(BaseHTTPMiddleware):
     """Middleware to catch and handle invalid HTTP requests gracefully."""
     
     async def dispatch(self, request: StarletteRequest, call_next):
         try:
             # Validate request method
-            if request.method not in ["GET", "POST", "OPTIONS", "HEAD"]:
+            if request.method not in _ALLOWED_METHODS:
                 logger.warning(f"Invalid HTTP method: {request.method} for {request.url}")
-                return JSONResponse(
+                return ORJSONResponse(
                     status_code=405,
                     content={"error": "Method not allowed", "detail": f"Method {request.method} is not allowed"}
                 )
             
-            # Validate request path (basic sanity check)
-            path = str(request.url.path)
+            # Validate request path (basic sanity check); the raw scope path avoids rebuilding the URL
+            path = request.scope["path"]
             if len(path) > 2000:  # Prevent path traversal attacks
                 logger.warning(f"Path too long: {len(path)} characters")
-                return JSONResponse(
+                return ORJSONResponse(
                     status_code=400,
                     content={"error": "Bad request", "detail": "Request path too long"}
                 )
@@ -217,9 +283,8 @@ class RequestValidationMiddleware(BaseHTTPMiddleware):
             
         except Exception as e:
             # Catch any malformed request errors
-            logger.error(f"Request validation error: {str(e)}")
-            logger.error(traceback.format_exc())
-            return JSONResponse(
+            logger.exception("Request validation error: %s", e)
+            return ORJSONResponse(
                 status_code=400,
                 content={"error": "Bad request", "detail": "Invalid HTTP request format"}
             )
@@ -227,13 +292,92 @@ class RequestValidationMiddleware(BaseHTTPMiddleware):
 # Add request validation middleware (should be first)
 app.add_middleware(RequestValidationMiddleware)
 
-# Add GZip middleware for better performance with large files
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+class ConditionalGZipMiddleware:
+    """
+    GZip responses based on their content type and size.
+    
+    Response sizes here are bimodal (tiny error/status bodies vs. large analysis payloads),
+    so instead of one global minimum_size each compressible type gets its own threshold.
+    Other types, event streams and already-encoded responses are passed through untouched.
+    """
+    
+    def __init__(self, app, json_minimum_size: int = 4096, text_minimum_size: int = 1024, compresslevel: int = 5):
+        self.app = app
+        self.json_minimum_size = json_minimum_size
+        self.text_minimum_size = text_minimum_size
+        self.compresslevel = compresslevel
+    
+    def _minimum_size(self, headers: MutableHeaders) -> Optional[int]:
+        """Size threshold for this response, or None if it should never be compressed."""
+        if "content-encoding" in headers:
+            return None
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type == "application/json":
+            return self.json_minimum_size
+        if content_type.startswith("text/") and content_type != "text/event-stream":
+            return self.text_minimum_size
+        return None
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or "gzip" not in Headers(scope=scope).get("accept-encoding", ""):
+            await self.app(scope, receive, send)
+            return
+        
+        start_message = None
+        compressor = None
+        passthrough = False
+        
+        async def send_with_gzip(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                # Hold the headers until the first body chunk tells us the size
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                minimum_size = self._minimum_size(headers)
+                if minimum_size is None or (not more_body and len(body) < minimum_size):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                
+                compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+                headers["Content-Encoding"] = "gzip"
+                headers.add_vary_header("Accept-Encoding")
+                data = compressor.compress(body)
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    data += compressor.flush()
+                    headers["Content-Length"] = str(len(data))
+                await send(start_message)
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+            
+            data = compressor.compress(body)
+            if not more_body:
+                data += compressor.flush()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+        
+        await self.app(scope, receive, send_with_gzip)
+
+# Compress large JSON/text responses. Level 5 gets nearly all of level 9's savings on
+# JSON for about half the CPU.
+app.add_middleware(ConditionalGZipMiddleware, json_minimum_size=4096, text_minimum_size=1024, compresslevel=5)
 
 # Configure CORS - configurable via environment variable
 # Set ALLOWED_ORIGINS as comma-separated list: "https://example.com,https://app.example.com"
 # Or use "*" for development (not recommended for production)
-allowed_origins = os.getenv("ALLOWED_ORIGINS", "*").split(",")
+# Entries are stripped so "https://a.com, https://b.com" matches both origins
+allowed_origins = [origin.strip() for origin in os.getenv("ALLOWED_ORIGINS", "*").split(",") if origin.strip()]
 if allowed_origins == ["*"]:
     logger.warning("CORS is set to allow all origins. Restrict this in production using ALLOWED_ORIGINS env var.")
 app.add_middleware(
@@ -242,15 +386,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["POST", "GET", "OPTIONS"],
     allow_headers=["*"],
+    # Let browsers cache preflight results for a day instead of re-sending OPTIONS
+    # every 10 minutes (Starlette's default); some browsers cap this lower
+    max_age=int(os.getenv("CORS_MAX_AGE_SECONDS", "86400")),
 )
 
-def validate_file(file: UploadFile):
-    ext = Path(file.filename).suffix.lower()
+def validate_file(file: UploadFile) -> str:
+    """Check the file's extension is supported and return it (lowercased)."""
+    ext = file_suffix(file.filename).lower()
     if ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported file type: {ext}. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
+            detail=f"Unsupported file type: {ext}. Allowed types: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
         )
+    return ext
 
 def validate_file_size(file: UploadFile):
     """Validate file size before processing."""
@@ -272,39 +421,124 @@ def validate_multiple_files_size(files: List[UploadFile]):
                 detail=f"Total files size too large. Maximum total size allowed: {MAX_TOTAL_SIZE // (1024*1024)}MB"
             )
 
-async def analyze_single_file_direct(file: UploadFile, timeout_handler: RequestTimeoutHandler) -> dict:
+# Uploads are copied to disk in chunks of this size, so a request never holds a whole file in memory
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+def _copy_fileobj_to_fd(src, fd: int, limit: int) -> bool:
+    """
+    Copy a file object into an open descriptor, which is then closed.
+    Stops and returns False as soon as more than limit bytes have been read.
+    """
+    copied = 0
+    with open(fd, "wb") as dst:
+        while chunk := src.read(UPLOAD_CHUNK_SIZE):
+            copied += len(chunk)
+            if copied > limit:
+                return False
+            dst.write(chunk)
+    return True
+
+async def save_upload_to_temp(file: UploadFile, suffix: str) -> str:
+    """
+    Copy an UploadFile into a temporary file and return its path (caller removes it).
+    The whole copy runs in one worker thread straight from the request's spooled body,
+    rather than hopping to a thread for every chunk read.
+    
+    MAX_FILE_SIZE is enforced on the bytes actually copied (413 once exceeded), since
+    UploadFile.size is not always known up front.
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix=suffix)
+    try:
+        if not await asyncio.to_thread(_copy_fileobj_to_fd, file.file, fd, MAX_FILE_SIZE):
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum size allowed: {MAX_FILE_SIZE // (1024*1024)}MB"
+            )
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    return tmp_path
+
+# Spool copies run on the default thread pool; cap how many a single request runs at once
+SPOOL_CONCURRENCY = min(32, (os.cpu_count() or 1) * 2)
+
+async def spool_uploads_to_disk(files: List[UploadFile]) -> List[Dict]:
+    """
+    Stream each UploadFile into its own temp file (see save_upload_to_temp), so storage
+    uploads can stream from disk instead of holding every file in memory at once.
+    Files are spooled concurrently (up to SPOOL_CONCURRENCY at a time).
+    Returns filename/tmp_path/size/suffix per file; release with remove_spooled_uploads.
+    """
+    semaphore = asyncio.Semaphore(SPOOL_CONCURRENCY)
+    
+    async def spool(file: UploadFile) -> Dict:
+        suffix = file_suffix(file.filename)
+        async with semaphore:
+            tmp_path = await save_upload_to_temp(file, suffix)
+        return {
+            "filename": file.filename,
+            "tmp_path": tmp_path,
+            "size": os.path.getsize(tmp_path),
+            "suffix": suffix
+        }
+    
+    tasks = [asyncio.ensure_future(spool(file)) for file in files]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        # Stop the rest and remove whatever was already spooled
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        remove_spooled_uploads([
+            task.result() for task in tasks if not task.cancelled() and task.exception() is None
+        ])
+        raise
+
+def remove_spooled_uploads(file_data_list: List[Dict]):
+    """Delete the temp files created by spool_uploads_to_disk (moved ones are skipped)."""
+    for file_data in file_data_list:
+        Path(file_data["tmp_path"]).unlink(missing_ok=True)
+
+def move_to_local_fallback(job_id: str, file_data: Dict) -> str:
+    """
+    Move a spooled upload into the local-filesystem fallback directory for job_id.
+    Blocking (mkdir + rename/copy) - call from a worker thread, not the event loop.
+    """
+    job_dir = LOCAL_JOBS_ROOT / job_id
+    job_dir.mkdir(parents=True, exist_ok=True)
+    file_path = job_dir / file_data["filename"]
+    # The upload is already on disk; move it rather than copying it
+    shutil.move(file_data["tmp_path"], file_path)
+    return str(file_path)
+
+async def extract_text(tmp_path: str) -> str:
+    """Run textract_service.extract_text_from_upload on the text extraction pool, bounded by EXTRACT_SEM."""
+    async with EXTRACT_SEM:
+        return await asyncio.get_running_loop().run_in_executor(
+            get_text_extraction_executor(),
+            textract_service.extract_text_from_upload,
+            tmp_path
+        )
+
+async def analyze_single_file_direct(file: UploadFile, include_excerpt: bool = False) -> dict:
     """Analyze a single file using only Prompt 2 (Topic-Aware Analysis) - no routing."""
     tmp_path = None
     try:
-        # Check timeout before processing
-        timeout_handler.check_timeout()
-        
-        validate_file(file)
+        ext = validate_file(file)
         validate_file_size(file)
 
         # Save file temporarily to disk
-        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as tmp:
-            file_bytes = await file.read()
-            tmp.write(file_bytes)
-            tmp_path = tmp.name
-
-        # Check timeout before text extraction
-        timeout_handler.check_timeout()
+        tmp_path = await save_upload_to_temp(file, ext)
         
-        # 1. Extract text using the hybrid service with timeout (async via thread pool)
+        # 1. Extract text using the hybrid service (async via thread pool)
         try:
             log_memory_usage(f"before text extraction - {file.filename}")
             # Run synchronous text extraction in thread pool to avoid blocking event loop
-            extracted_text = await asyncio.get_event_loop().run_in_executor(
-                TEXT_EXTRACTION_EXECUTOR,
-                textract_service.extract_text_from_upload,
-                tmp_path,
-                file_bytes
-            )
+            extracted_text = await extract_text(tmp_path)
             log_memory_usage(f"after text extraction - {file.filename}")
         except Exception as e:
-            logger.error(f"Text extraction failed for {file.filename}: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.exception("Text extraction failed for %s: %s", file.filename, e)
             log_memory_usage(f"(text extraction error - {file.filename})")
             return {
                 "filename": file.filename,
@@ -318,32 +552,17 @@ async def analyze_single_file_direct(file: UploadFile, timeout_handler: RequestT
                 "error": "Failed to extract meaningful text from document.",
                 "status": "failed"
             }
-
-        # Check timeout before analysis
-        timeout_handler.check_timeout()
         
         # 2. PROMPT 2: Topic-Aware Analysis (direct, no routing)
         try:
-            analysis_result = await asyncio.wait_for(
-                openai_service.analyze_document(
-                    extracted_text,
-                    channel=None,  # No routing, so no channel
-                    topic_type=None,  # No routing, so no topic_type
-                    topic_title=None  # No routing, so no topic_title
-                ),
-                timeout=timeout_handler.get_remaining_time()
+            analysis_result = await openai_service.analyze_document(
+                extracted_text,
+                channel=None,  # No routing, so no channel
+                topic_type=None,  # No routing, so no topic_type
+                topic_title=None  # No routing, so no topic_title
             )
-        except asyncio.TimeoutError:
-            logger.error(f"Analysis timeout for {file.filename}")
-            log_memory_usage(f"(analysis timeout - {file.filename})")
-            return {
-                "filename": file.filename,
-                "error": "Analysis timeout - document too complex",
-                "status": "failed"
-            }
         except Exception as e:
-            logger.error(f"Analysis failed for {file.filename}: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.exception("Analysis failed for %s: %s", file.filename, e)
             log_memory_usage(f"(analysis error - {file.filename})")
             return {
                 "filename": file.filename,
@@ -353,18 +572,19 @@ async def analyze_single_file_direct(file: UploadFile, timeout_handler: RequestT
         
         logger.info(f"Successfully analyzed {file.filename}")
 
-        return {
+        result = {
             "filename": file.filename,
             "analysis": analysis_result,
-            "status": "success",
-            "extracted_text": extracted_text[:1000]  # Keep first 1000 chars for reference
+            "status": "success"
         }
+        if include_excerpt:
+            result["extracted_text"] = extracted_text[:1000]  # Keep first 1000 chars for reference
+        return result
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error processing file {file.filename}: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error processing file %s: %s", file.filename, e)
         log_memory_usage(f"(processing error - {file.filename})")
         return {
             "filename": file.filename,
@@ -373,42 +593,27 @@ async def analyze_single_file_direct(file: UploadFile, timeout_handler: RequestT
         }
     finally:
         # Clean up the temporary file
-        if tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        if tmp_path:
+            Path(tmp_path).unlink(missing_ok=True)
 
-async def process_single_file(file: UploadFile, timeout_handler: RequestTimeoutHandler) -> dict:
+async def process_single_file(file: UploadFile, include_excerpt: bool = False) -> dict:
     """Process a single file with routing and analysis (two-prompt system)."""
     tmp_path = None
     try:
-        # Check timeout before processing
-        timeout_handler.check_timeout()
-        
-        validate_file(file)
+        ext = validate_file(file)
         validate_file_size(file)
 
         # Save file temporarily to disk
-        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as tmp:
-            file_bytes = await file.read()
-            tmp.write(file_bytes)
-            tmp_path = tmp.name
-
-        # Check timeout before text extraction
-        timeout_handler.check_timeout()
+        tmp_path = await save_upload_to_temp(file, ext)
         
-        # 1. Extract text using the hybrid service with timeout (async via thread pool)
+        # 1. Extract text using the hybrid service (async via thread pool)
         try:
             log_memory_usage(f"before text extraction - {file.filename}")
             # Run synchronous text extraction in thread pool to avoid blocking event loop
-            extracted_text = await asyncio.get_event_loop().run_in_executor(
-                TEXT_EXTRACTION_EXECUTOR,
-                textract_service.extract_text_from_upload,
-                tmp_path,
-                file_bytes
-            )
+            extracted_text = await extract_text(tmp_path)
             log_memory_usage(f"after text extraction - {file.filename}")
         except Exception as e:
-            logger.error(f"Text extraction failed for {file.filename}: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.exception("Text extraction failed for %s: %s", file.filename, e)
             log_memory_usage(f"(text extraction error - {file.filename})")
             return {
                 "filename": file.filename,
@@ -422,27 +627,15 @@ async def process_single_file(file: UploadFile, timeout_handler: RequestTimeoutH
                 "error": "Failed to extract meaningful text from document.",
                 "status": "failed"
             }
-
-        # Check timeout before routing
-        timeout_handler.check_timeout()
+        
+        # Both prompts get the same text; truncate it once here rather than in each call
+        prompt_text = openai_service.truncate_for_prompt(extracted_text)
         
         # 2. PROMPT 1: Routing + Topic Creation
         try:
-            routing_result = await asyncio.wait_for(
-                openai_service.classify_document(extracted_text),
-                timeout=timeout_handler.get_remaining_time()
-            )
-        except asyncio.TimeoutError:
-            logger.error(f"Routing timeout for {file.filename}")
-            log_memory_usage(f"(routing timeout - {file.filename})")
-            return {
-                "filename": file.filename,
-                "error": "Routing timeout - document too complex",
-                "status": "failed"
-            }
+            routing_result = await openai_service.classify_document(prompt_text)
         except Exception as e:
-            logger.error(f"Routing failed for {file.filename}: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.exception("Routing failed for %s: %s", file.filename, e)
             log_memory_usage(f"(routing error - {file.filename})")
             return {
                 "filename": file.filename,
@@ -462,31 +655,16 @@ async def process_single_file(file: UploadFile, timeout_handler: RequestTimeoutH
                 "message": "This document has been stored in your Archive for future use."
             }
         
-        # Check timeout before analysis
-        timeout_handler.check_timeout()
-        
         # 3. PROMPT 2: Topic-Aware Analysis (only for INBOX documents)
         try:
-            analysis_result = await asyncio.wait_for(
-                openai_service.analyze_document(
-                    extracted_text,
-                    channel=routing_result.get("channel"),
-                    topic_type=routing_result.get("topic_type"),
-                    topic_title=routing_result.get("topic_title")
-                ),
-                timeout=timeout_handler.get_remaining_time()
+            analysis_result = await openai_service.analyze_document(
+                prompt_text,
+                channel=routing_result.get("channel"),
+                topic_type=routing_result.get("topic_type"),
+                topic_title=routing_result.get("topic_title")
             )
-        except asyncio.TimeoutError:
-            logger.error(f"Analysis timeout for {file.filename}")
-            log_memory_usage(f"(analysis timeout - {file.filename})")
-            return {
-                "filename": file.filename,
-                "error": "Analysis timeout - document too complex",
-                "status": "failed"
-            }
         except Exception as e:
-            logger.error(f"Analysis failed for {file.filename}: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.exception("Analysis failed for %s: %s", file.filename, e)
             log_memory_usage(f"(analysis error - {file.filename})")
             return {
                 "filename": file.filename,
@@ -496,7 +674,7 @@ async def process_single_file(file: UploadFile, timeout_handler: RequestTimeoutH
         
         logger.info(f"Successfully processed {file.filename} - INBOX topic created")
 
-        return {
+        result = {
             "filename": file.filename,
             "routing": "INBOX",
             "channel": routing_result.get("channel"),
@@ -506,15 +684,16 @@ async def process_single_file(file: UploadFile, timeout_handler: RequestTimeoutH
             "deadline": routing_result.get("deadline"),
             "authority": routing_result.get("authority"),
             "analysis": analysis_result,
-            "status": "success",
-            "extracted_text": extracted_text[:1000]  # Keep first 1000 chars for reference
+            "status": "success"
         }
+        if include_excerpt:
+            result["extracted_text"] = extracted_text[:1000]  # Keep first 1000 chars for reference
+        return result
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error processing file {file.filename}: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error processing file %s: %s", file.filename, e)
         log_memory_usage(f"(processing error - {file.filename})")
         return {
             "filename": file.filename,
@@ -523,8 +702,8 @@ async def process_single_file(file: UploadFile, timeout_handler: RequestTimeoutH
         }
     finally:
         # Clean up the temporary file
-        if tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        if tmp_path:
+            Path(tmp_path).unlink(missing_ok=True)
 
 # CONSOLIDATED ANALYSIS FUNCTION (Commented out - not needed for MVP)
 # Keeping code for future use if needed
@@ -554,108 +733,117 @@ async def analyze_multiple_files_consolidated_DISABLED(files: List[UploadFile],
     
     logger.info(f"Starting to process {len(files)} files for consolidated analysis")
     
-    for i, file in enumerate(files):
-        # Check timeout for each file
-        timeout_handler.check_timeout()
-        
-        logger.info(f"Processing file {i+1}/{len(files)}: {file.filename}")
-        
-        # Extract text and route document
-        tmp_path = None
-        try:
-            validate_file(file)
-            validate_file_size(file)
-            
-            # Save file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as tmp:
-                file_bytes = await file.read()
-                tmp.write(file_bytes)
-                tmp_path = tmp.name
-            
-            # Extract text (async via thread pool)
-            try:
-                extracted_text = await asyncio.get_event_loop().run_in_executor(
-                    TEXT_EXTRACTION_EXECUTOR,
-                    textract_service.extract_text_from_upload,
-                    tmp_path,
-                    file_bytes
-                )
-            except Exception as e:
-                logger.error(f"Text extraction failed for {file.filename}: {str(e)}")
-                logger.error(traceback.format_exc())
-                log_memory_usage(f"(text extraction error - {file.filename})")
-                continue
+    # Files are extracted (thread pool) and routed (OpenAI) concurrently; the semaphore
+    # keeps at most this many in flight so neither Textract nor OpenAI gets flooded
+    semaphore = asyncio.Semaphore(5)
+    
+    async def prep_file(i: int, file: UploadFile):
+        """Extract and route one file. Returns (extracted_text, routing_result), or None to skip it."""
+        async with semaphore:
+            # Check timeout for each file
+            timeout_handler.check_timeout()
             
-            if not extracted_text or not extracted_text.strip():
-                logger.warning(f"No text extracted from {file.filename}")
-                continue
+            logger.info(f"Processing file {i+1}/{len(files)}: {file.filename}")
             
-            # Route document (Prompt 1)
+            # Extract text and route document
+            tmp_path = None
             try:
-                routing_result = await asyncio.wait_for(
-                    openai_service.classify_document(extracted_text),
-                    timeout=timeout_handler.get_remaining_time()
-                )
+                ext = validate_file(file)
+                validate_file_size(file)
                 
-                routing = routing_result.get("routing", "ARCHIVE")
-                doc_channel = routing_result.get("channel", "ARCHIVE")
+                # Save file temporarily
+                tmp_path = await save_upload_to_temp(file, ext)
                 
-                # Only include INBOX documents in consolidated analysis
-                if routing == "INBOX":
-                    # If channel filter is specified, only include matching documents
-                    if channel is None or doc_channel == channel:
-                        file_results.append({
-                            "filename": file.filename,
-                            "text_length": len(extracted_text),
-                            "channel": doc_channel,
-                            "topic_type": routing_result.get("topic_type"),
-                            "topic_title": routing_result.get("topic_title"),
-                            "urgency": routing_result.get("urgency"),
-                            "deadline": routing_result.get("deadline"),
-                            "status": "inbox"
-                        })
-                        all_texts.append(extracted_text)
-                        file_info.append({
-                            "filename": file.filename,
-                            "text_length": len(extracted_text),
-                            "channel": doc_channel,
-                            "topic_title": routing_result.get("topic_title")
-                        })
-                        topics.append({
-                            "topic_type": routing_result.get("topic_type"),
-                            "topic_title": routing_result.get("topic_title"),
-                            "urgency": routing_result.get("urgency"),
-                            "deadline": routing_result.get("deadline")
-                        })
-                        inbox_files.append(file.filename)
-                        
-                        logger.info(f"Added {file.filename} to INBOX - Channel: {doc_channel}, Topic: {routing_result.get('topic_title')}")
-                    else:
-                        logger.info(f"Skipped {file.filename} - different channel ({doc_channel} != {channel})")
-                else:
-                    archive_files.append(file.filename)
-                    logger.info(f"{file.filename} routed to ARCHIVE")
+                # Extract text (async via thread pool)
+                try:
+                    extracted_text = await extract_text(tmp_path)
+                except Exception as e:
+                    logger.exception("Text extraction failed for %s: %s", file.filename, e)
+                    log_memory_usage(f"(text extraction error - {file.filename})")
+                    return None
                 
-            except asyncio.TimeoutError:
-                logger.error(f"Routing timeout for {file.filename}")
-                continue
+                if not extracted_text or not extracted_text.strip():
+                    logger.warning(f"No text extracted from {file.filename}")
+                    return None
+                
+                # Route document (Prompt 1)
+                try:
+                    routing_result = await asyncio.wait_for(
+                        openai_service.classify_document(extracted_text),
+                        timeout=timeout_handler.get_remaining_time()
+                    )
+                except asyncio.TimeoutError:
+                    logger.error(f"Routing timeout for {file.filename}")
+                    return None
+                except Exception as e:
+                    logger.exception("Routing failed for %s: %s", file.filename, e)
+                    log_memory_usage(f"(routing error - {file.filename})")
+                    return None
+                
+                return extracted_text, routing_result
+                
+            except HTTPException:
+                raise
             except Exception as e:
-                logger.error(f"Routing failed for {file.filename}: {str(e)}")
-                logger.error(traceback.format_exc())
-                log_memory_usage(f"(routing error - {file.filename})")
-                continue
-            
-        except HTTPException:
-            raise
-        except Exception as e:
-            logger.error(f"Error processing file {file.filename}: {e}")
-            logger.error(traceback.format_exc())
-            log_memory_usage(f"(processing error - {file.filename})")
+                logger.exception("Error processing file %s: %s", file.filename, e)
+                log_memory_usage(f"(processing error - {file.filename})")
+                return None
+            finally:
+                # Clean up temporary file
+                if tmp_path:
+                    Path(tmp_path).unlink(missing_ok=True)
+    
+    prepared = await asyncio.gather(*(prep_file(i, file) for i, file in enumerate(files)), return_exceptions=True)
+    
+    # Validation/timeout errors abort the whole request, as they did when files ran one by one
+    for outcome in prepared:
+        if isinstance(outcome, BaseException):
+            raise outcome
+    
+    # Bookkeeping in upload order, now that every file has been routed
+    for file, outcome in zip(files, prepared):
+        if outcome is None:
             continue
-        finally:
-            # Clean up temporary file
-            if tmp_path and os.path.exists(tmp_path):
-                os.remove(tmp_path)
+        extracted_text, routing_result = outcome
+        
+        routing = routing_result.get("routing", "ARCHIVE")
+        doc_channel = routing_result.get("channel", "ARCHIVE")
+        
+        # Only include INBOX documents in consolidated analysis
+        if routing == "INBOX":
+            # If channel filter is specified, only include matching documents
+            if channel is None or doc_channel == channel:
+                file_results.append({
+                    "filename": file.filename,
+                    "text_length": len(extracted_text),
+                    "channel": doc_channel,
+                    "topic_type": routing_result.get("topic_type"),
+                    "topic_title": routing_result.get("topic_title"),
+                    "urgency": routing_result.get("urgency"),
+                    "deadline": routing_result.get("deadline"),
+                    "status": "inbox"
+                })
+                all_texts.append(extracted_text)
+                file_info.append({
+                    "filename": file.filename,
+                    "text_length": len(extracted_text),
+                    "channel": doc_channel,
+                    "topic_title": routing_result.get("topic_title")
+                })
+                topics.append({
+                    "topic_type": routing_result.get("topic_type"),
+                    "topic_title": routing_result.get("topic_title"),
+                    "urgency": routing_result.get("urgency"),
+                    "deadline": routing_result.get("deadline")
+                })
+                inbox_files.append(file.filename)
+                
+                logger.info(f"Added {file.filename} to INBOX - Channel: {doc_channel}, Topic: {routing_result.get('topic_title')}")
+            else:
+                logger.info(f"Skipped {file.filename} - different channel ({doc_channel} != {channel})")
+        else:
+            archive_files.append(file.filename)
+            logger.info(f"{file.filename} routed to ARCHIVE")
     
     logger.info(f"Completed file processing: {len(inbox_files)} inbox files, {len(archive_files)} archive files")
     
@@ -673,8 +861,9 @@ async def analyze_multiple_files_consolidated_DISABLED(files: List[UploadFile],
     # Check timeout before consolidated analysis
     timeout_handler.check_timeout()
     
-    # Combine all extracted texts for consolidated channel analysis
-    combined_text = "\n\n--- DOCUMENT SEPARATOR ---\n\n".join(all_texts)
+    # The texts are passed as a list: the service only samples the start and end of the
+    # combined text, so joining every document into one string here would be wasted memory
+    total_text_length = sum(len(text) for text in all_texts)
     detected_channel = file_results[0].get("channel") if file_results else "GENERAL_ACTIONABLE"
     
     # Check topic type compatibility for better consolidation
@@ -686,7 +875,7 @@ async def analyze_multiple_files_consolidated_DISABLED(files: List[UploadFile],
         logger.warning(f"Topic types: {unique_topic_types}")
     
     logger.info(f"Starting consolidated channel analysis for {detected_channel}")
-    logger.info(f"Analyzing {len(all_texts)} documents with {len(combined_text)} total characters")
+    logger.info(f"Analyzing {len(all_texts)} documents with {total_text_length} total characters")
     logger.info(f"Topic types in consolidation: {unique_topic_types}")
     
     # Perform consolidated channel analysis (Prompt 3)
@@ -694,7 +883,7 @@ async def analyze_multiple_files_consolidated_DISABLED(files: List[UploadFile],
         logger.info(f"Calling OpenAI API for consolidated channel analysis...")
         consolidated_analysis = await asyncio.wait_for(
             openai_service.analyze_multiple_documents_consolidated(
-                combined_text, 
+                all_texts, 
                 file_info,
                 detected_channel,
                 topics
@@ -720,8 +909,7 @@ async def analyze_multiple_files_consolidated_DISABLED(files: List[UploadFile],
         logger.error("Consolidated channel analysis timeout")
         raise HTTPException(status_code=408, detail="Analysis timeout - too many complex documents")
     except Exception as e:
-        logger.error(f"Error in consolidated channel analysis: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error in consolidated channel analysis: %s", e)
         log_memory_usage("(consolidated analysis error)")
         raise HTTPException(status_code=500, detail=f"Consolidated analysis failed: {str(e)}")
 
@@ -752,36 +940,26 @@ async def classify_documents_async(
     # Extract user_id from header (optional)
     user_id = x_user_id or request.headers.get("X-User-ID") or request.headers.get("x-user-id")
     
-    # Create job in Supabase database first (CREATED -> not worker-visible yet)
-    job_id = create_job(endpoint_type="classify", total_files=len(files), user_id=user_id, status=JobStatus.CREATED)
+    # The job's ID is chosen up front so files can be uploaded under it; the row itself is
+    # only written once all inputs are stored (see below)
+    job_id = str(uuid.uuid4())
     
-    # Read all files into memory quickly (async, fast)
-    # This is fast because we're just reading bytes, not processing
-    file_data_list = []
-    for file in files:
-        file_bytes = await file.read()
-        file_size = len(file_bytes)
-        file_data_list.append({
-            "filename": file.filename,
-            "bytes": file_bytes,
-            "size": file_size,
-            "suffix": Path(file.filename).suffix
-        })
-    
-    # Upload files to Supabase Storage in parallel (async via thread pool)
-    # We wait for uploads to complete before returning to ensure files are stored
-    # before the worker picks up the job
-    async def upload_files_async():
-        """Upload files to storage and update DB - runs in thread pool but we await it"""
-        def upload_files_background():
-            """Upload files to storage and update DB - runs in thread pool"""
+    # Spool all files to disk (streamed in chunks, never fully in memory)
+    file_data_list = await spool_uploads_to_disk(files)
+    try:
+        # Upload files to Supabase Storage concurrently (each upload on a worker thread).
+        # We wait for uploads to complete before returning to ensure files are stored
+        # before the worker picks up the job.
+        # Returns file_path (e.g., "job_id/filename") per file, not public URL
+        file_paths = await upload_files_to_storage(
+            job_id, [(file_data["filename"], file_data["tmp_path"]) for file_data in file_data_list]
+        )
+        
+        def collect_file_urls():
+            """Fall back to local storage for failed uploads - runs in thread pool"""
             file_urls = []
-            for file_data in file_data_list:
+            for file_data, file_path in zip(file_data_list, file_paths):
                 try:
-                    # Upload file to Supabase Storage (blocking operation)
-                    # Returns file_path (e.g., "job_id/filename"), not public URL
-                    file_path = upload_file_to_storage(job_id, file_data["filename"], file_data["bytes"])
-                    
                     if file_path:
                         file_urls.append({
                             "filename": file_data["filename"],
@@ -792,48 +970,38 @@ async def classify_documents_async(
                     else:
                         # Fallback: local filesystem
                         logger.error(f"Failed to upload {file_data['filename']} to Supabase Storage, falling back to local storage")
-                        job_dir = Path(tempfile.gettempdir()) / "inbox_jobs" / job_id
-                        job_dir.mkdir(parents=True, exist_ok=True)
-                        file_path = job_dir / file_data["filename"]
-                        with open(file_path, "wb") as f:
-                            f.write(file_data["bytes"])
+                        file_path = move_to_local_fallback(job_id, file_data)
                         file_urls.append({
                             "filename": file_data["filename"],
-                            "file_path": str(file_path),
+                            "file_path": file_path,
                             "suffix": file_data["suffix"],
                             "size": file_data["size"]
                         })
                 except Exception as e:
                     logger.error(f"Error uploading {file_data['filename']}: {e}")
                     # Continue with other files
-            
-            # Store file paths in database
-            if file_urls:
-                try:
-                    if any("file_path" in f for f in file_urls):
-                        store_file_storage_urls(job_id, file_urls)
-                    elif any("storage_url" in f for f in file_urls):
-                        # Legacy format with storage_url - still supported
-                        store_file_storage_urls(job_id, file_urls)
-                    else:
-                        store_file_data(job_id, file_urls)
-                except Exception as e:
-                    logger.error(f"Failed to store file data for job {job_id}: {e}")
-                    # Update job with error but don't fail the request
-                    from job_service import update_job_status, JobStatus
-                    update_job_status(job_id, JobStatus.FAILED, error=f"Failed to store file data: {str(e)}")
+            return file_urls
         
         # Run in thread pool and await completion
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(STORAGE_UPLOAD_EXECUTOR, upload_files_background)
+        async with STORAGE_SUBMIT_SEM:
+            loop = asyncio.get_event_loop()
+            file_urls = await loop.run_in_executor(STORAGE_UPLOAD_EXECUTOR, collect_file_urls)
+    finally:
+        remove_spooled_uploads(file_data_list)
     
-    # Wait for file uploads to complete before returning.
-    # IMPORTANT: Only after uploads + metadata are stored do we mark job READY.
-    await upload_files_async()
-
-    # Mark job READY (worker-visible) only after all required inputs are committed
-    from job_service import update_job_status
-    update_job_status(job_id, JobStatus.READY, progress=0, processed_files=0)
+    if not file_urls:
+        raise HTTPException(status_code=500, detail="Failed to process files. No file data to store.")
+    
+    # Create the job already READY (worker-visible) with its file paths: one INSERT, and a
+    # worker can never see the job before all its inputs are stored
+    try:
+        await acreate_job(
+            job_id=job_id, endpoint_type="classify", total_files=len(files), user_id=user_id,
+            status=JobStatus.READY, file_urls=file_urls
+        )
+    except Exception as e:
+        logger.error(f"Failed to create job {job_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to store file data: {str(e)}")
     
     # Worker process will pick up this job from the database
     
@@ -869,65 +1037,59 @@ async def analyze_multiple_async(
     # Extract user_id from header (optional)
     user_id = x_user_id or request.headers.get("X-User-ID") or request.headers.get("x-user-id")
     
-    # Create job in Supabase database first (CREATED -> not worker-visible yet)
-    job_id = create_job(endpoint_type="analyze", total_files=len(files), user_id=user_id, status=JobStatus.CREATED)
+    # The job's ID is chosen up front so files can be uploaded under it; the row itself is
+    # only written once all inputs are stored (see below)
+    job_id = str(uuid.uuid4())
     
-    # Upload files to Supabase Storage and store URLs
-    file_urls = []
-    for file in files:
-        file_bytes = await file.read()
-        file_size = len(file_bytes)
-        
-        # Upload file to Supabase Storage
-        # Returns file_path (e.g., "job_id/filename"), not public URL
-        file_path = upload_file_to_storage(job_id, file.filename, file_bytes)
+    # Spool all files to disk (streamed in chunks, never fully in memory), then upload
+    # them to Supabase Storage concurrently, streaming from disk
+    file_data_list = await spool_uploads_to_disk(files)
+    try:
+        # Returns file_path (e.g., "job_id/filename") per file, not public URL
+        file_paths = await upload_files_to_storage(
+            job_id, [(file_data["filename"], file_data["tmp_path"]) for file_data in file_data_list]
+        )
         
-        if file_path:
-            # Store file path (not public URL)
-            file_urls.append({
-                "filename": file.filename,
-                "file_path": file_path,  # File path format: "job_id/filename"
-                "suffix": Path(file.filename).suffix,
-                "size": file_size
-            })
-        else:
-            # Fallback: if storage upload fails, log error but continue
-            logger.error(f"Failed to upload {file.filename} to Supabase Storage, falling back to local storage")
-            # Fallback to local filesystem (backward compatibility)
-            job_dir = Path(tempfile.gettempdir()) / "inbox_jobs" / job_id
-            job_dir.mkdir(parents=True, exist_ok=True)
-            file_path = job_dir / file.filename
-            with open(file_path, "wb") as f:
-                f.write(file_bytes)
-            file_urls.append({
-                "filename": file.filename,
-                "file_path": str(file_path),  # Local path (fallback)
-                "suffix": Path(file.filename).suffix,
-                "size": file_size
-            })
+        # Store URLs
+        file_urls = []
+        for file_data, file_path in zip(file_data_list, file_paths):
+            if file_path:
+                # Store file path (not public URL)
+                file_urls.append({
+                    "filename": file_data["filename"],
+                    "file_path": file_path,  # File path format: "job_id/filename"
+                    "suffix": file_data["suffix"],
+                    "size": file_data["size"]
+                })
+            else:
+                # Fallback: if storage upload fails, log error but continue
+                logger.error(f"Failed to upload {file_data['filename']} to Supabase Storage, falling back to local storage")
+                # Fallback to local filesystem (backward compatibility). This runs exactly when
+                # storage is struggling, so keep the disk work off the event loop.
+                file_path = await asyncio.to_thread(move_to_local_fallback, job_id, file_data)
+                file_urls.append({
+                    "filename": file_data["filename"],
+                    "file_path": file_path,  # Local path (fallback)
+                    "suffix": file_data["suffix"],
+                    "size": file_data["size"]
+                })
+    finally:
+        remove_spooled_uploads(file_data_list)
     
     # Ensure we have file data to store
     if not file_urls:
         raise HTTPException(status_code=500, detail="Failed to process files. No file data to store.")
     
-    # Store file paths in Supabase (preferred) or file paths (fallback)
+    # Create the job already READY (worker-visible) with its file paths: one INSERT, and a
+    # worker can never see the job before all its inputs are stored
     try:
-        if any("file_path" in f for f in file_urls):
-            # Use new file_path format
-            store_file_storage_urls(job_id, file_urls)
-        elif any("storage_url" in f for f in file_urls):
-            # Legacy format with storage_url - still supported
-            store_file_storage_urls(job_id, file_urls)
-        else:
-            # Fallback to old file_data format
-            store_file_data(job_id, file_urls)
+        await acreate_job(
+            job_id=job_id, endpoint_type="analyze", total_files=len(files), user_id=user_id,
+            status=JobStatus.READY, file_urls=file_urls
+        )
     except Exception as e:
-        logger.error(f"Failed to store file data for job {job_id}: {e}")
+        logger.error(f"Failed to create job {job_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to store file data: {str(e)}")
-
-    # Mark job READY (worker-visible) only after all required inputs are committed
-    from job_service import update_job_status
-    update_job_status(job_id, JobStatus.READY, progress=0, processed_files=0)
     
     # Worker process will pick up this job from the database
     
@@ -940,21 +1102,59 @@ async def analyze_multiple_async(
         "estimated_time_seconds": len(files) * 15  # Rough estimate: 15 seconds per file
     }
 
+JOB_FINISHED_STATUSES = (JobStatus.COMPLETED, JobStatus.FAILED)
+
+async def job_status_payload(job_id: str, job: Dict, user_id: Optional[str]) -> Dict:
+    """
+    Build the /job/{job_id} response body from a JOB_POLL_COLUMNS row.
+    result/error are fetched here, and only for finished jobs.
+    """
+    if job["status"] in JOB_FINISHED_STATUSES:
+        job.update(await aget_job_light(job_id, user_id=user_id, columns="user_id,result,error") or {})
+    
+    response = {
+        "job_id": job_id,
+        "status": job["status"],
+        "progress": job["progress"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
+    
+    if job.get("total_files"):
+        response["total_files"] = job["total_files"]
+        response["processed_files"] = job.get("processed_files", 0)
+    
+    # Include result if completed
+    if job["status"] == JobStatus.COMPLETED and job.get("result"):
+        response["result"] = job["result"]
+    
+    # Include error if failed
+    if job["status"] == JobStatus.FAILED and job.get("error"):
+        response["error"] = job["error"]
+    
+    return response
+
 @app.get("/job/{job_id}")
 async def get_job_status(
     job_id: str, 
     request: Request,
+    http_response: Response,
     x_user_id: Optional[str] = Header(None, alias="X-User-ID", description="User identifier for security (optional, verifies job ownership)")
 ):
     """
     Get job status and results.
     Returns job status, progress, and results (if completed).
+    
+    Clients should call this once for the initial state and then follow progress via
+    GET /job/{job_id}/events or Supabase Realtime (see supabase_realtime_clients_migration.sql)
+    instead of polling.
     """
     # Extract user_id from header (optional, for security)
     user_id = x_user_id or request.headers.get("X-User-ID") or request.headers.get("x-user-id")
     
-    # Get job (with user_id verification if provided)
-    job = get_job(job_id, user_id=user_id)
+    # Get job (with user_id verification if provided); file metadata and the result/error
+    # payloads aren't needed to decide whether the poller's copy is still current
+    job = await aget_job_light(job_id, user_id=user_id, columns=JOB_POLL_COLUMNS)
     
     if not job:
         if user_id:
@@ -968,41 +1168,90 @@ async def get_job_status(
                 detail=f"Job {job_id} not found. The job may not exist in the database or was deleted."
             )
     
-    response = {
-        "job_id": job_id,
-        "status": job["status"],
-        "progress": job["progress"],
-        "created_at": job["created_at"],
-        "updated_at": job["updated_at"]
-    }
+    # Let browsers/proxies collapse rapid re-polls of the same job, then revalidate by ETag
+    etag = f'W/"{job["updated_at"]}-{job["status"]}-{job["progress"]}"'
+    cache_headers = {"Cache-Control": "private, max-age=1", "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cache_headers)
+    http_response.headers.update(cache_headers)
     
-    if job.get("total_files"):
-        response["total_files"] = job["total_files"]
-        response["processed_files"] = job.get("processed_files", 0)
+    return await job_status_payload(job_id, job, user_id)
+
+# With Realtime, an idle stream gets a keep-alive comment this often (and re-checks the job
+# as a safety net); without it, the job is re-read at the shorter fallback interval
+JOB_EVENTS_HEARTBEAT_SECONDS = 15
+JOB_EVENTS_FALLBACK_POLL_SECONDS = 2
+
+@app.get("/job/{job_id}/events")
+async def job_events(
+    job_id: str,
+    request: Request,
+    x_user_id: Optional[str] = Header(None, alias="X-User-ID", description="User identifier for security (optional, verifies job ownership)")
+):
+    """
+    Stream job status as Server-Sent Events until the job completes or fails.
+    Each "update" event carries the same body as GET /job/{job_id}.
     
-    # Include result if completed
-    if job["status"] == JobStatus.COMPLETED and job.get("result"):
-        response["result"] = job["result"]
+    The server subscribes to Supabase Realtime for the job row, so the database is only
+    read when the job actually changes; GET /job/{job_id} stays available as a fallback.
+    """
+    user_id = x_user_id or request.headers.get("X-User-ID") or request.headers.get("x-user-id")
     
-    # Include error if failed
-    if job["status"] == JobStatus.FAILED and job.get("error"):
-        response["error"] = job["error"]
+    job = await aget_job_light(job_id, user_id=user_id, columns=JOB_POLL_COLUMNS)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
     
-    return response
+    async def event_stream():
+        changed = asyncio.Event()
+        channel = await subscribe_job_changes(job_id, lambda payload: changed.set())
+        wait_seconds = JOB_EVENTS_HEARTBEAT_SECONDS if channel else JOB_EVENTS_FALLBACK_POLL_SECONDS
+        current = job
+        last_state = None
+        try:
+            while True:
+                state = (current["updated_at"], current["status"], current["progress"])
+                if state != last_state:
+                    last_state = state
+                    payload = await job_status_payload(job_id, current, user_id)
+                    yield f"event: update\ndata: {orjson.dumps(payload).decode()}\n\n"
+                    if current["status"] in JOB_FINISHED_STATUSES:
+                        return
+                else:
+                    yield ": keep-alive\n\n"
+                
+                with suppress(TimeoutError):
+                    await asyncio.wait_for(changed.wait(), timeout=wait_seconds)
+                changed.clear()
+                current = await aget_job_light(job_id, user_id=user_id, columns=JOB_POLL_COLUMNS)
+                if not current:
+                    yield "event: deleted\ndata: {}\n\n"
+                    return
+        finally:
+            await unsubscribe_job_changes(channel)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/jobs")
 async def get_user_jobs(
     request: Request, 
     status: Optional[str] = None, 
     limit: int = 100,
+    summary: bool = False,
+    cursor: Optional[str] = None,
     x_user_id: str = Header(..., alias="X-User-ID", description="User identifier from frontend (required)")
 ):
     """
-    Get all jobs for the current user (from X-User-ID header).
+    Get all jobs for the current user (from X-User-ID header), newest first.
     
     Query Parameters:
         status (optional): Filter by status (pending, processing, completed, failed)
-        limit (optional): Maximum number of jobs to return (default: 100)
+        limit (optional): Maximum number of jobs to return (default: 100, capped at MAX_JOBS_PAGE_SIZE)
+        summary (optional): Return only status/progress columns, without result or file data (default: false)
+        cursor (optional): next_cursor from the previous page, to fetch the next (older) page
     """
     # user_id is now required via Header parameter, so it's guaranteed to be set
     user_id = x_user_id
@@ -1014,14 +1263,24 @@ async def get_user_jobs(
             detail="Invalid status. Must be: created, ready, processing, completed, or failed",
         )
     
+    limit = max(1, min(limit, MAX_JOBS_PAGE_SIZE))
+    
     # Get jobs for user
-    jobs = get_jobs_by_user_id(user_id, status=status, limit=limit)
+    jobs = await aget_jobs_by_user_id(
+        user_id, status=status, limit=limit,
+        fields=JOB_LIST_SUMMARY_COLUMNS if summary else None,
+        cursor=cursor,
+    )
+    
+    # A full page may have more behind it; its last job is where the next page starts
+    next_cursor = jobs_page_cursor(jobs[-1]) if jobs and len(jobs) == limit else None
     
     return {
         "user_id": user_id,
         "total_jobs": len(jobs),
         "status_filter": status,
-        "jobs": jobs
+        "jobs": jobs,
+        "next_cursor": next_cursor
     }
 
 @app.delete("/job/{job_id}")
@@ -1036,16 +1295,13 @@ async def delete_job_endpoint(
     # Extract user_id from header (optional, for security)
     user_id = x_user_id or request.headers.get("X-User-ID") or request.headers.get("x-user-id")
     
-    # Verify job belongs to user if user_id provided
-    if user_id:
-        job = get_job(job_id, user_id=user_id)
-        if not job:
-            raise HTTPException(status_code=404, detail=f"Job {job_id} not found or doesn't belong to user")
-    
-    success = delete_job(job_id)
+    # Ownership (if user_id provided) is checked by the DELETE itself - one round-trip
+    success = await adelete_job(job_id, user_id=user_id)
     if success:
         logger.info(f"Job {job_id} deleted")
         return {"message": f"Job {job_id} deleted"}
+    elif user_id:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found or doesn't belong to user")
     else:
         raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
 
@@ -1061,31 +1317,52 @@ async def root():
 @app.get("/health", status_code=200)
 async def health_check():
     """Health check endpoint for load balancer and monitoring"""
-    return {"status": "ok", "timestamp": time.time()}
+    return {
+        "status": "ok",
+        "timestamp": time.time(),
+        # Work admitted to the executors (running or queued) out of each cap
+        "in_flight": {
+            "text_extraction": {"current": EXTRACT_LIMIT - EXTRACT_SEM._value, "limit": EXTRACT_LIMIT},
+            "storage_upload": {"current": STORAGE_SUBMIT_LIMIT - STORAGE_SUBMIT_SEM._value, "limit": STORAGE_SUBMIT_LIMIT},
+        },
+    }
 
 @app.post("/analyze")
 @limiter.limit("12/minute")  # 10-15 requests per minute (using 12 as middle)
-async def analyze_single(request: Request, file: UploadFile = File(...)):
-    """Analyze a single document using only Prompt 2 (Topic-Aware Analysis) - no routing."""
-    timeout_handler = RequestTimeoutHandler(REQUEST_TIMEOUT)
-    timeout_handler.start()
+@cancel_on_disconnect
+async def analyze_single(request: Request, file: UploadFile = File(...), include_excerpt: bool = False):
+    """
+    Analyze a single document using only Prompt 2 (Topic-Aware Analysis) - no routing.
+    
+    Query Parameters:
+        include_excerpt (optional): Include the first 1000 characters of extracted text (default: false)
+    """
+    start_time = time.time()
     
-    result = await analyze_single_file_direct(file, timeout_handler)
+    # One deadline for the whole request: on expiry whatever is being awaited is cancelled
+    try:
+        async with asyncio.timeout(REQUEST_TIMEOUT):
+            result = await analyze_single_file_direct(file, include_excerpt=include_excerpt)
+    except TimeoutError:
+        raise HTTPException(status_code=408, detail="Request timeout exceeded")
     if result.get("status") == "failed":
         raise HTTPException(status_code=500, detail=result.get("error", "Unknown error"))
     
-    result["processing_time"] = time.time() - timeout_handler.start_time
+    result["processing_time"] = time.time() - start_time
     return result
 
 @app.post("/analyze-multiple")
 @limiter.limit("7/minute")  # 5-10 requests per minute (using 7 as middle)
-async def analyze_multiple(request: Request, files: List[UploadFile] = File(...)):
+@cancel_on_disconnect
+async def analyze_multiple(request: Request, files: List[UploadFile] = File(...), include_excerpt: bool = False):
     """
     Analyze multiple documents individually using two-prompt system.
     Each file goes through: Prompt 1 (Routing) → Prompt 2 (Analysis if INBOX)
+    
+    Query Parameters:
+        include_excerpt (optional): Include the first 1000 characters of each file's extracted text (default: false)
     """
-    timeout_handler = RequestTimeoutHandler(REQUEST_TIMEOUT)
-    timeout_handler.start()
+    start_time = time.time()
     
     if not files:
         raise HTTPException(status_code=400, detail="No files provided")
@@ -1102,19 +1379,21 @@ async def analyze_multiple(request: Request, files: List[UploadFile] = File(...)
     inbox_count = 0
     archive_count = 0
     
-    for i, file in enumerate(files):
-        # Check timeout for each file
-        timeout_handler.check_timeout()
-        
-        logger.info(f"Processing file {i+1}/{len(files)}: {file.filename}")
-        result = await process_single_file(file, timeout_handler)
-        results.append(result)
-        
-        # Track routing stats
-        if result.get("routing") == "INBOX":
-            inbox_count += 1
-        elif result.get("routing") == "ARCHIVE":
-            archive_count += 1
+    # One deadline for the whole batch: on expiry whatever is being awaited is cancelled
+    try:
+        async with asyncio.timeout(REQUEST_TIMEOUT):
+            for i, file in enumerate(files):
+                logger.info(f"Processing file {i+1}/{len(files)}: {file.filename}")
+                result = await process_single_file(file, include_excerpt=include_excerpt)
+                results.append(result)
+                
+                # Track routing stats
+                if result.get("routing") == "INBOX":
+                    inbox_count += 1
+                elif result.get("routing") == "ARCHIVE":
+                    archive_count += 1
+    except TimeoutError:
+        raise HTTPException(status_code=408, detail="Request timeout exceeded")
     
     # Count successes and failures
     successful = sum(1 for r in results if r.get("status") == "success")
@@ -1130,7 +1409,7 @@ async def analyze_multiple(request: Request, files: List[UploadFile] = File(...)
         "inbox_count": inbox_count,
         "archive_count": archive_count,
         "results": results,
-        "processing_time": time.time() - timeout_handler.start_time
+        "processing_time": time.time() - start_time
     }
 
 # CONSOLIDATED ANALYSIS DISABLED (Commented out - not needed for MVP)
@@ -1149,27 +1428,18 @@ async def classify_single_file(file: UploadFile, timeout_handler: RequestTimeout
         # Check timeout before processing
         timeout_handler.check_timeout()
         
-        validate_file(file)
+        ext = validate_file(file)
         validate_file_size(file)
         
         # Save file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as tmp:
-            file_bytes = await file.read()
-            tmp.write(file_bytes)
-            tmp_path = tmp.name
+        tmp_path = await save_upload_to_temp(file, ext)
         
         # Extract text (async via thread pool)
         timeout_handler.check_timeout()
         try:
-            extracted_text = await asyncio.get_event_loop().run_in_executor(
-                TEXT_EXTRACTION_EXECUTOR,
-                textract_service.extract_text_from_upload,
-                tmp_path,
-                file_bytes
-            )
+            extracted_text = await extract_text(tmp_path)
         except Exception as e:
-            logger.error(f"Text extraction failed for {file.filename}: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.exception("Text extraction failed for %s: %s", file.filename, e)
             log_memory_usage(f"(text extraction error - {file.filename})")
             return {
                 "filename": file.filename,
@@ -1209,9 +1479,9 @@ async def classify_single_file(file: UploadFile, timeout_handler: RequestTimeout
                 per_file_timeout = min(PER_FILE_TIMEOUT, timeout_handler.get_remaining_time())
                 if per_file_timeout <= 0:
                     raise asyncio.TimeoutError("No time remaining")
-                routing_result = await asyncio.wait_for(
-                    openai_service.classify_document(extracted_text),
-                    timeout=per_file_timeout
+                # The SDK enforces the timeout per request (no extra wait_for task)
+                routing_result = await openai_service.classify_document(
+                    extracted_text, timeout=per_file_timeout
                 )
                 
                 return {
@@ -1242,8 +1512,7 @@ async def classify_single_file(file: UploadFile, timeout_handler: RequestTimeout
                     "status": "timeout"
                 }
             except Exception as e:
-                logger.error(f"Routing failed for {file.filename}: {str(e)}")
-                logger.error(traceback.format_exc())
+                logger.exception("Routing failed for %s: %s", file.filename, e)
                 log_memory_usage(f"(routing error - {file.filename})")
                 return {
                     "filename": file.filename,
@@ -1261,8 +1530,7 @@ async def classify_single_file(file: UploadFile, timeout_handler: RequestTimeout
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error processing file {file.filename}: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error processing file %s: %s", file.filename, e)
         log_memory_usage(f"(processing error - {file.filename})")
         return {
             "filename": file.filename,
@@ -1278,11 +1546,12 @@ async def classify_single_file(file: UploadFile, timeout_handler: RequestTimeout
         }
     finally:
         # Clean up temporary file
-        if tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        if tmp_path:
+            Path(tmp_path).unlink(missing_ok=True)
 
 @app.post("/classify-documents")
 @limiter.limit("25/minute")  # 20-30 requests per minute (using 25 as middle)
+@cancel_on_disconnect
 async def classify_documents(request: Request, files: List[UploadFile] = File(...)):
     """
     Route and classify bulk documents using the two-prompt system.
@@ -1330,8 +1599,8 @@ async def classify_documents(request: Request, files: List[UploadFile] = File(..
     processed_results = []
     for i, result in enumerate(routing_results):
         if isinstance(result, Exception):
-            logger.error(f"Exception processing file {files[i].filename}: {result}")
-            logger.error(traceback.format_exc())
+            # Not inside an except block here, so hand the traceback over explicitly
+            logger.error("Exception processing file %s: %s", files[i].filename, result, exc_info=result)
             processed_results.append({
                 "filename": files[i].filename,
                 "routing": "ARCHIVE",
@@ -1416,7 +1685,7 @@ async def catch_all(path: str, request: Request):
     logger.warning(f"Client IP: {request.client.host if request.client else 'unknown'}")
     
     # Return proper 404 JSON response instead of letting it crash
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=404,
         content={
             "error": "Not Found",
@@ -1438,9 +1707,14 @@ async def catch_all(path: str, request: Request):
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Application shutting down...")
-    # Shutdown thread pool executor gracefully
-    TEXT_EXTRACTION_EXECUTOR.shutdown(wait=True)
-    logger.info("Thread pool executor shut down")
+    # Shutdown this process's extraction pool gracefully (if it was ever started);
+    # queued extractions are dropped
+    if _text_extraction_pid == os.getpid():
+        _text_extraction_executor.shutdown(wait=True, cancel_futures=True)
+        logger.info("Text extraction process pool shut down")
+    # Release pooled keep-alive connections to Supabase and OpenAI
+    close_supabase()
+    await openai_service.close_client()
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,53 +1,383 @@
 # openai_service.py
 import os
-import json
+import re
+import orjson
+import time
+import hashlib
 import logging
-from openai import AsyncOpenAI
+import random
+import httpx
+import tiktoken
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import List, Literal, Optional, Tuple
+import asyncio
+from openai import AsyncOpenAI, APIStatusError, RateLimitError
+from pydantic import BaseModel
+from job_service import amatch_routing_cache, astore_routing_cache
 from prompts import (
     DOCUMENT_ROUTING_AND_TOPIC_PROMPT,
     TOPIC_AWARE_DOCUMENT_ANALYSIS_PROMPT
     # CONSOLIDATED_CHANNEL_ANALYSIS_PROMPT - DISABLED (not needed for simplified 2-prompt system)
 )
 
+# Structured Outputs schemas mirroring the JSON blocks in prompts.py; the API guarantees
+# replies conform, so results need no field-by-field validation
+class RoutingResult(BaseModel):
+    channel: Literal["TAX", "KVK", "LEGAL_COMPLIANCE", "PERMITS_LICENSES", "BANKING_FINANCIAL",
+                     "EMPLOYMENT_PAYROLL", "INTELLECTUAL_PROPERTY", "GENERAL_ACTIONABLE", "ARCHIVE"]
+    topic_type: Optional[str]
+    topic_title: Optional[str]
+    routing: Literal["INBOX", "ARCHIVE"]
+    urgency: Literal["HIGH", "MEDIUM", "LOW"]
+    deadline: Optional[str]
+    authority: Optional[str]
+    reasoning: str
+
+class KeyDetails(BaseModel):
+    authority: Optional[str]
+    reference: Optional[str]
+    amount: Optional[str]
+    deadline: Optional[str]
+    period: Optional[str]
+
+class RequiredAction(BaseModel):
+    action: str
+    priority: int
+
+class AnalysisResult(BaseModel):
+    language: str
+    document_type: str
+    summary: str
+    key_details: KeyDetails
+    required_actions: List[RequiredAction]
+    risk_if_ignored: str
+
 # Load OpenAI credentials
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY environment variable is required")
 
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+# One shared HTTP/2 pool: concurrent routing/analysis calls multiplex over a few
+# connections instead of each opening (and TLS-handshaking) its own. Idle connections are
+# kept for a few minutes so calls after a quiet spell don't pay the handshake again.
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "64"))
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "300"))
+# Default per-request timeout; fail fast if a connection can't even be opened
+OPENAI_TIMEOUT = httpx.Timeout(float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60")), connect=5.0)
+client = AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    timeout=OPENAI_TIMEOUT,
+    # Retries happen in our own loops (see _backoff) so they stay counted and deadline-aware
+    max_retries=0,
+    http_client=httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=OPENAI_TIMEOUT,
+    ),
+)
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+# Callers fan out per file with their own semaphores; this caps chat calls in flight across
+# all of them in this process, so concurrent requests/jobs can't overrun the rate limit together
+OPENAI_MAX_CONCURRENT_REQUESTS = int(os.getenv("OPENAI_MAX_CONCURRENT_REQUESTS", "20"))
+_request_slots = asyncio.Semaphore(OPENAI_MAX_CONCURRENT_REQUESTS)
+# Optional per-process tokens-per-minute budget (0 = off). Set it to this process's share of
+# the account's TPM limit so bursts of large documents wait here instead of drawing 429s.
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "0"))
+# Reply tokens charged per request on top of the prompt (actual usage isn't known up front)
+OPENAI_REPLY_TOKEN_ESTIMATE = int(os.getenv("OPENAI_REPLY_TOKEN_ESTIMATE", "1000"))
 MAX_RETRIES = 3
+# Longest wait between attempts, including a server-sent Retry-After
+RETRY_MAX_DELAY = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "30"))
+
+
+class _TokenBudget:
+    """Tokens-per-minute budget: a token bucket refilled continuously, served in FIFO order."""
 
-async def classify_document(text: str) -> dict:
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.available = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def take(self, tokens: int):
+        """Wait until `tokens` fit in the budget, then spend them."""
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.capacity / 60)
+                self.updated = now
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                await asyncio.sleep((tokens - self.available) * 60 / self.capacity)
+
+_token_budget = _TokenBudget(OPENAI_TOKENS_PER_MINUTE) if OPENAI_TOKENS_PER_MINUTE > 0 else None
+
+@asynccontextmanager
+async def _request_slot(deadline: Optional[float], *prompt_parts: str):
+    """
+    Hold one of the process-wide request slots (after spending the prompt's tokens from the
+    TPM budget, if one is set) and yield the timeout the request itself may use.
+
+    Waiting for the budget and the slot counts against `deadline`, so a call queued behind
+    others can't overrun its caller's time limit; TimeoutError is raised if it runs out.
+    """
+    remaining = None if deadline is None else deadline - time.monotonic()
+    async with asyncio.timeout(remaining):
+        if _token_budget is not None:
+            encoding = _token_encoding()
+            tokens = sum(len(encoding.encode(part, disallowed_special=())) for part in prompt_parts)
+            await _token_budget.take(tokens + OPENAI_REPLY_TOKEN_ESTIMATE)
+        await _request_slots.acquire()
+    try:
+        if deadline is None:
+            yield OPENAI_TIMEOUT
+        else:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("Timed out waiting for an OpenAI request slot")
+            yield remaining
+    finally:
+        _request_slots.release()
+
+async def close_client():
+    """Close the shared OpenAI connection pool (call once on shutdown)."""
+    await client.close()
+
+
+async def _backoff(error: Exception, attempt: int, deadline: Optional[float] = None) -> bool:
+    """
+    Sleep before the next attempt after `error`; returns False if retrying can't help.
+
+    Rate limits wait for the server's Retry-After; other failures back off exponentially
+    with jitter so parallel callers don't retry in lockstep. 4xx responses other than
+    408/409/429 are deterministic and are not retried. A deadline caps the wait.
+    """
+    if attempt >= MAX_RETRIES:
+        return False
+    delay = None
+    if isinstance(error, RateLimitError):
+        try:
+            delay = float(error.response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+    elif isinstance(error, APIStatusError) and error.status_code < 500 and error.status_code not in (408, 409):
+        return False
+    if delay is None:
+        delay = 2 ** (attempt - 1) + random.random()
+    delay = min(delay, RETRY_MAX_DELAY)
+    if deadline is not None:
+        delay = min(delay, max(0.0, deadline - time.monotonic()))
+    logging.info(f"Retrying in {delay:.1f}s")
+    await asyncio.sleep(delay)
+    return True
+
+# Longest document text sent to the model (~50k tokens); anything past it is dropped
+MAX_PROMPT_CHARS = int(os.getenv("MAX_PROMPT_CHARS", "200000"))
+
+def truncate_for_prompt(text: str) -> str:
+    """
+    Cut document text down to MAX_PROMPT_CHARS.
+    Callers sending one document through several prompts should do this once up front;
+    text that is already short enough is returned as-is, so the per-call check is free.
+    """
+    if len(text) <= MAX_PROMPT_CHARS:
+        return text
+    logging.info(f"Truncating document text from {len(text)} to {MAX_PROMPT_CHARS} characters for the prompt")
+    return text[:MAX_PROMPT_CHARS]
+
+# In-process LRU cache of model answers, keyed by everything that determines them (model,
+# system prompt, user message, temperature). Re-uploaded or duplicate documents then skip
+# the API call entirely. Only answers that passed validation are cached.
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MAX_SIZE = int(os.getenv("LLM_CACHE_MAX_SIZE", "1024"))
+_llm_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+llm_cache_stats = {"hits": 0, "misses": 0}
+
+def _llm_cache_key(system_prompt: str, user_content: str, temperature: float) -> str:
+    """SHA-256 over the request inputs (hashed piecewise, so large texts aren't copied)."""
+    digest = hashlib.sha256()
+    for part in (OPENAI_MODEL, system_prompt, repr(temperature), user_content):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def _llm_cache_get(key: str) -> Optional[dict]:
+    """Return a fresh copy of a cached answer, or None on a miss/expired entry."""
+    entry = _llm_cache.get(key)
+    if entry is not None and entry[0] < time.monotonic():
+        del _llm_cache[key]
+        entry = None
+    if entry is None:
+        llm_cache_stats["misses"] += 1
+        return None
+    _llm_cache.move_to_end(key)
+    llm_cache_stats["hits"] += 1
+    return orjson.loads(entry[1])
+
+def _llm_cache_put(key: str, content: str):
+    """Cache a validated answer's raw JSON, evicting the least recently used when full."""
+    if LLM_CACHE_TTL_SECONDS <= 0 or LLM_CACHE_MAX_SIZE <= 0:
+        return
+    _llm_cache[key] = (time.monotonic() + LLM_CACHE_TTL_SECONDS, content)
+    _llm_cache.move_to_end(key)
+    while len(_llm_cache) > LLM_CACHE_MAX_SIZE:
+        _llm_cache.popitem(last=False)
+
+# Semantic routing cache (see supabase_routing_cache_migration.sql): a near-duplicate of one
+# of the same user's already-routed documents reuses its decision for the price of one
+# embedding call. Entries never cross users (a decision carries its document's topic,
+# deadline and sender), and only callers that pass a user_id use the cache.
+# Checked after the exact-match cache; off unless SEMANTIC_CACHE_ENABLED=true.
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_MIN_SIMILARITY = float(os.getenv("SEMANTIC_CACHE_MIN_SIMILARITY", "0.95"))
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+# The start of a document is enough to recognise a near-duplicate
+EMBEDDING_INPUT_CHARS = 8000
+# Cache writes run in the background; keep references so they aren't garbage-collected
+_background_tasks = set()
+
+async def _embed_for_routing(text: str) -> Optional[list]:
+    """Embedding of the start of a document for the routing cache, or None on failure."""
+    try:
+        response = await client.embeddings.create(model=EMBEDDING_MODEL, input=text[:EMBEDDING_INPUT_CHARS])
+        return response.data[0].embedding
+    except Exception as e:
+        logging.warning(f"Embedding for routing cache failed: {e}")
+        return None
+
+def _store_routing_decision(embedding: list, result: dict, user_id: str):
+    """Save a user's routing decision to the semantic cache without delaying the caller."""
+    # ARCHIVE decisions are never cached, so a missed document can't pull similar ones with it
+    if result.get("routing") == "ARCHIVE":
+        return
+    task = asyncio.create_task(astore_routing_cache(embedding, result, user_id))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+# Keyword pre-filter: reference documents the routing prompt always archives (statements,
+# certificates, policies) are routed without a model call, unless they also carry any of
+# the action language the prompt says must never be archived. Off by default: a keyword list
+# can't prove the absence of an action, so enable it only once validated on real traffic.
+ROUTING_PREFILTER_ENABLED = os.getenv("ROUTING_PREFILTER_ENABLED", "false").lower() == "true"
+_ARCHIVE_SIGNALS = re.compile(
+    r"\b(bank statement|account statement|kontoauszug|rekeningafschrift|iso 9001|iso 27001|policy number)\b",
+    re.IGNORECASE,
+)
+_ACTION_SIGNALS = re.compile(
+    # English
+    r"\b(reminders?|overdue|pay within|payment due|invoices?|receipts?|deadlines?|action required|penalt(y|ies))\b"
+    # Dutch and German, matched inside words too since both build compounds
+    # (betalingsherinnering, Zahlungserinnerung, Mahngebühr)
+    r"|aanmaning|herinnering|factu(ur|ren)|uiterlijk|betalen|boete|vervaldatum|termijn"
+    r"|mahn|erinnerung|rechnung|f[äa]llig|frist|zahlbar|bu[ßs]geld|s[äa]umnis",
+    re.IGNORECASE,
+)
+routing_prefilter_stats = {"bypassed": 0, "model": 0}
+
+def _quick_archive_check(text: str) -> Optional[dict]:
+    """Return an ARCHIVE decision for unambiguous reference documents, else None."""
+    if not ROUTING_PREFILTER_ENABLED:
+        return None
+    match = _ARCHIVE_SIGNALS.search(text)
+    if match is None or _ACTION_SIGNALS.search(text):
+        routing_prefilter_stats["model"] += 1
+        return None
+    routing_prefilter_stats["bypassed"] += 1
+    total = routing_prefilter_stats["bypassed"] + routing_prefilter_stats["model"]
+    logging.info(f"Routing pre-filter archived document on '{match.group(0)}' "
+                 f"(bypass rate {routing_prefilter_stats['bypassed']}/{total})")
+    return _archive_decision(f"Reference document ('{match.group(0)}') with no action language - auto-filed to archive")
+
+def _archive_decision(reasoning: str) -> dict:
+    """A routing result that files the document to ARCHIVE."""
+    return {
+        "channel": "ARCHIVE",
+        "topic_type": None,
+        "topic_title": None,
+        "routing": "ARCHIVE",
+        "urgency": "LOW",
+        "deadline": None,
+        "authority": None,
+        "reasoning": reasoning
+    }
+
+def _log_usage(response, label: str):
+    """Log token usage, including how much of the prompt was served from OpenAI's prompt cache."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) or 0
+    logging.info(f"{label} usage: {usage.prompt_tokens} prompt tokens ({cached_tokens} cached), "
+                 f"{usage.completion_tokens} completion tokens")
+
+async def classify_document(text: str, timeout: Optional[float] = None, user_id: Optional[str] = None) -> dict:
     """
     Classify and route a document using Prompt 1 (Routing + Topic Creation).
     Returns routing decision and topic information.
+    
+    timeout (seconds) bounds all attempts together: each request gets the time that is
+    left, and TimeoutError is raised once none remains.
+    user_id (the document's owner) enables the semantic routing cache for this call.
     """
     logging.info("Classifying and routing document...")
+    text = truncate_for_prompt(text)
+    quick = _quick_archive_check(text)
+    if quick is not None:
+        return quick
+    cache_key = _llm_cache_key(DOCUMENT_ROUTING_AND_TOPIC_PROMPT, text, 0.2)
+    cached = _llm_cache_get(cache_key)
+    if cached is not None:
+        logging.info(f"Routing cache hit - Channel: {cached.get('channel')}")
+        return cached
+    embedding = None
+    if SEMANTIC_CACHE_ENABLED and user_id:
+        embedding = await _embed_for_routing(text)
+        if embedding is not None:
+            cached = await amatch_routing_cache(embedding, 1 - SEMANTIC_CACHE_MIN_SIMILARITY, user_id)
+            if cached is not None:
+                logging.info(f"Semantic routing cache hit - Channel: {cached.get('channel')}")
+                return cached
+    deadline = time.monotonic() + timeout if timeout is not None else None
     for attempt in range(1, MAX_RETRIES + 1):
+        if deadline is not None and deadline <= time.monotonic():
+            raise TimeoutError("Routing timed out")
         try:
             logging.info(f"Attempt {attempt}: Sending routing request to OpenAI...")
-            response = await client.chat.completions.create(
-                model=OPENAI_MODEL,
-                response_format={"type": "json_object"},
-                messages=[
-                    {"role": "system", "content": DOCUMENT_ROUTING_AND_TOPIC_PROMPT},
-                    {"role": "user", "content": text}
-                ],
-                temperature=0.2  # Low temperature for consistent routing decisions
-            )
-            content = response.choices[0].message.content.strip()
-            logging.debug(f"OpenAI routing response: {content}")
-            result = json.loads(content)
+            async with _request_slot(deadline, DOCUMENT_ROUTING_AND_TOPIC_PROMPT, text) as request_timeout:
+                response = await client.beta.chat.completions.parse(
+                    model=OPENAI_MODEL,
+                    response_format=RoutingResult,
+                    messages=[
+                        {"role": "system", "content": DOCUMENT_ROUTING_AND_TOPIC_PROMPT},
+                        {"role": "user", "content": text}
+                    ],
+                    temperature=0.2,  # Low temperature for consistent routing decisions
+                    timeout=request_timeout
+                )
+            _log_usage(response, "Routing")
+            message = response.choices[0].message
+            logging.debug(f"OpenAI routing response: {message.content}")
 
-            # Validate required fields
-            if isinstance(result, dict) and "channel" in result and "routing" in result:
+            if message.parsed is not None:
+                result = message.parsed.model_dump()
+                _llm_cache_put(cache_key, message.content)
+                if embedding is not None:
+                    _store_routing_decision(embedding, result, user_id)
                 logging.info(f"Document routed to: {result.get('routing')} - Channel: {result.get('channel')}")
                 if result.get('routing') == 'INBOX':
                     logging.info(f"Topic created: {result.get('topic_title')} (Type: {result.get('topic_type')})")
                 return result
             else:
-                logging.warning("Unexpected routing format. Defaulting to ARCHIVE.")
+                logging.warning(f"Routing refused ({message.refusal}). Defaulting to ARCHIVE.")
                 return {
                     "channel": "ARCHIVE",
                     "topic_type": None,
@@ -61,6 +391,8 @@ async def classify_document(text: str) -> dict:
 
         except Exception as e:
             logging.warning(f"Routing attempt {attempt} failed: {e}")
+            if not await _backoff(e, attempt, deadline):
+                break
     
     logging.error("All routing attempts failed. Defaulting to ARCHIVE.")
     return {
@@ -74,47 +406,66 @@ async def classify_document(text: str) -> dict:
         "reasoning": "All classification attempts failed - routing to archive"
     }
 
+# User message for topic analysis. The system prompt is sent verbatim and this message
+# starts with its fixed instruction, so every call shares the longest possible prefix for
+# OpenAI's automatic prompt caching; per-document parts come last.
+_ANALYSIS_USER_TEMPLATE = """Provide a detailed analysis with specific actionable items for this topic.
 
-async def analyze_document(text: str, channel: str = None, topic_type: str = None, topic_title: str = None) -> dict:
-    """
-    Analyze a document using Prompt 2 (Topic-Aware Analysis).
-    Used only for INBOX documents after routing.
-    """
-    logging.info(f"Analyzing inbox topic: {topic_title} (Channel: {channel}, Type: {topic_type})")
-    
-    # Build context-aware analysis prompt
-    analysis_prompt = f"""
 Channel: {channel}
 Topic Type: {topic_type}
 Topic Title: {topic_title}
 
 Document text to analyze:
 {text}
+""".format
 
-Provide a detailed analysis with specific actionable items for this topic.
-"""
+async def analyze_document(text: str, channel: str = None, topic_type: str = None, topic_title: str = None,
+                           timeout: Optional[float] = None) -> dict:
+    """
+    Analyze a document using Prompt 2 (Topic-Aware Analysis).
+    Used only for INBOX documents after routing.
     
+    timeout (seconds) bounds all attempts together, including time spent queued for a
+    request slot; TimeoutError is raised once none remains.
+    """
+    logging.info(f"Analyzing inbox topic: {topic_title} (Channel: {channel}, Type: {topic_type})")
+    text = truncate_for_prompt(text)
+    analysis_prompt = _ANALYSIS_USER_TEMPLATE(channel=channel, topic_type=topic_type,
+                                              topic_title=topic_title, text=text)
+    cache_key = _llm_cache_key(TOPIC_AWARE_DOCUMENT_ANALYSIS_PROMPT, analysis_prompt, 0.2)
+    cached = _llm_cache_get(cache_key)
+    if cached is not None:
+        logging.info("Topic analysis cache hit")
+        return cached
+    
+    deadline = time.monotonic() + timeout if timeout is not None else None
     for attempt in range(1, MAX_RETRIES + 1):
+        if deadline is not None and deadline <= time.monotonic():
+            raise TimeoutError("Topic analysis timed out")
         try:
             logging.info(f"Attempt {attempt}: Sending topic analysis request to OpenAI...")
-            response = await client.chat.completions.create(
-                model=OPENAI_MODEL,
-                response_format={"type": "json_object"},
-                messages=[
-                    {"role": "system", "content": TOPIC_AWARE_DOCUMENT_ANALYSIS_PROMPT},
-                    {"role": "user", "content": analysis_prompt}
-                ],
-                temperature=0.2
-            )
-            content = response.choices[0].message.content.strip()
-            logging.debug(f"OpenAI topic analysis response: {content}")
-            result = json.loads(content)
+            async with _request_slot(deadline, TOPIC_AWARE_DOCUMENT_ANALYSIS_PROMPT, analysis_prompt) as request_timeout:
+                response = await client.beta.chat.completions.parse(
+                    model=OPENAI_MODEL,
+                    response_format=AnalysisResult,
+                    messages=[
+                        {"role": "system", "content": TOPIC_AWARE_DOCUMENT_ANALYSIS_PROMPT},
+                        {"role": "user", "content": analysis_prompt}
+                    ],
+                    temperature=0.2,
+                    timeout=request_timeout
+                )
+            _log_usage(response, "Topic analysis")
+            message = response.choices[0].message
+            logging.debug(f"OpenAI topic analysis response: {message.content}")
 
-            if isinstance(result, dict) and "summary" in result:
-                logging.info(f"Successfully analyzed topic with {len(result.get('actionable_items', []))} actionable items")
+            if message.parsed is not None:
+                result = message.parsed.model_dump()
+                _llm_cache_put(cache_key, message.content)
+                logging.info(f"Successfully analyzed topic with {len(result['required_actions'])} required actions")
                 return result
             else:
-                logging.warning("Unexpected analysis format.")
+                logging.warning(f"Topic analysis refused ({message.refusal}).")
                 return {
                     "summary": "Analysis completed but format was unexpected",
                     "key_data": {},
@@ -132,6 +483,8 @@ Provide a detailed analysis with specific actionable items for this topic.
 
         except Exception as e:
             logging.warning(f"Topic analysis attempt {attempt} failed: {e}")
+            if not await _backoff(e, attempt, deadline):
+                break
     
     logging.error("All topic analysis attempts failed.")
     return {
@@ -149,50 +502,144 @@ Provide a detailed analysis with specific actionable items for this topic.
         "status": "OPEN"
     }
 
-async def analyze_multiple_documents_consolidated(combined_text: str, file_info: list, channel: str, topics: list = None) -> dict:
+DOCUMENT_SEPARATOR = "\n\n--- DOCUMENT SEPARATOR ---\n\n"
+# Token budget for the sampled document text in the consolidated prompt; leaves room for the
+# instructions, file metadata and the 3000-token reply within the context window
+CONSOLIDATED_SAMPLE_TOKENS = int(os.getenv("CONSOLIDATED_SAMPLE_TOKENS", "12000"))
+# Tokens are rarely longer than this many characters, so head/tail windows this wide per
+# token hold the tokens we keep without encoding the whole text
+MAX_CHARS_PER_TOKEN = 8
+
+@lru_cache(maxsize=1)
+def _token_encoding():
+    """Tokenizer for OPENAI_MODEL (loaded once, on first use)."""
+    try:
+        return tiktoken.encoding_for_model(OPENAI_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+def _head_of_texts(texts: list, limit: int) -> str:
+    """First `limit` characters of DOCUMENT_SEPARATOR.join(texts), without building the join."""
+    parts = []
+    remaining = limit
+    for i, text in enumerate(texts):
+        for piece in ((DOCUMENT_SEPARATOR, text) if i else (text,)):
+            if remaining <= 0:
+                return "".join(parts)
+            parts.append(piece[:remaining])
+            remaining -= len(parts[-1])
+    return "".join(parts)
+
+def _tail_of_texts(texts: list, limit: int) -> str:
+    """Last `limit` characters of DOCUMENT_SEPARATOR.join(texts), without building the join."""
+    parts = []
+    remaining = limit
+    for i in range(len(texts) - 1, -1, -1):
+        for piece in ((texts[i], DOCUMENT_SEPARATOR) if i else (texts[i],)):
+            if remaining <= 0:
+                return "".join(reversed(parts))
+            parts.append(piece[-remaining:])
+            remaining -= len(parts[-1])
+    return "".join(reversed(parts))
+
+# Consolidated prompt pieces; the fixed instruction leads so calls share a cacheable prefix
+_TOPICS_INFO_TEMPLATE = """
+Topics in this channel:
+{topics}
+""".format
+_CONSOLIDATED_USER_TEMPLATE = """Provide a comprehensive consolidated analysis focusing on channel-specific insights and actionable items.
+
+Channel: {channel}
+Number of documents: {document_count}
+
+{topics_info}
+
+Document Information:
+{file_info}
+
+Analyze the following combined text from all documents in this channel:
+{text_sample}
+""".format
+
+def _json_object_end(chunk: str, state: list) -> int:
+    """
+    Feed the next chunk of a streamed JSON reply; returns the index just past the brace
+    that closes its top-level object, or -1 if the object is still open.
+
+    state is [depth, in_string, escaped], carried between calls so the reply is scanned
+    once in total rather than re-parsed on every chunk.
+    """
+    depth, in_string, escaped = state
+    end = -1
+    for i, char in enumerate(chunk):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                end = i + 1
+                break
+    state[:] = [depth, in_string, escaped]
+    return end
+
+async def analyze_multiple_documents_consolidated(texts: list, file_info: list, channel: str, topics: list = None) -> dict:
     """
     Analyze multiple documents in a channel using consolidated channel analysis.
     Uses Prompt 3 (Consolidated Channel Analysis).
+    
+    texts holds each document's extracted text; they are treated as joined with
+    DOCUMENT_SEPARATOR, but only the sampled part is ever materialized.
     """
+    combined_length = sum(len(text) for text in texts) + len(DOCUMENT_SEPARATOR) * max(len(texts) - 1, 0)
     logging.info(f"Performing consolidated channel analysis for {channel}")
     logging.info(f"Analyzing {len(file_info)} documents")
-    logging.info(f"Total combined text length: {len(combined_text)} characters")
+    logging.info(f"Total combined text length: {combined_length} characters")
 
-    # Smart text sampling for better analysis
-    if len(combined_text) > 50000:
-        # For very large text, use smart sampling to get representative content
-        # Take first 25,000 chars (beginning of documents) and last 25,000 chars (end of documents)
-        first_part = combined_text[:25000]
-        last_part = combined_text[-25000:]
-        text_sample = first_part + "\n\n[... MIDDLE CONTENT TRUNCATED ...]\n\n" + last_part
-        logging.info(f"Using smart sampling: {len(text_sample)} characters (first 25k + last 25k of {len(combined_text)} total)")
+    # Smart text sampling for better analysis, budgeted in tokens rather than characters
+    encoding = _token_encoding()
+    half_budget = CONSOLIDATED_SAMPLE_TOKENS // 2
+    window = half_budget * MAX_CHARS_PER_TOKEN
+    if combined_length <= 2 * window:
+        text_sample = DOCUMENT_SEPARATOR.join(texts)
+        tokens = encoding.encode(text_sample, disallowed_special=())
+        head_tokens, tail_tokens = tokens[:half_budget], tokens[-half_budget:]
+        total_tokens = len(tokens)
     else:
+        # Only tokenize the two windows we can draw from; the middle is dropped anyway
+        head_tokens = encoding.encode(_head_of_texts(texts, window), disallowed_special=())[:half_budget]
+        tail_tokens = encoding.encode(_tail_of_texts(texts, window), disallowed_special=())[-half_budget:]
+        total_tokens = None
+    if total_tokens is not None and total_tokens <= CONSOLIDATED_SAMPLE_TOKENS:
         # For smaller text, use all content
-        text_sample = combined_text
-        logging.info(f"Using all {len(text_sample)} characters for analysis")
+        logging.info(f"Using all {total_tokens} tokens ({len(text_sample)} characters) for analysis")
+    else:
+        # For very large text, use smart sampling to get representative content
+        # Take the first and last half of the token budget (beginning and end of documents)
+        text_sample = (encoding.decode(head_tokens) + "\n\n[... MIDDLE CONTENT TRUNCATED ...]\n\n"
+                       + encoding.decode(tail_tokens))
+        logging.info(f"Using smart sampling: first {len(head_tokens)} + last {len(tail_tokens)} tokens "
+                     f"of {combined_length} characters")
     
     # Build consolidated analysis prompt
     topics_info = ""
     if topics:
-        topics_info = f"""
-Topics in this channel:
-{json.dumps(topics, indent=2)}
-"""
-    
-    consolidated_prompt = f"""
-Channel: {channel}
-Number of documents: {len(file_info)}
-
-{topics_info}
-
-Document Information:
-{json.dumps(file_info, indent=2)}
-
-Analyze the following combined text from all documents in this channel:
-{text_sample}
-
-Provide a comprehensive consolidated analysis focusing on channel-specific insights and actionable items.
-"""
+        topics_info = _TOPICS_INFO_TEMPLATE(topics=orjson.dumps(topics, option=orjson.OPT_INDENT_2).decode())
+    consolidated_prompt = _CONSOLIDATED_USER_TEMPLATE(
+        channel=channel,
+        document_count=len(file_info),
+        topics_info=topics_info,
+        file_info=orjson.dumps(file_info, option=orjson.OPT_INDENT_2).decode(),
+        text_sample=text_sample,
+    )
 
     for attempt in range(1, MAX_RETRIES + 1):
         try:
@@ -202,7 +649,9 @@ Provide a comprehensive consolidated analysis focusing on channel-specific insig
             
             # This function is disabled - consolidated analysis not needed for MVP
             # Keeping code for reference only
-            response = await client.chat.completions.create(
+            # Streamed so generation can be cut off as soon as the JSON object is complete;
+            # max_tokens still bounds the reply if it never closes
+            stream = await client.chat.completions.create(
                 model=OPENAI_MODEL,
                 response_format={"type": "json_object"},
                 messages=[
@@ -210,11 +659,26 @@ Provide a comprehensive consolidated analysis focusing on channel-specific insig
                     {"role": "user", "content": consolidated_prompt}
                 ],
                 temperature=0.3,
-                max_tokens=3000
+                max_tokens=3000,
+                stream=True
             )
-            content = response.choices[0].message.content.strip()
+            parts = []
+            scan_state = [0, False, False]
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content or ""
+                    end = _json_object_end(delta, scan_state)
+                    if end >= 0:
+                        parts.append(delta[:end])
+                        break
+                    parts.append(delta)
+            finally:
+                await stream.close()
+            content = "".join(parts).strip()
             logging.debug(f"OpenAI consolidated channel analysis response: {content}")
-            result = json.loads(content)
+            result = orjson.loads(content)
 
             if isinstance(result, dict) and "comprehensive_summary" in result:
                 logging.info(f"Successfully analyzed {len(file_info)} documents in {channel} channel")
@@ -244,6 +708,8 @@ Provide a comprehensive consolidated analysis focusing on channel-specific insig
             if hasattr(e, '__traceback__'):
                 import traceback
                 logging.error(f"Full traceback: {traceback.format_exc()}")
+            if not await _backoff(e, attempt):
+                break
     
     logging.error("All consolidated channel analysis attempts failed.")
     return {
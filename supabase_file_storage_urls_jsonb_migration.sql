@@ -0,0 +1,17 @@
+-- Store inbox_jobs.file_storage_urls as native JSONB.
+--
+-- store_file_storage_urls() sends the file list as a JSON array. When the column was TEXT,
+-- PostgREST stored it as a (sometimes double-encoded) string that every reader had to
+-- re-parse. With JSONB the list round-trips as a list and get_file_data() no longer needs
+-- its string-parsing fallbacks.
+--
+-- Run this in Supabase SQL editor (or via migration) against the DB that hosts inbox_jobs.
+
+-- 1) Convert the column type (no-op if it is already jsonb)
+ALTER TABLE public.inbox_jobs
+  ALTER COLUMN file_storage_urls TYPE jsonb USING file_storage_urls::jsonb;
+
+-- 2) Unwrap historical rows that were stored as a JSON string containing the array
+UPDATE public.inbox_jobs
+  SET file_storage_urls = (file_storage_urls #>> '{}')::jsonb
+  WHERE jsonb_typeof(file_storage_urls) = 'string';
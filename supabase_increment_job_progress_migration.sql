@@ -0,0 +1,19 @@
+-- Atomic progress counter for workers (used by job_service.increment_job_progress).
+--
+-- Bumps processed_files and recomputes progress in one statement, so files finishing
+-- concurrently can't overwrite each other's counts and the worker doesn't need to know
+-- the current value before writing.
+--
+-- Run this in Supabase SQL editor (or via migration) against the DB that hosts inbox_jobs.
+
+CREATE OR REPLACE FUNCTION public.increment_job_progress(job_id uuid, delta int DEFAULT 1)
+RETURNS TABLE (processed_files int, progress int)
+LANGUAGE sql
+AS $$
+  UPDATE public.inbox_jobs AS j
+  SET processed_files = j.processed_files + delta,
+      progress = LEAST(100, (j.processed_files + delta) * 100 / NULLIF(j.total_files, 0)),
+      updated_at = now()
+  WHERE j.id = increment_job_progress.job_id
+  RETURNING j.processed_files, j.progress;
+$$;
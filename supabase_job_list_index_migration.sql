@@ -0,0 +1,19 @@
+-- Index the unfiltered per-user job listing.
+--
+-- supabase_status_enum_migration.sql already covers the other hot lookups:
+--   - get_job / get_job_light: id is the primary key, user_id is checked on that one row
+--   - get_jobs_by_user_id with ?status=: inbox_jobs_user_status_created_idx
+--   - get_pending_jobs / pop_pending_jobs: partial inbox_jobs_ready_created_idx
+-- GET /jobs without a status filter (the default) can't use the (user_id, status, created_at)
+-- index for its ORDER BY created_at DESC, so it sorts every row the user has. This index
+-- lets it read the newest `limit` rows directly.
+--
+-- Run this in Supabase SQL editor (or via migration) against the DB that hosts inbox_jobs.
+-- CONCURRENTLY cannot run inside a transaction block; run this statement on its own.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS inbox_jobs_user_created_idx
+  ON public.inbox_jobs (user_id, created_at DESC);
+
+-- Check with:
+--   EXPLAIN (ANALYZE) SELECT id FROM public.inbox_jobs WHERE user_id = '<user>' ORDER BY created_at DESC LIMIT 100;
+-- which should use "Index Scan using inbox_jobs_user_created_idx" with no separate Sort node.
@@ -0,0 +1,23 @@
+-- Store inbox_jobs.result and inbox_jobs.file_data as native JSONB.
+--
+-- update_job_status() and store_file_data() now send these values as JSON objects/arrays
+-- instead of pre-serialized strings, and readers (get_job, get_jobs_by_user_id,
+-- get_file_data) no longer json-parse them row by row.
+--
+-- Run this in Supabase SQL editor (or via migration) against the DB that hosts inbox_jobs.
+
+-- 1) Convert the column types (no-op for a column that is already jsonb)
+ALTER TABLE public.inbox_jobs
+  ALTER COLUMN result TYPE jsonb USING result::jsonb;
+
+ALTER TABLE public.inbox_jobs
+  ALTER COLUMN file_data TYPE jsonb USING file_data::jsonb;
+
+-- 2) Unwrap historical rows that were written as a JSON string containing the value
+UPDATE public.inbox_jobs
+  SET result = (result #>> '{}')::jsonb
+  WHERE jsonb_typeof(result) = 'string';
+
+UPDATE public.inbox_jobs
+  SET file_data = (file_data #>> '{}')::jsonb
+  WHERE jsonb_typeof(file_data) = 'string';
@@ -0,0 +1,33 @@
+-- Atomic job dispatch for workers (used by job_service.get_pending_jobs).
+--
+-- pop_pending_jobs claims up to `lim` READY jobs (READY -> PROCESSING) in a single
+-- statement. FOR UPDATE SKIP LOCKED lets concurrent workers pull disjoint batches
+-- without contending on the same rows, and = ANY(ARRAY(...)) keeps the inner peek a
+-- cheap index scan that is evaluated once.
+--
+-- Run this in Supabase SQL editor (or via migration) against the DB that hosts inbox_jobs.
+
+-- 1) Claim function
+CREATE OR REPLACE FUNCTION public.pop_pending_jobs(lim int DEFAULT 10)
+RETURNS SETOF public.inbox_jobs
+LANGUAGE sql
+AS $$
+  UPDATE public.inbox_jobs
+  SET status = 'processing',
+      updated_at = now()
+  WHERE id = ANY(ARRAY(
+    SELECT id
+    FROM public.inbox_jobs
+    WHERE status = 'ready'
+    ORDER BY created_at
+    LIMIT lim
+    FOR UPDATE SKIP LOCKED
+  ))
+  RETURNING *;
+$$;
+
+-- 2) Partial index so the inner peek only touches worker-visible rows.
+-- CONCURRENTLY cannot run inside a transaction block; run this statement on its own.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS inbox_jobs_ready_created_idx
+  ON public.inbox_jobs (created_at)
+  WHERE status = 'ready';
@@ -0,0 +1,31 @@
+-- Let front-end clients receive job progress over Supabase Realtime instead of polling GET /job/{id}.
+--
+-- inbox_jobs is already in the supabase_realtime publication (supabase_realtime_migration.sql).
+-- Realtime only delivers postgres_changes rows the subscriber may SELECT, so clients signed in
+-- with Supabase Auth need an RLS policy scoped to their own jobs (user_id = auth.uid()).
+-- The API and worker use the service role key and bypass RLS, so they are unaffected.
+--
+-- Progress writes are coalesced by the worker (JOB_PROGRESS_FLUSH_INTERVAL_SECONDS, 250 ms by
+-- default), so each job emits at most a few UPDATE events per second.
+--
+-- Front-end subscription (supabase-js v2):
+--
+--   supabase
+--     .channel(`inbox_jobs:${userId}`)
+--     .on('postgres_changes',
+--         { event: 'UPDATE', schema: 'public', table: 'inbox_jobs', filter: `user_id=eq.${userId}` },
+--         (payload) => render(payload.new))
+--     .subscribe()
+--
+-- Fetch the job once with GET /job/{job_id} for the initial state, then rely on the events.
+--
+-- Run this in Supabase SQL editor (or via migration) against the DB that hosts inbox_jobs.
+
+ALTER TABLE public.inbox_jobs ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS inbox_jobs_select_own ON public.inbox_jobs;
+CREATE POLICY inbox_jobs_select_own
+  ON public.inbox_jobs
+  FOR SELECT
+  TO authenticated
+  USING (user_id = auth.uid()::text);
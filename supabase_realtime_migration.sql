@@ -0,0 +1,8 @@
+-- Enable Supabase Realtime on inbox_jobs.
+--
+-- The worker subscribes to INSERT/UPDATE events with status = 'ready' so it can pick
+-- up new jobs immediately instead of waiting for its next poll.
+--
+-- Run this in Supabase SQL editor (or via migration) against the DB that hosts inbox_jobs.
+
+ALTER PUBLICATION supabase_realtime ADD TABLE public.inbox_jobs;
@@ -0,0 +1,64 @@
+-- Semantic cache for document routing (used by openai_service.classify_document).
+--
+-- Near-duplicate documents (the same VAT reminder for another quarter, repeated KVK notices)
+-- get the same routing decision. Each routed document's embedding is stored with its
+-- decision; a new document whose embedding is within max_distance (cosine) of a stored one
+-- reuses that decision instead of calling the chat model.
+-- Entries are scoped to the user whose document produced them - a decision carries that
+-- document's topic, deadline and sender, so it is never served to anyone else.
+-- ARCHIVE decisions are never stored, so a false negative can't spread to similar documents.
+-- Only used when SEMANTIC_CACHE_ENABLED=true.
+--
+-- Run this in Supabase SQL editor (or via migration) against the DB that hosts inbox_jobs.
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE TABLE IF NOT EXISTS public.routing_cache (
+  id bigserial PRIMARY KEY,
+  user_id text NOT NULL,             -- inbox_jobs.user_id of the document
+  embedding vector(1536) NOT NULL,   -- text-embedding-3-small
+  payload jsonb NOT NULL,            -- classify_document result
+  created_at timestamptz NOT NULL DEFAULT now(),
+  expires_at timestamptz NOT NULL DEFAULT now() + interval '30 days'
+);
+
+-- Tables created by an earlier version of this migration had no owner column; their
+-- unscoped rows can't be attributed to a user, so they are dropped
+ALTER TABLE public.routing_cache ADD COLUMN IF NOT EXISTS user_id text;
+DELETE FROM public.routing_cache
+  WHERE user_id IS NULL OR payload->>'routing' IS DISTINCT FROM 'INBOX';
+ALTER TABLE public.routing_cache ALTER COLUMN user_id SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS routing_cache_embedding_idx
+  ON public.routing_cache USING hnsw (embedding vector_cosine_ops);
+
+CREATE INDEX IF NOT EXISTS routing_cache_user_idx
+  ON public.routing_cache (user_id);
+
+DROP FUNCTION IF EXISTS public.match_routing_cache(vector, float);
+
+-- Nearest unexpired entry of this user, if it is within max_distance
+-- (cosine distance = 1 - similarity)
+CREATE OR REPLACE FUNCTION public.match_routing_cache(
+  query_embedding vector(1536),
+  max_distance float,
+  owner_id text
+)
+RETURNS TABLE (payload jsonb, distance float)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT payload, distance
+  FROM (
+    SELECT payload, embedding <=> query_embedding AS distance
+    FROM public.routing_cache
+    WHERE user_id = owner_id
+      AND expires_at > now()
+    ORDER BY embedding <=> query_embedding
+    LIMIT 1
+  ) nearest
+  WHERE distance < max_distance;
+$$;
+
+-- Expired rows are skipped by match_routing_cache; remove them periodically with:
+--   DELETE FROM public.routing_cache WHERE expires_at <= now();
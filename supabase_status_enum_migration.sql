@@ -0,0 +1,47 @@
+-- Store inbox_jobs.status as a native enum and index the per-user job listing.
+--
+-- An enum compares as a 4-byte value instead of text and rejects unknown statuses on its
+-- own, so it replaces the check_status constraint from supabase_status_constraint_migration.sql.
+-- The app keeps sending plain strings ('ready', 'processing', ...) - Postgres casts them.
+--
+-- Run this in Supabase SQL editor (or via migration) against the DB that hosts inbox_jobs.
+-- Apply after supabase_pop_pending_jobs_migration.sql (its partial index is rebuilt below).
+
+-- 1) Enum type. Keep 'pending' for backward compatibility with historical rows, but new code uses:
+-- created -> ready -> processing -> completed|failed
+DO $$
+BEGIN
+  CREATE TYPE public.job_status AS ENUM ('pending','created','ready','processing','completed','failed');
+EXCEPTION
+  WHEN duplicate_object THEN NULL;
+END
+$$;
+
+-- 2) Drop things that reference status as text, then swap the column type
+ALTER TABLE public.inbox_jobs
+  DROP CONSTRAINT IF EXISTS check_status;
+
+DROP INDEX IF EXISTS public.inbox_jobs_ready_created_idx;
+
+ALTER TABLE public.inbox_jobs
+  ALTER COLUMN status DROP DEFAULT;
+
+ALTER TABLE public.inbox_jobs
+  ALTER COLUMN status TYPE public.job_status USING status::public.job_status;
+
+ALTER TABLE public.inbox_jobs
+  ALTER COLUMN status SET DEFAULT 'created';
+
+-- 3) Worker dispatch: partial index so pop_pending_jobs only touches READY rows
+CREATE INDEX IF NOT EXISTS inbox_jobs_ready_created_idx
+  ON public.inbox_jobs (created_at)
+  WHERE status = 'ready';
+
+-- 4) GET /jobs: get_jobs_by_user_id filters by user_id (and optionally status),
+-- newest first
+CREATE INDEX IF NOT EXISTS inbox_jobs_user_status_created_idx
+  ON public.inbox_jobs (user_id, status, created_at DESC);
+
+-- Check with:
+--   EXPLAIN (ANALYZE) SELECT id FROM public.inbox_jobs WHERE status = 'ready' ORDER BY created_at LIMIT 3;
+-- which should use "Index Scan using inbox_jobs_ready_created_idx".
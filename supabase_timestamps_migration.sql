@@ -0,0 +1,26 @@
+-- Server-side timestamps for inbox_jobs.
+--
+-- job_service no longer sends created_at/updated_at: the INSERT defaults fill in
+-- created_at/updated_at and a BEFORE UPDATE trigger bumps updated_at on every write,
+-- so all timestamps come from one clock (the database's) instead of each API/worker host.
+--
+-- Run this in Supabase SQL editor (or via migration) against the DB that hosts inbox_jobs.
+
+ALTER TABLE public.inbox_jobs ALTER COLUMN created_at SET DEFAULT now();
+ALTER TABLE public.inbox_jobs ALTER COLUMN updated_at SET DEFAULT now();
+
+CREATE OR REPLACE FUNCTION public.set_updated_at()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  NEW.updated_at = now();
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS inbox_jobs_set_updated_at ON public.inbox_jobs;
+CREATE TRIGGER inbox_jobs_set_updated_at
+  BEFORE UPDATE ON public.inbox_jobs
+  FOR EACH ROW
+  EXECUTE FUNCTION public.set_updated_at();
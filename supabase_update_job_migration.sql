@@ -0,0 +1,30 @@
+-- Typed status/progress write for workers (used by job_service.update_job_status).
+--
+-- One RPC with typed parameters instead of a PostgREST PATCH body. NULL parameters keep
+-- the current column value, and writes to a job that is already 'completed' are ignored,
+-- so a late or retried progress update can't move a finished job backwards.
+-- If this function isn't deployed, update_job_status falls back to a plain UPDATE.
+--
+-- Run this in Supabase SQL editor (or via migration) against the DB that hosts inbox_jobs.
+-- Apply after supabase_status_enum_migration.sql (status is cast to job_status).
+
+CREATE OR REPLACE FUNCTION public.update_job(
+  p_job_id uuid,
+  p_status text,
+  p_progress int DEFAULT NULL,
+  p_processed int DEFAULT NULL,
+  p_result jsonb DEFAULT NULL,
+  p_error text DEFAULT NULL
+)
+RETURNS void
+LANGUAGE sql
+AS $$
+  UPDATE public.inbox_jobs
+  SET status = COALESCE(p_status::public.job_status, status),
+      progress = COALESCE(p_progress, progress),
+      processed_files = COALESCE(p_processed, processed_files),
+      result = COALESCE(p_result, result),
+      error = COALESCE(p_error, error)
+  WHERE id = p_job_id
+    AND status <> 'completed';
+$$;
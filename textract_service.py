@@ -9,6 +9,7 @@ import pandas as pd
 from docx import Document
 from PIL import Image
 from io import BytesIO
+from typing import Optional
 from botocore.exceptions import ClientError, NoRegionError, NoCredentialsError
 
 # Try to import PyPDF2 as backup
@@ -40,8 +41,12 @@ except Exception as e:
     logging.warning(f"Failed to initialize AWS Textract client: {e}")
     textract_client = None
 
-def extract_text_from_upload(file_path: str, file_bytes: bytes) -> str:
-    """Extracts text from various formats. Falls back to AWS Textract OCR for scanned documents/images."""
+def extract_text_from_upload(file_path: str, file_bytes: Optional[bytes] = None) -> str:
+    """Extracts text from various formats. Falls back to AWS Textract OCR for scanned documents/images.
+
+    file_bytes is optional: the parsers read file_path directly, and the image/Textract
+    paths only load the file into memory if they actually get used.
+    """
 
     ext = file_path.lower()
 
@@ -116,7 +121,7 @@ def extract_text_from_upload(file_path: str, file_bytes: bytes) -> str:
     # 5. Extract from images (.png, .jpg, .jpeg)
     elif ext.endswith((".png", ".jpg", ".jpeg")):
         try:
-            image = Image.open(BytesIO(file_bytes))
+            image = Image.open(BytesIO(file_bytes) if file_bytes is not None else file_path)
             if image.mode != "RGB":
                 image = image.convert("RGB")
             logging.info("Image opened successfully. Using Textract.")
@@ -129,10 +134,15 @@ def extract_text_from_upload(file_path: str, file_bytes: bytes) -> str:
         logging.info("Using AWS Textract for OCR extraction.")
         try:
             # Validate file size for Textract (max 10MB)
-            if len(file_bytes) > 10 * 1024 * 1024:
-                logging.error(f"File too large for Textract: {len(file_bytes)} bytes (max 10MB)")
+            file_size = len(file_bytes) if file_bytes is not None else os.path.getsize(file_path)
+            if file_size > 10 * 1024 * 1024:
+                logging.error(f"File too large for Textract: {file_size} bytes (max 10MB)")
                 return ""
             
+            if file_bytes is None:
+                with open(file_path, 'rb') as f:
+                    file_bytes = f.read()
+            
             # Validate file format for Textract
             if not ext.endswith(('.pdf', '.png', '.jpg', '.jpeg', '.tiff', '.bmp')):
                 logging.warning(f"File format {ext} may not be supported by Textract")
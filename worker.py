@@ -3,12 +3,13 @@
 import os
 import sys
 import time
+import random
 import logging
 import asyncio
 import tempfile
 import traceback
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 # Print before imports to catch import errors
 print("Loading environment variables...", flush=True)
@@ -34,13 +35,16 @@ except Exception as e:
 
 try:
     from job_service import (
-        get_pending_jobs, 
-        claim_job,
-        update_job_status, 
-        get_file_data,
+        aget_pending_jobs,
+        subscribe_ready_jobs,
+        aupdate_job_status,
+        queue_job_progress,
+        run_job_progress_flusher,
+        aget_file_data,
         JobStatus,
-        download_file_from_storage,
-        create_signed_url
+        adownload_file_from_storage,
+        acreate_signed_url,
+        LOCAL_JOBS_ROOT
     )
     print("✓ job_service imported", flush=True)
 except Exception as e:
@@ -63,10 +67,30 @@ logging.getLogger("job_service").setLevel(logging.INFO)
 # Worker-specific configuration
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT_SECONDS", "1800"))  # 30 minutes default
 PER_FILE_TIMEOUT = int(os.getenv("PER_FILE_TIMEOUT_SECONDS", "120"))  # 2 minutes default per file
+MAX_CONCURRENT_JOBS = 3  # Jobs claimed and processed together per poll
 
-# Thread pool executor for CPU-bound text extraction operations
-from concurrent.futures import ThreadPoolExecutor
-TEXT_EXTRACTION_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="text_extract")
+# Process pool for CPU-bound text extraction (threads would serialize on the GIL).
+# Spawned rather than forked so workers don't inherit this process's threads and sockets;
+# only the temp file path is sent to them.
+# Spawned children re-import this module as __mp_main__, so the pool is created lazily per
+# process (from run_worker) rather than at import, where every child would build its own.
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+TEXT_EXTRACTION_PROCESSES = int(os.getenv("TEXT_EXTRACTION_PROCESSES", str(min(4, os.cpu_count() or 1))))
+_text_extraction_executor: Optional[ProcessPoolExecutor] = None
+_text_extraction_pid: Optional[int] = None
+
+def get_text_extraction_executor() -> ProcessPoolExecutor:
+    """Return this process's text extraction pool, creating it on first use."""
+    global _text_extraction_executor, _text_extraction_pid
+    pid = os.getpid()
+    if _text_extraction_pid != pid:
+        _text_extraction_executor = ProcessPoolExecutor(
+            max_workers=TEXT_EXTRACTION_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        _text_extraction_pid = pid
+    return _text_extraction_executor
 
 # Request timeout handler
 class RequestTimeoutHandler:
@@ -86,6 +110,28 @@ class RequestTimeoutHandler:
             return max(0, self.timeout_seconds - (time.time() - self.start_time))
         return self.timeout_seconds
 
+class PollingBackoff:
+    """
+    Idle-poll delay for the worker loop: doubles on every empty (or failed) poll up
+    to a cap, drops back to the floor as soon as a job is found, with +/- jitter so
+    several workers don't poll in lockstep.
+    """
+    def __init__(self, floor: float, cap: float, factor: float = 2.0, jitter: float = 0.2):
+        self.floor = floor
+        self.cap = max(cap, floor)
+        self.factor = factor
+        self.jitter = jitter
+        self.delay = floor
+    
+    def reset(self):
+        self.delay = self.floor
+    
+    def next(self) -> float:
+        """Return the delay to wait now and grow the next one."""
+        delay = self.delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+        self.delay = min(self.cap, self.delay * self.factor)
+        return delay
+
 def is_transient_error(error: Exception) -> bool:
     """Check if an error is a transient infrastructure error that should be retried"""
     error_str = str(error).lower()
@@ -116,58 +162,49 @@ async def process_classify_job(job: Dict, retry_count: int = 0, max_retries: int
         logger.info(f"Processing job {job_id} (type: {endpoint_type}, retry: {retry_count}/{max_retries})")
         # Job should already be claimed (READY -> PROCESSING) before this runs.
         # Keep idempotent update for safety.
-        update_job_status(job_id, JobStatus.PROCESSING, progress=0)
+        await aupdate_job_status(job_id, JobStatus.PROCESSING, progress=0, processed_files=0)
         
         # Get file data from job with retry logic
         # Wait longer for files to be uploaded (uploads happen in background thread pool)
-        print(f"Getting file data for job {job_id}...", flush=True)
+        logger.debug("Getting file data for job %s...", job_id)
         file_data = None
         max_file_data_retries = 10  # Wait up to 20 seconds for files to be uploaded
         for attempt in range(max_file_data_retries + 1):
             try:
                 # IMPORTANT: Always call get_file_data() which fetches fresh data from database
-                print(f"  Attempt {attempt + 1}/{max_file_data_retries + 1}: Calling get_file_data({job_id})...", flush=True)
-                file_data = get_file_data(job_id)
-                print(f"  get_file_data returned: type={type(file_data)}, value={file_data}", flush=True)
+                file_data = await aget_file_data(job_id)
                 if file_data and len(file_data) > 0:
-                    print(f"SUCCESS: Got file data on attempt {attempt + 1}, {len(file_data)} files", flush=True)
-                    print(f"  First file: {file_data[0]}", flush=True)
+                    logger.debug("Got file data for job %s on attempt %d (%d files)", job_id, attempt + 1, len(file_data))
                     break
                 # If no data but no exception, wait a bit (files might still be uploading)
                 if attempt < max_file_data_retries:
                     wait_time = 2  # Wait 2 seconds between attempts
-                    print(f"  No file data yet (got {file_data}), waiting {wait_time} seconds (attempt {attempt + 1}/{max_file_data_retries + 1})...", flush=True)
+                    logger.debug("No file data yet for job %s, waiting %d seconds (attempt %d/%d)",
+                                 job_id, wait_time, attempt + 1, max_file_data_retries + 1)
                     await asyncio.sleep(wait_time)
             except Exception as e:
-                print(f"  EXCEPTION in get_file_data: {type(e).__name__}: {e}", flush=True)
-                import traceback
-                print(f"  Traceback: {traceback.format_exc()}", flush=True)
                 if is_transient_error(e) and attempt < max_file_data_retries:
                     wait_time = 2  # Wait 2 seconds for transient errors too
-                    print(f"  Transient error getting file data (attempt {attempt + 1}/{max_file_data_retries + 1}): {e}", flush=True)
-                    print(f"  Retrying in {wait_time} seconds...", flush=True)
+                    logger.warning(f"Transient error getting file data for job {job_id} (attempt {attempt + 1}/{max_file_data_retries + 1}): {e}. Retrying in {wait_time} seconds...")
                     await asyncio.sleep(wait_time)
                     continue
                 else:
                     raise
         
-        print(f"File data result type: {type(file_data)}, length: {len(file_data) if file_data else 0}", flush=True)
-        if file_data:
-            print(f"SUCCESS: Got file data, first file: {file_data[0].get('filename') if file_data else 'None'}", flush=True)
         if not file_data:
             # PRODUCTION RULE: Worker must never fail jobs for missing inputs.
             # If inputs are missing, the job should not be READY; set it back to CREATED and exit.
             logger.warning(f"Job {job_id} has no file data after claim; reverting to CREATED (do not fail)")
-            update_job_status(job_id, JobStatus.CREATED, error=None, progress=0, processed_files=0)
+            await aupdate_job_status(job_id, JobStatus.CREATED, error=None, progress=0, processed_files=0)
             return
         
-        print(f"Found {len(file_data)} files for job {job_id}", flush=True)
+        logger.info(f"Found {len(file_data)} files for job {job_id}")
         
         timeout_handler = RequestTimeoutHandler(REQUEST_TIMEOUT)
         timeout_handler.start()
         
         total_files = len(file_data)
-        update_job_status(job_id, JobStatus.PROCESSING, progress=0, processed_files=0)
+        await aupdate_job_status(job_id, JobStatus.PROCESSING, progress=0, processed_files=0)
         
         results = []
         inbox_count = 0
@@ -199,18 +236,16 @@ async def process_classify_job(job: Dict, retry_count: int = 0, max_retries: int
                     if os.path.exists(storage_file_path):
                         # Local filesystem path - read directly
                         file_path = storage_file_path
-                        with open(file_path, "rb") as f:
-                            file_bytes = f.read()
                     else:
                         # Storage path (e.g., "job_id/filename") - generate signed URL and download
                         print(f"Generating signed URL for file_path: {storage_file_path}", flush=True)
-                        signed_url = create_signed_url(storage_file_path, expires_in=3600)
+                        signed_url = await acreate_signed_url(storage_file_path, expires_in=3600)
                         if not signed_url:
                             raise ValueError(f"Failed to create signed URL for: {storage_file_path}")
                         
                         print(f"Downloading file using signed URL...", flush=True)
                         # Download file from Supabase Storage using signed URL
-                        file_bytes = download_file_from_storage(signed_url)
+                        file_bytes = await adownload_file_from_storage(signed_url)
                         if not file_bytes:
                             raise ValueError(f"Failed to download file from storage: {storage_file_path}")
                         
@@ -221,6 +256,8 @@ async def process_classify_job(job: Dict, retry_count: int = 0, max_retries: int
                         with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
                             tmp.write(file_bytes)
                             tmp_path = tmp.name
+                        # The extractor reads from disk; don't keep a second copy alive through routing/analysis
+                        file_bytes = None
                         
                         file_path = tmp_path
                 
@@ -232,7 +269,7 @@ async def process_classify_job(job: Dict, retry_count: int = 0, max_retries: int
                     
                     print(f"Downloading file using storage_url (legacy format)...", flush=True)
                     # Download file from Supabase Storage
-                    file_bytes = download_file_from_storage(storage_url)
+                    file_bytes = await adownload_file_from_storage(storage_url)
                     if not file_bytes:
                         raise ValueError(f"Failed to download file from storage: {storage_url}")
                     
@@ -243,6 +280,7 @@ async def process_classify_job(job: Dict, retry_count: int = 0, max_retries: int
                     with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
                         tmp.write(file_bytes)
                         tmp_path = tmp.name
+                    file_bytes = None
                     
                     file_path = tmp_path
                 else:
@@ -250,10 +288,9 @@ async def process_classify_job(job: Dict, retry_count: int = 0, max_retries: int
                 
                 # Extract text
                 extracted_text = await asyncio.get_event_loop().run_in_executor(
-                    TEXT_EXTRACTION_EXECUTOR,
+                    get_text_extraction_executor(),
                     textract_service.extract_text_from_upload,
-                    file_path,
-                    file_bytes
+                    file_path
                 )
                 
                 if not extracted_text or not extracted_text.strip():
@@ -268,7 +305,7 @@ async def process_classify_job(job: Dict, retry_count: int = 0, max_retries: int
                 # Route document
                 async with semaphore:
                     routing_result = await asyncio.wait_for(
-                        openai_service.classify_document(extracted_text),
+                        openai_service.classify_document(extracted_text, user_id=job.get("user_id")),
                         timeout=PER_FILE_TIMEOUT
                     )
                 
@@ -295,14 +332,27 @@ async def process_classify_job(job: Dict, retry_count: int = 0, max_retries: int
                 }
             finally:
                 # Clean up temporary file if created from storage
-                if tmp_path and os.path.exists(tmp_path):
+                if tmp_path:
                     try:
-                        os.remove(tmp_path)
+                        Path(tmp_path).unlink(missing_ok=True)
                     except Exception as cleanup_error:
                         logger.warning(f"Failed to clean up temp file {tmp_path}: {cleanup_error}")
         
-        # Process all files in parallel
-        tasks = [process_file(file_info) for file_info in file_data]
+        processed_count = 0
+        
+        async def process_and_report(file_info: Dict):
+            """Process a single file and queue a progress tick as soon as it finishes"""
+            nonlocal processed_count
+            try:
+                return await process_file(file_info)
+            finally:
+                processed_count += 1
+                progress = int((processed_count / total_files) * 100)
+                # Buffered and coalesced with other files' ticks; see run_job_progress_flusher
+                await queue_job_progress(job_id, processed_count, progress)
+        
+        # Process all files in parallel; progress writes overlap with remaining work
+        tasks = [process_and_report(file_info) for file_info in file_data]
         routing_results = await asyncio.gather(*tasks, return_exceptions=True)
         
         for i, result in enumerate(routing_results):
@@ -321,11 +371,6 @@ async def process_classify_job(job: Dict, retry_count: int = 0, max_retries: int
                     inbox_count += 1
                 elif result.get("routing") == "ARCHIVE":
                     archive_count += 1
-            
-            # Update progress
-            processed = len(results)
-            progress = int((processed / total_files) * 100)
-            update_job_status(job_id, JobStatus.PROCESSING, progress=progress, processed_files=processed)
         
         # Build final result
         successful = sum(1 for r in results if r.get("status") == "success")
@@ -341,12 +386,12 @@ async def process_classify_job(job: Dict, retry_count: int = 0, max_retries: int
             "processing_time": time.time() - timeout_handler.start_time
         }
         
-        update_job_status(job_id, JobStatus.COMPLETED, result=final_result, progress=100)
+        await aupdate_job_status(job_id, JobStatus.COMPLETED, result=final_result, progress=100)
         logger.info(f"Job {job_id} completed successfully")
         
         # Clean up files after successful processing
         try:
-            job_dir = Path(tempfile.gettempdir()) / "inbox_jobs" / job_id
+            job_dir = LOCAL_JOBS_ROOT / job_id
             if job_dir.exists():
                 import shutil
                 shutil.rmtree(job_dir)
@@ -368,18 +413,18 @@ async def process_classify_job(job: Dict, retry_count: int = 0, max_retries: int
             wait_time = 2 ** retry_count  # Exponential backoff
             print(f"TRANSIENT ERROR detected - will retry job {job_id} in {wait_time} seconds (retry {retry_count + 1}/{max_retries})", flush=True)
             # Reset job to pending for retry
-            update_job_status(job_id, JobStatus.PENDING, error=None)
+            await aupdate_job_status(job_id, JobStatus.PENDING, error=None)
             # Wait before retry
             await asyncio.sleep(wait_time)
             # Retry the job
             return await process_classify_job(job, retry_count=retry_count + 1, max_retries=max_retries)
         else:
             # Permanent failure - mark as failed
-            update_job_status(job_id, JobStatus.FAILED, error=error_msg)
+            await aupdate_job_status(job_id, JobStatus.FAILED, error=error_msg)
         
         # Clean up files even on failure
         try:
-            job_dir = Path(tempfile.gettempdir()) / "inbox_jobs" / job_id
+            job_dir = LOCAL_JOBS_ROOT / job_id
             if job_dir.exists():
                 import shutil
                 shutil.rmtree(job_dir)
@@ -393,21 +438,21 @@ async def process_analyze_job(job: Dict):
     
     try:
         logger.info(f"Processing analyze job {job_id}")
-        update_job_status(job_id, JobStatus.PROCESSING, progress=0)
+        await aupdate_job_status(job_id, JobStatus.PROCESSING, progress=0, processed_files=0)
         
         # Get file data from job
-        file_data = get_file_data(job_id)
+        file_data = await aget_file_data(job_id)
         if not file_data:
             # PRODUCTION RULE: do not fail for missing inputs; revert state.
             logger.warning(f"Analyze job {job_id} has no file data after claim; reverting to CREATED (do not fail)")
-            update_job_status(job_id, JobStatus.CREATED, error=None, progress=0, processed_files=0)
+            await aupdate_job_status(job_id, JobStatus.CREATED, error=None, progress=0, processed_files=0)
             return
         
         timeout_handler = RequestTimeoutHandler(REQUEST_TIMEOUT)
         timeout_handler.start()
         
         total_files = len(file_data)
-        update_job_status(job_id, JobStatus.PROCESSING, progress=0, processed_files=0)
+        await aupdate_job_status(job_id, JobStatus.PROCESSING, progress=0, processed_files=0)
         
         results = []
         
@@ -437,18 +482,16 @@ async def process_analyze_job(job: Dict):
                     if os.path.exists(storage_file_path):
                         # Local filesystem path - read directly
                         file_path = storage_file_path
-                        with open(file_path, "rb") as f:
-                            file_bytes = f.read()
                     else:
                         # Storage path (e.g., "job_id/filename") - generate signed URL and download
                         print(f"Generating signed URL for file_path: {storage_file_path}", flush=True)
-                        signed_url = create_signed_url(storage_file_path, expires_in=3600)
+                        signed_url = await acreate_signed_url(storage_file_path, expires_in=3600)
                         if not signed_url:
                             raise ValueError(f"Failed to create signed URL for: {storage_file_path}")
                         
                         print(f"Downloading file using signed URL...", flush=True)
                         # Download file from Supabase Storage using signed URL
-                        file_bytes = download_file_from_storage(signed_url)
+                        file_bytes = await adownload_file_from_storage(signed_url)
                         if not file_bytes:
                             raise ValueError(f"Failed to download file from storage: {storage_file_path}")
                         
@@ -459,6 +502,8 @@ async def process_analyze_job(job: Dict):
                         with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
                             tmp.write(file_bytes)
                             tmp_path = tmp.name
+                        # The extractor reads from disk; don't keep a second copy alive through routing/analysis
+                        file_bytes = None
                         
                         file_path = tmp_path
                 
@@ -470,7 +515,7 @@ async def process_analyze_job(job: Dict):
                     
                     print(f"Downloading file using storage_url (legacy format)...", flush=True)
                     # Download file from Supabase Storage
-                    file_bytes = download_file_from_storage(storage_url)
+                    file_bytes = await adownload_file_from_storage(storage_url)
                     if not file_bytes:
                         raise ValueError(f"Failed to download file from storage: {storage_url}")
                     
@@ -481,6 +526,7 @@ async def process_analyze_job(job: Dict):
                     with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
                         tmp.write(file_bytes)
                         tmp_path = tmp.name
+                    file_bytes = None
                     
                     file_path = tmp_path
                 else:
@@ -488,10 +534,9 @@ async def process_analyze_job(job: Dict):
                 
                 # Extract text
                 extracted_text = await asyncio.get_event_loop().run_in_executor(
-                    TEXT_EXTRACTION_EXECUTOR,
+                    get_text_extraction_executor(),
                     textract_service.extract_text_from_upload,
-                    file_path,
-                    file_bytes
+                    file_path
                 )
                 
                 if not extracted_text or not extracted_text.strip():
@@ -528,14 +573,27 @@ async def process_analyze_job(job: Dict):
                 }
             finally:
                 # Clean up temporary file if created from storage
-                if tmp_path and os.path.exists(tmp_path):
+                if tmp_path:
                     try:
-                        os.remove(tmp_path)
+                        Path(tmp_path).unlink(missing_ok=True)
                     except Exception as cleanup_error:
                         logger.warning(f"Failed to clean up temp file {tmp_path}: {cleanup_error}")
         
-        # Process all files in parallel
-        tasks = [process_file(file_info) for file_info in file_data]
+        processed_count = 0
+        
+        async def process_and_report(file_info: Dict):
+            """Process a single file and queue a progress tick as soon as it finishes"""
+            nonlocal processed_count
+            try:
+                return await process_file(file_info)
+            finally:
+                processed_count += 1
+                progress = int((processed_count / total_files) * 100)
+                # Buffered and coalesced with other files' ticks; see run_job_progress_flusher
+                await queue_job_progress(job_id, processed_count, progress)
+        
+        # Process all files in parallel; progress writes overlap with remaining work
+        tasks = [process_and_report(file_info) for file_info in file_data]
         analysis_results = await asyncio.gather(*tasks, return_exceptions=True)
         
         # Collect results
@@ -549,11 +607,6 @@ async def process_analyze_job(job: Dict):
                 })
             else:
                 results.append(result)
-            
-            # Update progress
-            processed = len(results)
-            progress = int((processed / total_files) * 100)
-            update_job_status(job_id, JobStatus.PROCESSING, progress=progress, processed_files=processed)
         
         # Build final result
         successful = sum(1 for r in results if r.get("status") == "success")
@@ -567,12 +620,12 @@ async def process_analyze_job(job: Dict):
             "processing_time": time.time() - timeout_handler.start_time
         }
         
-        update_job_status(job_id, JobStatus.COMPLETED, result=final_result, progress=100)
+        await aupdate_job_status(job_id, JobStatus.COMPLETED, result=final_result, progress=100)
         logger.info(f"Analyze job {job_id} completed successfully")
         
         # Clean up files after successful processing
         try:
-            job_dir = Path(tempfile.gettempdir()) / "inbox_jobs" / job_id
+            job_dir = LOCAL_JOBS_ROOT / job_id
             if job_dir.exists():
                 import shutil
                 shutil.rmtree(job_dir)
@@ -593,15 +646,15 @@ async def process_analyze_job(job: Dict):
         if is_transient_error(e) and retry_count < max_retries:
             wait_time = 2 ** retry_count
             print(f"TRANSIENT ERROR detected - will retry job {job_id} in {wait_time} seconds (retry {retry_count + 1}/{max_retries})", flush=True)
-            update_job_status(job_id, JobStatus.PENDING, error=None)
+            await aupdate_job_status(job_id, JobStatus.PENDING, error=None)
             await asyncio.sleep(wait_time)
             return await process_analyze_job(job, retry_count=retry_count + 1, max_retries=max_retries)
         else:
-            update_job_status(job_id, JobStatus.FAILED, error=error_msg)
+            await aupdate_job_status(job_id, JobStatus.FAILED, error=error_msg)
         
         # Clean up files even on failure
         try:
-            job_dir = Path(tempfile.gettempdir()) / "inbox_jobs" / job_id
+            job_dir = LOCAL_JOBS_ROOT / job_id
             if job_dir.exists():
                 import shutil
                 shutil.rmtree(job_dir)
@@ -622,39 +675,49 @@ async def worker_loop():
     logger.info(f"Process ID: {os.getpid()}")
     logger.info("=" * 80)
     
-    poll_interval = int(os.getenv("WORKER_POLL_INTERVAL_SECONDS", "5"))  # Poll every 5 seconds
-    print(f"Poll interval: {poll_interval} seconds", flush=True)
+    poll_interval = float(os.getenv("WORKER_POLL_INTERVAL_SECONDS", "1"))  # Fastest poll rate while busy
+    max_poll_interval = float(os.getenv("WORKER_MAX_POLL_INTERVAL_SECONDS", "30"))  # Slowest poll rate when idle
+    print(f"Poll interval: {poll_interval}-{max_poll_interval} seconds (backs off while idle)", flush=True)
+    backoff = PollingBackoff(poll_interval, max_poll_interval)
+    
+    # Wake up immediately when a job becomes READY (Supabase Realtime).
+    # Polling stays in place as a safety net if Realtime is unavailable or drops events.
+    job_ready_event = asyncio.Event()
+    realtime_channel = await subscribe_ready_jobs(lambda payload: job_ready_event.set())
+    print(f"Realtime job notifications: {'ON' if realtime_channel else 'OFF'}", flush=True)
+    
+    # Coalesce per-file progress writes instead of issuing one UPDATE per file
+    progress_flusher = asyncio.create_task(run_job_progress_flusher())
     
     while True:
         try:
-            # Get READY jobs only (worker-visible state)
-            pending_jobs = get_pending_jobs(limit=10)
+            # Clear before polling so a notification arriving mid-poll is not lost
+            job_ready_event.clear()
+            
+            # Atomically claim READY jobs (READY -> PROCESSING). Only claim what we
+            # will process now so no job is left stranded in PROCESSING.
+            pending_jobs = await aget_pending_jobs(limit=MAX_CONCURRENT_JOBS)
             
             if pending_jobs:
+                backoff.reset()
                 print(f"=" * 80, flush=True)
                 print(f"FOUND {len(pending_jobs)} PENDING JOB(S) - STARTING PROCESSING", flush=True)
                 print(f"=" * 80, flush=True)
                 logger.info(f"Found {len(pending_jobs)} pending job(s)")
                 
-                # Process jobs concurrently (up to 3 at a time)
-                # Atomically claim each job before processing (READY -> PROCESSING)
+                # Process claimed jobs concurrently
                 tasks = []
-                for job in pending_jobs[:3]:
+                for job in pending_jobs:
                     endpoint_type = job.get("endpoint_type", "classify")
                     job_id = job.get("id", "unknown")
                     print(f"DISPATCHING job {job_id} (type: {endpoint_type})", flush=True)
                     print(f"  Job total_files: {job.get('total_files')}", flush=True)
                     print(f"  Job created_at: {job.get('created_at')}", flush=True)
 
-                    claimed = claim_job(job_id)
-                    if not claimed:
-                        print(f"SKIPPING job {job_id} - could not claim (already claimed or not READY)", flush=True)
-                        continue
-
                     if endpoint_type == "analyze":
-                        tasks.append(process_analyze_job(claimed))
+                        tasks.append(process_analyze_job(job))
                     else:
-                        tasks.append(process_classify_job(claimed))
+                        tasks.append(process_classify_job(job))
                 
                 print(f"PROCESSING {len(tasks)} job(s) concurrently...", flush=True)
                 print(f"Waiting for tasks to complete...", flush=True)
@@ -680,9 +743,17 @@ async def worker_loop():
                         logger.error(f"Exception processing job {job_id}: {result}")
                         logger.error(traceback.format_exc())
             else:
-                # No jobs, wait before next poll
-                print(f"No pending jobs, waiting {poll_interval} seconds...", flush=True)
-                await asyncio.sleep(poll_interval)
+                # No jobs (or the poll failed), wait for a READY notification or the next poll.
+                # The wait grows while the queue stays empty so an idle worker stops
+                # hitting the database every few seconds.
+                delay = backoff.next()
+                logger.debug("No pending jobs, waiting up to %.1f seconds...", delay)
+                try:
+                    await asyncio.wait_for(job_ready_event.wait(), timeout=delay)
+                    # Woken by a notification - poll at full speed again
+                    backoff.reset()
+                except asyncio.TimeoutError:
+                    pass
                 
         except KeyboardInterrupt:
             logger.info("Worker shutting down...")
@@ -690,7 +761,16 @@ async def worker_loop():
         except Exception as e:
             logger.error(f"Error in worker loop: {e}")
             logger.error(traceback.format_exc())
-            await asyncio.sleep(poll_interval)
+            await asyncio.sleep(backoff.next())
+
+async def run_worker():
+    """Run the worker loop, releasing the extraction pool and OpenAI connections on the way out."""
+    get_text_extraction_executor()
+    try:
+        await worker_loop()
+    finally:
+        _text_extraction_executor.shutdown(wait=True, cancel_futures=True)
+        await openai_service.close_client()
 
 if __name__ == "__main__":
     try:
@@ -723,7 +803,7 @@ if __name__ == "__main__":
         # Run worker loop
         print("Starting async worker loop...", flush=True)
         try:
-            asyncio.run(worker_loop())
+            asyncio.run(run_worker())
         except Exception as loop_error:
             print(f"ERROR in async loop: {loop_error}", flush=True)
             print(traceback.format_exc(), flush=True)